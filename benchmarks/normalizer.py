@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+Micro-benchmark of the query normalization (per-query cost, in microseconds).
+
+Usage (from the root of the project):
+    python benchmarks/normalizer.py
+"""
+
+import os
+import re
+import sys
+import timeit
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search.utils.normalizer import clean_query, normalize, get_name_matcher
+
+QUERIES = [
+    "Pâte à tartiner aux noisettes",
+    "jus de pomme sans sucre ajouté",
+    "Céréales pour le petit-déjeuner",
+    "boissons gazeuses",
+    "crème fraîche épaisse",
+    "steack haché de bœuf",
+    "yaourt à la grecque",
+    "Pain de mie complet",
+]
+
+def legacy_clean_query(query):
+    """
+    The normalization done by DBInteractions._clean_query before the normalizer module
+    """
+    useless_terms = ['a', 'de', 'de', 'des', 'un', 'une', 'tout', 'tous', 'les',
+                     'la', 'le', 'qui', 'que', 'quoi', 'ce', 'ces', 'sans', 'avec']
+    query = query.lower()
+    query = unicodedata.normalize('NFD', query)
+    query = query.encode('ascii', 'ignore')
+    query = query.decode('utf-8')
+    query = str(query)
+    query_list = query.split()
+    clean_query_list = []
+    for word in query_list:
+        if word not in useless_terms:
+            clean_query_list.append(word)
+    return ' '.join(clean_query_list)
+
+# A page of 150 product names from the API
+NAMES = ["Pâte à tartiner Nutella {}g".format(numb) if numb % 3 else "Biscuits noisettes cacao {}".format(numb)
+         for numb in range(150)]
+
+def legacy_select_names(query):
+    """
+    The matching done by OpenFoodFactsInteractions._select_appropriate_products before NameMatcher
+    """
+    test = re.compile(r".*%s.*" % query, re.IGNORECASE)
+    return [name for name in NAMES if test.match(name)]
+
+def select_names(query):
+    matches = get_name_matcher(query).match_all(NAMES)
+    return [name for name, match in zip(NAMES, matches) if match]
+
+def uncached_clean_query(query):
+    return clean_query.__wrapped__(query)
+
+def measure(function, number=20000):
+    """
+    This function returns the best per-query cost (in microseconds) of 5 runs
+    """
+    runs = timeit.repeat(lambda: [function(query) for query in QUERIES], number=number, repeat=5)
+    return min(runs) / (number * len(QUERIES)) * 1e6
+
+def main():
+    for query in QUERIES:
+        assert legacy_clean_query(query) == clean_query(query), query
+        assert legacy_clean_query(query) == uncached_clean_query(query), query
+
+    print("legacy _clean_query        : {:.2f} us/query".format(measure(legacy_clean_query)))
+    print("clean_query (no memo)      : {:.2f} us/query".format(measure(uncached_clean_query)))
+    print("clean_query (memo hit)     : {:.2f} us/query".format(measure(clean_query)))
+    print("normalize (name, dbinit)   : {:.2f} us/name".format(measure(normalize)))
+
+    for query in ("nutella", "tartiner nutella"):
+        assert legacy_select_names(query) == select_names(query), query
+        legacy = min(timeit.repeat(lambda: legacy_select_names(query), number=200, repeat=5)) / 200 * 1e6
+        new = min(timeit.repeat(lambda: select_names(query), number=200, repeat=5)) / 200 * 1e6
+        print("150 names, {!r:20}: regex {:.0f} us, NameMatcher {:.0f} us".format(query, legacy, new))
+
+    # A query with regex characters: the regex backtracks exponentially with the name length
+    query, name = "(a|aa)*c", "a" * 24
+    legacy = min(timeit.repeat(lambda: re.compile(r".*%s.*" % query, re.IGNORECASE).match(name),
+                               number=1, repeat=3)) * 1e6
+    new = min(timeit.repeat(lambda: get_name_matcher(query).match(name), number=1, repeat=3)) * 1e6
+    print("1 name, {!r:24}: regex {:.0f} us, NameMatcher {:.0f} us".format(query, legacy, new))
+
+if __name__ == '__main__':
+    main()
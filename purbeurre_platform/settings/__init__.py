@@ -0,0 +1,16 @@
+"""
+The settings are chosen with the ENV environment variable:
+    -> PRODUCTION: prod.py (Heroku)
+    -> BENCH: bench.py (production settings with a local database, for the benchmarks)
+    -> otherwise: dev.py
+A module can also be chosen with DJANGO_SETTINGS_MODULE (ex: purbeurre_platform.settings.bench)
+"""
+
+import os
+
+if os.environ.get('ENV') == 'PRODUCTION':
+    from .prod import *
+elif os.environ.get('ENV') == 'BENCH':
+    from .bench import *
+else:
+    from .dev import *
@@ -0,0 +1,17 @@
+"""
+Benchmark settings: the production settings (middleware, templates, caches)
+with the local database and static files
+"""
+
+import os
+from .prod import *
+
+ALLOWED_HOSTS = ALLOWED_HOSTS + ['localhost']
+
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, "static"),
+    os.path.join(BASE_DIR, "search/static"),
+]
+
+# The static files are served without collectstatic
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
@@ -0,0 +1,18 @@
+"""
+Development settings: debug mode and django-debug-toolbar
+"""
+
+from .base import *
+
+DEBUG = True
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+
+# The toolbar is placed as early as possible, after the static files
+MIDDLEWARE = MIDDLEWARE[:2] + ['debug_toolbar.middleware.DebugToolbarMiddleware'] + MIDDLEWARE[2:]
+
+# The templates are read again at each request: so are the product cards
+CACHES = dict(CACHES, fragments={'BACKEND': 'django.core.cache.backends.dummy.DummyCache'})
+
+# The CSS and JS files are loaded one by one, without building the bundles
+STATIC_BUNDLES_ENABLED = False
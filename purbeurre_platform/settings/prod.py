@@ -0,0 +1,47 @@
+"""
+Production settings (Heroku)
+"""
+
+import os
+from .base import *
+
+DEBUG = False
+
+# Static files settings
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_ROOT = os.path.join(PROJECT_ROOT, 'staticfiles')
+
+# Extra places for collectstatic to find static files.
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, "static"),
+]
+
+# Simplified static file serving.
+# https://warehouse.python.org/project/whitenoise/
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# The compiled templates are kept in memory by each worker
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# The cache is shared by the workers of the dyno
+CACHES = dict(CACHES, default={
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'django')),
+})
+
+# In-memory product catalogue of each worker (maximum size in bytes)
+PRODUCT_CATALOGUE_MEMORY_BUDGET = 32 * 1024 * 1024
+
+# The search index is kept in memory, its rows would count in the Heroku limit
+SEARCH_INDEX_BACKEND = 'memory'
+
+# The background jobs are run by the worker process (manage.py runworker)
+JOBS_EAGER = False
+
+QUERY_LOG_SAMPLE_RATE = 0.2
@@ -27,11 +27,12 @@ urlpatterns = [
     path('login/', views.log_in, name="log_in"),
     path('logout/', views.log_out, name="log_out"),
     path('search/', include('search.urls', namespace='search')),
+    path('api/v1/', include('search.api_urls', namespace='api')),
     path('legal-information/', TemplateView.as_view(template_name='legal.html'), name="legal"),
     path('admin/', admin.site.urls),
 ]
 
-if settings.DEBUG:
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns = [
         path('__debug__/', include(debug_toolbar.urls)),
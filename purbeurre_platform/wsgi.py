@@ -8,9 +8,32 @@ https://docs.djangoproject.com/en/2.0/howto/deployment/wsgi/
 """
 
 import os
+import sys
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "purbeurre_platform.settings")
 
 application = get_wsgi_application()
+
+# The in-memory category graph and product catalogue are loaded when the worker starts
+# (if the database is not reachable yet, it is loaded at the first request)
+from django.db import connection
+from search.utils.category_graph import category_graph
+from search.utils.catalogue import product_catalogue
+
+from search.checks import measure_middleware_cost
+
+# The time spent in the middleware by each request is written in the logs
+cost = measure_middleware_cost()
+if cost is not None:
+    print("Middleware cost: {:.0f} us per request".format(cost * 1e6), file=sys.stderr)
+
+try:
+    category_graph.load()
+    product_catalogue.get_data()
+except Exception:
+    category_graph.invalidate()
+    product_catalogue.invalidate()
+finally:
+    connection.close()
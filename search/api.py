@@ -0,0 +1,200 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+Version 1 of the JSON API used by the mobile client.
+It gives the same information as the html pages (through Treatment, so with the same caches)
+with compact payloads:
+    -> the "fields" parameter selects the fields of the elements (ex: ?fields=ref,name)
+    -> the responses are compressed with gzip when the client accepts it
+    -> the responses have an ETag, a request with If-None-Match gets a 304 without body
+    -> the favourites are paginated with the cursor given in "next_cursor" (?after=...)
+The favourites need a user logged in with the session, the requests which change them
+need the CSRF token (X-CSRFToken header) like the html forms
+"""
+
+import json
+import hashlib
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_http_methods
+from .models import Product, Favourite, Job
+from .utils.treatment import Treatment
+from .utils.jobs import get_job_result
+from .views import MAX_BATCH_REGISTRATION, _make_etag, _user_version
+
+## PRIVATE FUNCTIONS ##
+def _api_response(request, data, status=200, etag=None):
+    """
+    This function returns the compact json response of the data.
+    The ETag is the hash of the content (if it was not computed before the response):
+    if the client already has it, a 304 is returned
+    """
+    response = JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+    if request.method == 'GET' and status == 200:
+        etag = etag or '"%s"' % hashlib.md5(response.content).hexdigest()
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        response = get_conditional_response(request, etag=etag, response=response)
+    return response
+
+def _api_error(request, message, status):
+    return _api_response(request, {'error': message}, status)
+
+def _select_fields(request, elements):
+    """
+    This function keeps only the fields asked in the "fields" parameter
+    """
+    fields = request.GET.get('fields')
+    if not fields:
+        return elements
+    fields = set(fields.split(','))
+    return [{key: value for key, value in element.items() if key in fields} for element in elements]
+
+def _selection_response(request, selection):
+    """
+    This function returns the response of a list of categories or products
+    """
+    if not selection:
+        selection = {'type': None, 'number': 0, 'elements': []}
+    return _api_response(request, {
+        'type': selection["type"],
+        'number': selection["number"],
+        'elements': _select_fields(request, selection["elements"]),
+    })
+
+def _product_etag(request, code):
+    """
+    This function returns the ETag of a product built from the database, computed
+    with a few cheap queries before any work like the product page (None otherwise)
+    """
+    find_info = Treatment()
+    version = find_info.get_product_version(code)
+    if version is None:
+        return None
+    return '"%s"' % _make_etag('api-product', code, request.GET.get('fields', ''), version,
+                               _user_version(request, find_info))
+
+def _get_registered_refs(request):
+    """
+    This function returns the refs of the products registered by the user (empty if not logged in)
+    """
+    if not request.user.is_authenticated:
+        return set()
+    return set(Product.objects.filter(users__user=request.user).values_list('ref', flat=True))
+
+## ENDPOINTS ##
+@gzip_page
+@require_http_methods(['GET'])
+def search(request):
+    """
+    This endpoint gives the categories or products matching the query "q"
+    """
+    query = request.GET.get('q', '')
+    if not query.strip():
+        return _api_error(request, "The q parameter is required", 400)
+    return _selection_response(request, Treatment().get_choice_selection(query))
+
+@gzip_page
+@require_http_methods(['GET'])
+def substitutes(request, element_type, info_id):
+    """
+    This endpoint gives the substitutes of a category or a product.
+    The products registered by the user are flagged with product_registered
+    """
+    if element_type not in ('category', 'product'):
+        return _api_error(request, "Unknown element type", 404)
+    selection = Treatment().get_substitute_selection(element_type, info_id)
+    if selection and request.user.is_authenticated:
+        registered_refs = _get_registered_refs(request)
+        for product in selection["elements"]:
+            product["product_registered"] = product["ref"] in registered_refs
+    return _selection_response(request, selection)
+
+@gzip_page
+@require_http_methods(['GET'])
+def product(request, code):
+    """
+    This endpoint gives all the information of the product page.
+    A client which already has the product gets a 304 before the product is searched
+    """
+    etag = _product_etag(request, code)
+    if etag:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            patch_cache_control(not_modified, private=True, no_cache=True)
+            return not_modified
+    selection = Treatment().get_selected_product(code)
+    if not selection:
+        return _api_error(request, "Product not found", 404)
+    selection["product_registered"] = request.user.is_authenticated and Favourite.objects.filter(
+        profile=request.user.profile, product__ref=code).exists()
+    return _api_response(request, _select_fields(request, [selection])[0], etag=etag)
+
+@gzip_page
+@require_http_methods(['GET', 'POST'])
+def favourites(request):
+    """
+    This endpoint gives the products registered by the user, page by page (GET),
+    or registers a list of products ({"codes": [...]}) and gives the status of each one (POST)
+    """
+    if not request.user.is_authenticated:
+        return _api_error(request, "Authentication required", 401)
+
+    if request.method == 'GET':
+        page = Treatment().get_registered_products_page(request.user.username, request.GET.get('after'))
+        return _api_response(request, {
+            'number': page["number"],
+            'elements': _select_fields(request, page["elements"]),
+            'next_cursor': page["next_cursor"],
+        })
+
+    try:
+        codes = json.loads(request.body.decode('utf-8'))["codes"]
+    except:
+        return _api_error(request, "Invalid json", 400)
+    if (not isinstance(codes, list) or len(codes) > MAX_BATCH_REGISTRATION
+            or not all(isinstance(code, str) for code in codes)):
+        return _api_error(request, "At most %s codes are expected" % MAX_BATCH_REGISTRATION, 400)
+    statuses = Treatment().register_products(request.user.username, codes) if codes else {}
+    return _api_response(request, {'statuses': statuses})
+
+@require_http_methods(['PUT', 'DELETE'])
+def favourite(request, code):
+    """
+    This endpoint registers (PUT) or removes (DELETE) one product of the user.
+    A product which is not in the database is registered in background: the response
+    is a 202 with the id of the job (see job)
+    """
+    if not request.user.is_authenticated:
+        return _api_error(request, "Authentication required", 401)
+
+    if request.method == 'PUT':
+        status, job_id = Treatment().queue_registration(request.user.username, code)
+        if status == "queued":
+            return _api_response(request, {'status': status, 'job': job_id}, 202)
+    else:
+        try:
+            status = Treatment().delete_product(request.user.username, code)
+        except Product.DoesNotExist:
+            return _api_error(request, "Product not found", 404)
+    return _api_response(request, {'status': status})
+
+@gzip_page
+@require_http_methods(['GET'])
+def job(request, job_id):
+    """
+    This endpoint gives the status of a background job asked by the user
+    """
+    if not request.user.is_authenticated:
+        return _api_error(request, "Authentication required", 401)
+    job = Job.objects.filter(id=job_id, owner=request.user.username).first()
+    if not job:
+        return _api_error(request, "Job not found", 404)
+    return _api_response(request, {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'result': get_job_result(job),
+    })
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import api
+
+app_name = 'api'
+urlpatterns = [
+    path('search', api.search, name="search"),
+    path('substitutes/<element_type>/<info_id>', api.substitutes, name="substitutes"),
+    path('products/<code>', api.product, name="product"),
+    path('favourites', api.favourites, name="favourites"),
+    path('favourites/<code>', api.favourite, name="favourite"),
+    path('jobs/<int:job_id>', api.job, name="job"),
+]
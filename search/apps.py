@@ -3,3 +3,41 @@ from django.apps import AppConfig
 
 class SearchConfig(AppConfig):
     name = 'search'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete, m2m_changed
+        from .models import Product, Category, Favourite
+        from .signals import increment_favourite_count, decrement_favourite_count
+        from .utils.category_graph import invalidate_category_graph
+        from .utils.catalogue import invalidate_product_catalogue
+        from .utils.search_index import update_search_index, remove_from_search_index
+
+        # The in-memory category graph is reloaded when its data change
+        for model in (Product, Category):
+            post_save.connect(invalidate_category_graph, sender=model)
+            post_delete.connect(invalidate_category_graph, sender=model)
+        m2m_changed.connect(invalidate_category_graph, sender=Product.categories.through)
+        m2m_changed.connect(invalidate_category_graph, sender=Category.parents.through)
+
+        # And so is the in-memory product catalogue
+        for model in (Product, Category):
+            post_save.connect(invalidate_product_catalogue, sender=model)
+            post_delete.connect(invalidate_product_catalogue, sender=model)
+        m2m_changed.connect(invalidate_product_catalogue, sender=Product.categories.through)
+
+        # The search index is updated when a name is saved
+        for model in (Product, Category):
+            post_save.connect(update_search_index, sender=model)
+            post_delete.connect(remove_from_search_index, sender=model)
+
+        # The number of users who registered a product follows its favourites
+        post_save.connect(increment_favourite_count, sender=Favourite)
+        post_delete.connect(decrement_favourite_count, sender=Favourite)
+
+        # The persistent connections to the database are checked at the start of the requests
+        from django.core.signals import request_started
+        from .utils.db_connections import check_connections
+        request_started.connect(check_connections)
+
+        # The tasks run in background and the checks of the settings are registered
+        from . import tasks, checks
@@ -0,0 +1,17 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+class ProfileBackend(ModelBackend):
+    """
+    This class loads the user of each request (request.user) with its profile in one query,
+    so request.user.profile does not request the database again
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = get_user_model()._default_manager.select_related('profile').get(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
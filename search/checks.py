@@ -0,0 +1,93 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+System checks of the settings which slow down every request.
+They are run when the server starts (and by "manage.py check")
+"""
+
+import time
+from django.conf import settings
+from django.core.checks import Info, Warning, register
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+WHITENOISE = 'whitenoise.middleware.WhiteNoiseMiddleware'
+SECURITY = 'django.middleware.security.SecurityMiddleware'
+
+@register()
+def check_debug_apps(app_configs, **kwargs):
+    """
+    The debug toolbar runs on every request, it must not be used in production
+    """
+    errors = []
+    if not settings.DEBUG and 'debug_toolbar' in settings.INSTALLED_APPS:
+        errors.append(Warning("debug_toolbar is installed while DEBUG is False",
+                              hint="Use purbeurre_platform.settings.prod", id='search.W001'))
+    return errors
+
+@register()
+def check_whitenoise_position(app_configs, **kwargs):
+    """
+    The static files must be served before the other middleware run
+    """
+    errors = []
+    middleware = list(settings.MIDDLEWARE)
+    if WHITENOISE in middleware and middleware[:2] != [SECURITY, WHITENOISE]:
+        errors.append(Warning("WhiteNoiseMiddleware is not directly after SecurityMiddleware",
+                              hint="Every static file goes through the other middleware", id='search.W002'))
+    return errors
+
+@register(deploy=True)
+def check_static_bundles(app_configs, **kwargs):
+    """
+    The bundles must be built again when a CSS or JS file changes ("manage.py check --deploy")
+    """
+    from .utils.bundles import build_bundles, get_manifest
+    errors = []
+    if getattr(settings, 'STATIC_BUNDLES_ENABLED', True):
+        try:
+            up_to_date = build_bundles(write=False) == get_manifest()
+        except OSError:
+            up_to_date = False
+        if not up_to_date:
+            errors.append(Warning("The static bundles are missing or outdated, the pages load their sources",
+                                  hint="Run manage.py bundlestatic", id='search.W003'))
+    return errors
+
+@register(deploy=True)
+def check_middleware_cost(app_configs, **kwargs):
+    """
+    This check reports the time spent in the middleware for each request ("manage.py check --deploy")
+    """
+    cost = measure_middleware_cost()
+    if cost is None:
+        return [Info("The cost of the middleware could not be measured", id='search.I001')]
+    return [Info("The middleware cost {:.0f} us per request ({} middleware)".format(
+        cost * 1e6, len(settings.MIDDLEWARE)), id='search.I001')]
+
+def measure_middleware_cost(iterations=200):
+    """
+    This function returns the time (in seconds) added by the middleware to a request
+    whose view does nothing, or None if it can not be measured
+    """
+    def view(request):
+        return HttpResponse("ok")
+
+    host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')),
+                'localhost')
+    factory = RequestFactory(HTTP_HOST=host, secure=True)
+
+    def measure(handler):
+        start = time.perf_counter()
+        for numb in range(iterations):
+            handler(factory.get('/'))
+        return (time.perf_counter() - start) / iterations
+
+    try:
+        handler = view
+        for middleware in reversed(settings.MIDDLEWARE):
+            handler = import_string(middleware)(handler)
+        return max(measure(handler) - measure(view), 0)
+    except Exception:
+        return None
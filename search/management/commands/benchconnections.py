@@ -0,0 +1,38 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.core.management.base import BaseCommand
+from django.db import connections
+from ...utils.db_connections import measure_connection_overhead
+
+class Command(BaseCommand):
+    """
+    This class measures the time spent to open a connection to the database for each
+    request, compared to the persistent connection (CONN_MAX_AGE) of the settings
+    (to be run with ENV=BENCH, or with the DATABASE_URL of the environment to measure)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            dest='requests',
+            help="""Number of requests simulated for each mode""",
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            dest='database',
+            help="""Alias of the database measured""",
+        )
+
+    def handle(self, **options):
+        settings_dict = connections[options['database']].settings_dict
+        durations = measure_connection_overhead(options['requests'], options['database'])
+        self.stdout.write("CONN_MAX_AGE: {}, server-side cursors: {}".format(
+            settings_dict['CONN_MAX_AGE'],
+            "disabled" if settings_dict.get('DISABLE_SERVER_SIDE_CURSORS') else "enabled"))
+        self.stdout.write("New connection per request: {:.2f} ms".format(durations['new_connection'] * 1e3))
+        self.stdout.write("Persistent connection: {:.2f} ms".format(durations['persistent'] * 1e3))
+        self.stdout.write("Connection overhead: {:.2f} ms per request".format(
+            (durations['new_connection'] - durations['persistent']) * 1e3))
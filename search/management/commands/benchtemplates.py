@@ -0,0 +1,28 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...utils.rendering import measure_template_rendering
+
+class Command(BaseCommand):
+    """
+    This class measures the time spent to render each page template
+    (to be run with ENV=BENCH to use the cached template loaders of the production)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=100,
+            dest='iterations',
+            help="""Number of renderings of each template""",
+        )
+
+    def handle(self, **options):
+        loaders = settings.TEMPLATES[0]['OPTIONS'].get('loaders')
+        self.stdout.write("Template loaders: {}".format("cached" if loaders else "not cached"))
+        durations = measure_template_rendering(options['iterations'])
+        for template_name, duration in durations.items():
+            self.stdout.write("{:<25} first: {:7.2f} ms   next: {:7.2f} ms".format(
+                template_name, duration['first'] * 1e3, duration['mean'] * 1e3))
@@ -0,0 +1,22 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import os
+from django.core.management.base import BaseCommand
+from ...utils.bundles import build_bundles, brotli, get_bundles_root
+
+class Command(BaseCommand):
+    """
+    This class builds the CSS and JS bundles of settings.STATIC_BUNDLES in static/bundles/
+    (to be run before collectstatic when a CSS or JS file changes)
+    """
+
+    def handle(self, **options):
+        manifest = build_bundles()
+        root = get_bundles_root()
+        for name, hashed_name in sorted(manifest.items()):
+            sizes = [os.path.getsize(os.path.join(root, hashed_name + suffix))
+                     for suffix in ('', '.gz', '.br') if suffix != '.br' or brotli]
+            self.stdout.write("{} -> {} ({})".format(name, hashed_name, ", ".join(
+                "{:.1f} kB".format(size / 1024) for size in sizes)))
+        if not brotli:
+            self.stdout.write("The brotli module is not installed: only the gzip versions were written")
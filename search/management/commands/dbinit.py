@@ -2,10 +2,17 @@
 # coding: utf-8
 import requests
 import math
-import unicodedata
-from django.core.management.base import BaseCommand
+import os
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 from django.contrib.auth.models import User
-from ...models import Product, Category, Profile
+from ...models import Product, Category, RejectedCategory
+from ...utils.resilience import ApiUnavailable, get_json
+from ...utils.http_cache import HttpCache
+from ...utils.search_index import get_search_index
+from ...utils.normalizer import normalize
 
 class DBInit:
     """
@@ -15,6 +22,31 @@ class DBInit:
         -> Respect the limitations of 10k rows from freemium account on Heroku
         -> Get the most common datas in order to minimize API Call during navigation
     """
+
+    # The pages of 1000 products are heavy so the timeout is larger than during navigation
+    # and a failed call is retried several times
+    timeout = (5, 60)
+    retries = 3
+
+    # Selection of the categories and products
+    min_product_number = 150
+    max_product_number = 1000
+    products_per_page = 1000
+    min_healthy_products = 6
+    max_healthy_products = 6
+    max_dirty_products = 6
+
+    # Number of days after which a category is synchronized even if its
+    # number of products did not change
+    sync_max_age = 7
+
+    def __init__(self, cache=None):
+        """
+        cache is an optional HttpCache used to replay the API responses
+        from a previous run
+        """
+        self.session = requests.Session()
+        self.cache = cache
     
     def clean_db(self):
         """
@@ -24,6 +56,7 @@ class DBInit:
         categories = Category.objects.all()
         products = Product.objects.all()
         users = User.objects.all()
+        RejectedCategory.objects.all().delete()
         if categories:
             categories.delete()
         if products:
@@ -37,29 +70,13 @@ class DBInit:
         categories in the database
         """
 
-        min_product_number = 150
-        max_product_number = 1000
-        products_per_page = 1000
-        min_healthy_products = 6
-
         print("### Start Categories Selection ###")
         categories = self._get_categories_from_api()
+        rejected = self._get_rejected_categories()
 
         for category in categories["tags"]:
             print("looking for category : {}".format(category["name"]))
-            healthy_products = 0
-            if category["products"] > min_product_number and category["products"] < max_product_number:
-                print("HEY -> Maybe this one")
-                page_number = self._get_product_pages_number(category["products"], products_per_page)
-                page = 1
-                while page <= page_number and healthy_products < min_healthy_products:
-                    print("Page : {} | Total Pages : {}".format(page, page_number))
-                    products_data = self._get_from_api_products_info_from_page_category(category["id"], products_per_page, page)
-                    healthy_products += self._count_healthy_products(products_data["products"])
-                    page +=1
-                    print("healthy products found : {}".format(healthy_products))
-
-            if healthy_products >= min_healthy_products:
+            if self._check_new_category(category, rejected):
                 category["name"] = self._clean_name(category["name"])
                 self._inject_categories(category)
                 print("SUCCESS : category injected : {}".format(category["name"]))
@@ -74,9 +91,9 @@ class DBInit:
 
         print("### Start Products Selection ###")
 
-        products_per_page = 1000
-        max_healthy_products = 6
-        max_dirty_products = 6
+        products_per_page = self.products_per_page
+        max_healthy_products = self.max_healthy_products
+        max_dirty_products = self.max_dirty_products
 
         categories = Category.objects.all()
         for category in categories:
@@ -102,21 +119,243 @@ class DBInit:
                                 self._inject_products(product)
                                 dirty_products += 1
                                 print("SUCCESS product {} injected".format(product["product_name_fr"]))
-                        except:
-                            pass
+                        except (KeyError, TypeError, AttributeError) as error:
+                            # An incomplete product from the API is skipped
+                            print("product {} skipped: {!r}".format(product.get("code"), error))
                     page +=1
             else:
                 print("the {} category already has enough products".format(category.name))
         
         print("### Selected Products Injected ###")
     
+    def set_categories_hierarchy(self):
+        """
+        This public method links each category of the database to its nearest
+        parents in the database, thanks to the categories taxonomy of the API.
+        The links are used by the in-memory category graph
+        """
+
+        print("### Start Categories Hierarchy ###")
+        try:
+            taxonomy = self._get_categories_taxonomy_from_api()
+        except ApiUnavailable:
+            print("the categories taxonomy is unavailable, the hierarchy is not updated")
+            return
+
+        categories = {category.api_id: category for category in Category.objects.all()}
+        for api_id, category in categories.items():
+            parents = set()
+            visited = set()
+            to_visit = list(taxonomy.get(api_id, {}).get("parents", []))
+            while to_visit:
+                parent = to_visit.pop()
+                if parent in visited:
+                    continue
+                visited.add(parent)
+                if parent in categories:
+                    parents.add(categories[parent])
+                else:
+                    to_visit.extend(taxonomy.get(parent, {}).get("parents", []))
+            category.parents.set(parents)
+
+        print("### Categories Hierarchy Injected ###")
+
+    def build_search_index(self):
+        """
+        This public method builds the inverted index of the categories and products
+        names used by the search, once all the elements are in the database
+        """
+        get_search_index().rebuild()
+
+    def sync(self):
+        """
+        This public method updates the database from the API without rebuilding it.
+        Only what changed is requested and written:
+            -> the categories which disappeared from the API are deleted
+            -> the categories whose number of products changed (or not synchronized
+                for sync_max_age days) get their products updated
+            -> the new appropriate categories are injected with their products
+                (a category already rejected is only checked again if its number of products changed)
+            -> the products which are not in any category anymore are deleted,
+                except if a user registered them
+        The users and their registered products are never deleted
+        """
+
+        print("### Start Synchronization ###")
+        categories = self._get_categories_from_api()
+        api_categories = {category["id"]: category for category in categories["tags"]}
+        db_categories = {category.api_id: category for category in Category.objects.all()}
+        outdated = timezone.now() - datetime.timedelta(days=self.sync_max_age)
+        products_removed = set()
+
+        for api_id, category in db_categories.items():
+            if api_id not in api_categories:
+                products_removed.update(category.products.values_list('id', flat=True))
+                category.delete()
+                print("category deleted : {}".format(category.name))
+            elif (api_categories[api_id]["products"] != category.total_products
+                    or category.last_synced is None or category.last_synced < outdated):
+                category.total_products = api_categories[api_id]["products"]
+                products_removed.update(self._sync_category_products(category))
+            else:
+                print("category up to date : {}".format(category.name))
+
+        rejected = self._get_rejected_categories()
+        # The categories which disappeared from the API are forgotten
+        RejectedCategory.objects.filter(
+            api_id__in=[api_id for api_id in rejected if api_id not in api_categories]).delete()
+        for api_id, category in api_categories.items():
+            if api_id not in db_categories:
+                print("looking for category : {}".format(category["name"]))
+                if self._check_new_category(category, rejected):
+                    category["name"] = self._clean_name(category["name"])
+                    self._inject_categories(category)
+                    print("SUCCESS : category injected : {}".format(category["name"]))
+                    self._sync_category_products(Category.objects.get(api_id=api_id))
+
+        Product.objects.filter(id__in=products_removed, categories=None, favourite_count=0).delete()
+        print("### Synchronization Done ###")
+
+    def _sync_category_products(self, category):
+        """
+        This method updates the products of a category from the API:
+            -> the products already in the database are updated if they changed
+            -> new products are injected until there are enough healthy and dirty products
+            -> the products which are not in the category anymore are detached from it
+        It returns the ids of the detached products
+        """
+        print("synchronizing category : {}".format(category.name))
+        db_products = {product.ref: product for product in category.products.all()}
+        healthy_products = len([product for product in db_products.values() if product.nutriscore == "a"])
+        dirty_products = len([product for product in db_products.values() if product.nutriscore in ("d", "e")])
+        products_seen = set()
+
+        page_number = self._get_product_pages_number(category.total_products, self.products_per_page)
+        page = 1
+        while page <= page_number and (len(products_seen) < len(db_products)
+                                       or healthy_products < self.max_healthy_products
+                                       or dirty_products < self.max_dirty_products):
+            products_data = self._get_from_api_products_info_from_page_category(category.api_id, self.products_per_page, page)
+            codes = [product.get("code") for product in products_data["products"]]
+            other_products = {product.ref: product for product in Product.objects.filter(ref__in=codes)}
+            for product in products_data["products"]:
+                try:
+                    if product["code"] in db_products:
+                        products_seen.add(product["code"])
+                        if self._update_product(db_products[product["code"]], product):
+                            print("product {} updated".format(product["code"]))
+                    elif product["code"] in other_products:
+                        self._update_product(other_products[product["code"]], product)
+                        other_products[product["code"]].categories.add(category)
+                    elif product["nutrition_grade_fr"] == "a" and healthy_products < self.max_healthy_products:
+                        product["product_name_fr"] = self._clean_name(product["product_name_fr"])
+                        self._inject_products(product)
+                        healthy_products += 1
+                        print("SUCCESS product {} injected".format(product["product_name_fr"]))
+                    elif product["nutrition_grade_fr"] in ("d", "e") and dirty_products < self.max_dirty_products:
+                        product["product_name_fr"] = self._clean_name(product["product_name_fr"])
+                        self._inject_products(product)
+                        dirty_products += 1
+                        print("SUCCESS product {} injected".format(product["product_name_fr"]))
+                except (KeyError, TypeError, AttributeError) as error:
+                    # An incomplete product from the API is skipped
+                    print("product {} skipped: {!r}".format(product.get("code"), error))
+            page += 1
+
+        # We can only know that a product left the category if all the pages had been read
+        products_detached = []
+        if page > page_number:
+            for ref, product in db_products.items():
+                if ref not in products_seen:
+                    product.categories.remove(category)
+                    products_detached.append(product.id)
+
+        category.last_synced = timezone.now()
+        category.save()
+        return products_detached
+
+    def _update_product(self, product, data):
+        """
+        This method updates a product from the database with the data from the API.
+        It only writes in the database if something changed
+        """
+        fields = {
+            'name': self._clean_name(data["product_name_fr"]),
+            'nutriscore': data["nutrition_grade_fr"],
+            'picture': data.get("image_url"),
+            'description': data.get("generic_name_fr"),
+        }
+        fields.update(self._get_product_details(data))
+        details_updated = fields.pop('details_updated')
+
+        changed = [field for field, value in fields.items() if getattr(product, field) != value]
+        if changed:
+            for field in changed:
+                setattr(product, field, fields[field])
+            product.details_updated = details_updated
+            product.save(update_fields=changed + ['details_updated'])
+        return bool(changed)
+
+    def _get_rejected_categories(self):
+        """
+        This method returns the number of products of each category rejected by a previous run
+        """
+        return dict(RejectedCategory.objects.values_list('api_id', 'total_products'))
+
+    def _check_new_category(self, category, rejected):
+        """
+        This method checks a category which is not in the database. The categories whose
+        products have to be downloaded to be checked are remembered when they are rejected,
+        they are not checked again while their number of products does not change
+        """
+        if not self.min_product_number < category["products"] < self.max_product_number:
+            return False
+        if rejected.get(category["id"]) == category["products"]:
+            print("category already rejected : {}".format(category["name"]))
+            return False
+        if self._check_category(category):
+            RejectedCategory.objects.filter(api_id=category["id"]).delete()
+            return True
+        RejectedCategory.objects.update_or_create(api_id=category["id"], defaults={
+            'total_products': category["products"], 'checked_at': timezone.now()})
+        return False
+
+    def _check_category(self, category):
+        """
+        This method checks if a category from the API is appropriate:
+            -> its number of products is between min_product_number and max_product_number
+            -> it has at least min_healthy_products products with a nutriscore "a"
+        """
+        healthy_products = 0
+        if category["products"] > self.min_product_number and category["products"] < self.max_product_number:
+            print("HEY -> Maybe this one")
+            page_number = self._get_product_pages_number(category["products"], self.products_per_page)
+            page = 1
+            while page <= page_number and healthy_products < self.min_healthy_products:
+                print("Page : {} | Total Pages : {}".format(page, page_number))
+                products_data = self._get_from_api_products_info_from_page_category(category["id"], self.products_per_page, page)
+                healthy_products += self._count_healthy_products(products_data["products"])
+                page +=1
+                print("healthy products found : {}".format(healthy_products))
+
+        return healthy_products >= self.min_healthy_products
+
     def _get_categories_from_api(self):
         """
         This method requests the API to get all the categories
         """
 
-        request = requests.get("https://fr.openfoodfacts.org/categories.json")
-        data = request.json()
+        data = self._get_json_from_api("https://fr.openfoodfacts.org/categories.json")
+
+        return data
+
+    def _get_categories_taxonomy_from_api(self):
+        """
+        This method requests the API to get the taxonomy of the categories
+        (with the parents of each category)
+        """
+
+        data = self._get_json_from_api("https://static.openfoodfacts.org/data/taxonomies/categories.json")
 
         return data
 
@@ -135,10 +374,19 @@ class DBInit:
             'json' : '1'
         }
 
-        request = requests.get("https://fr.openfoodfacts.org/cgi/search.pl?", params=payload)
-        data = request.json()
+        data = self._get_json_from_api("https://fr.openfoodfacts.org/cgi/search.pl", payload)
         return data
 
+    def _get_json_from_api(self, url, params=None):
+        """
+        This method requests the API, through the cache if there is one
+        """
+        if self.cache:
+            return self.cache.get_json(self.session, url, params=params,
+                                       timeout=self.timeout, retries=self.retries, backoff=1)
+        return get_json(self.session, url, params=params,
+                        timeout=self.timeout, retries=self.retries, backoff=1)
+
     def _get_product_pages_number(self, total_products, products_per_page):
         """
         This method calculates the number of pages to get all the products
@@ -185,7 +433,8 @@ class DBInit:
                                 ref=product["code"],
                                 nutriscore=product["nutrition_grade_fr"],
                                 picture=product["image_url"],
-                                description=product["generic_name_fr"])
+                                description=product["generic_name_fr"],
+                                **self._get_product_details(product))
                 
             for category in product["categories_hierarchy"]:
                 try:
@@ -194,19 +443,38 @@ class DBInit:
                 except:
                     pass
 
+    def _get_product_details(self, product):
+        """
+        This method gets the information displayed on the product page from the
+        product returned by the API, so the page can be served from the database
+        """
+        # The API can send null instead of an empty value
+        nutriments = product.get("nutriments") or {}
+        details = {
+            'ingredients': (product.get("ingredients_text_fr") or "").strip() or "Information manquante",
+            'ingredients_picture': (product.get("image_ingredients_url") or "").strip() or "Image manquante",
+            'nutriments_picture': (product.get("image_nutrition_url") or "").strip() or "Image manquante",
+            'details_updated': timezone.now(),
+        }
+        nutriments_keys = {
+            'fat': 'fat_100g',
+            'saturated_fat': 'saturated-fat_100g',
+            'sugar': 'sugars_100g',
+            'salt': 'salt_100g',
+        }
+        for field, key in nutriments_keys.items():
+            try:
+                details[field] = float(nutriments[key])
+            except (KeyError, TypeError, ValueError):
+                details[field] = None
+
+        return details
+
     def _clean_name(self, name):
         """
         This method cleans a name before inject it into the database
         """
-        name = name.lower()
-        try:
-            name = unicode(name, 'utf-8')
-        except NameError:
-            pass
-        name = unicodedata.normalize('NFD', name)
-        name = name.encode('ascii', 'ignore')
-        name = name.decode('utf-8')
-        return str(name)
+        return normalize(name)
 
 
 class Command(BaseCommand):
@@ -223,12 +491,48 @@ class Command(BaseCommand):
             help="""All the elements from the database are deleted before
             the update""",
         )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            dest='sync',
+            help="""Only the categories and products which changed in the API are
+            updated. The users and their products are kept""",
+        )
+        parser.add_argument(
+            '--nocache',
+            action='store_true',
+            dest='nocache',
+            help="""The API responses are downloaded again instead of being
+            replayed from the cache of the previous runs""",
+        )
+        parser.add_argument(
+            '--cache-max-age',
+            type=int,
+            default=12 * 3600,
+            dest='cache_max_age',
+            help="""Age (in seconds) under which a cached API response is replayed
+            without being revalidated""",
+        )
 
     def handle(self, **options):
-        db_init = DBInit()
+        cache = None
+        if not options['nocache']:
+            cache = HttpCache(os.path.join(settings.BASE_DIR, 'cache', 'dbinit'),
+                              max_age=options['cache_max_age'])
+        db_init = DBInit(cache)
+
+        if options['sync']:
+            if options['cleandb']:
+                raise CommandError("--sync and --cleandb can not be used together")
+            db_init.sync()
+            db_init.set_categories_hierarchy()
+            db_init.build_search_index()
+            return
     
         if options['cleandb']:
             db_init.clean_db()
     
         db_init.set_categories()
-        db_init.set_products()
\ No newline at end of file
+        db_init.set_products()
+        db_init.set_categories_hierarchy()
+        db_init.build_search_index()
\ No newline at end of file
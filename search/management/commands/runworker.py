@@ -0,0 +1,84 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection, close_old_connections
+from ...utils.jobs import claim_jobs, run_job, purge_jobs
+from ...utils.mail_queue import send_queued_emails, purge_emails
+
+class Command(BaseCommand):
+    """
+    This class runs the background jobs (see search/tasks.py) with several threads
+    and sends the queued emails
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=2,
+            dest='threads',
+            help="""Number of jobs run at the same time""",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1,
+            dest='interval',
+            help="""Time (in seconds) between two checks of the queue when it is empty""",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            help="""The worker stops once there is no job to run""",
+        )
+        parser.add_argument(
+            '--mail-interval',
+            type=float,
+            default=10,
+            dest='mail_interval',
+            help="""Time (in seconds) between two checks of the queued emails""",
+        )
+        parser.add_argument(
+            '--purge-interval',
+            type=float,
+            default=600,
+            dest='purge_interval',
+            help="""Time (in seconds) between two deletions of the old finished jobs
+            and of the old failed emails""",
+        )
+
+    def handle(self, **options):
+        # The emails and the purge do not need to be checked at each poll of the jobs
+        last_mail = last_purge = None
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            while True:
+                close_old_connections()
+                jobs = claim_jobs(options['threads'])
+                if options['threads'] > 1:
+                    jobs = list(executor.map(self._run_job_in_thread, jobs))
+                else:
+                    jobs = [run_job(job) for job in jobs]
+                for job in jobs:
+                    self.stdout.write("{} #{}: {}".format(job.name, job.id, job.status))
+                now = time.monotonic()
+                if last_mail is None or now - last_mail >= options['mail_interval']:
+                    send_queued_emails()
+                    last_mail = now
+                if last_purge is None or now - last_purge >= options['purge_interval']:
+                    purge_jobs()
+                    purge_emails()
+                    last_purge = now
+                if not jobs:
+                    if options['once']:
+                        return
+                    time.sleep(options['interval'])
+
+    def _run_job_in_thread(self, job):
+        # Each thread has its own connection to the database
+        try:
+            return run_job(job)
+        finally:
+            connection.close()
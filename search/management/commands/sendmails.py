@@ -0,0 +1,43 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import time
+from django.core.management.base import BaseCommand
+from ...utils.mail_queue import send_queued_emails
+
+class Command(BaseCommand):
+    """
+    This class sends the emails queued by the views (activation emails)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            dest='loop',
+            help="""The queue is checked again every --interval seconds
+            instead of stopping once it is empty""",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            dest='interval',
+            help="""Time (in seconds) between two checks of the queue""",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            dest='batch_size',
+            help="""Maximum number of emails sent over one connection""",
+        )
+
+    def handle(self, **options):
+        while True:
+            sent, failed = send_queued_emails(options['batch_size'])
+            if sent or failed:
+                self.stdout.write("{} email(s) sent, {} failed".format(sent, failed))
+            if failed or sent < options['batch_size']:
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
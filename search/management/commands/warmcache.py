@@ -0,0 +1,40 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.core.management.base import BaseCommand
+from ...utils.query_log import query_logger, replay_top_queries
+
+class Command(BaseCommand):
+    """
+    This class replays the most frequent queries logged by the views, so that
+    the first users after a deploy do not wait for the API
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            dest='top',
+            help="""Number of searches, substitute lists and product pages replayed""",
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            dest='concurrency',
+            help="""Number of queries replayed at the same time""",
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=500,
+            dest='keep',
+            help="""Number of queries of each kind kept in the logs, the others are deleted""",
+        )
+
+    def handle(self, **options):
+        replayed, from_database = replay_top_queries(options['top'], options['concurrency'])
+        self.stdout.write("{} queries replayed, {} found in the database".format(replayed, from_database))
+        deleted = query_logger.trim(options['keep'])
+        if deleted:
+            self.stdout.write("{} old queries deleted from the logs".format(deleted))
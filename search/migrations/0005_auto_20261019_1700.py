@@ -0,0 +1,53 @@
+# Generated by Django 2.1.2 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_remove_product_had_been_registered'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='details_updated',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='fat',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='ingredients',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='ingredients_picture',
+            field=models.URLField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='nutriments_picture',
+            field=models.URLField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='salt',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='saturated_fat',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sugar',
+            field=models.FloatField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.2 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0005_auto_20261019_1700'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='last_synced',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.2 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0006_category_last_synced'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='parents',
+            field=models.ManyToManyField(blank=True, related_name='children', to='search.Category'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.1.2 on 2026-10-19 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0007_category_parents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+                ('element_type', models.CharField(max_length=10)),
+                ('element_id', models.IntegerField()),
+                ('frequency', models.IntegerField(default=1)),
+                ('length', models.IntegerField(default=1)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchindexentry',
+            index=models.Index(fields=['element_type', 'token'], name='search_sear_element_1aa77d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchindexentry',
+            index=models.Index(fields=['element_type', 'element_id'], name='search_sear_element_241327_idx'),
+        ),
+    ]
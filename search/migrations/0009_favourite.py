@@ -0,0 +1,55 @@
+# Generated by Django 2.1.2 on 2026-10-19 17:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_registered_products(apps, schema_editor):
+    """
+    The products registered before are copied in the same order (the order of their ids),
+    with the date of the migration
+    """
+    Profile = apps.get_model('search', 'Profile')
+    Favourite = apps.get_model('search', 'Favourite')
+    links = Profile.products.through.objects.order_by('id').values_list('profile_id', 'product_id')
+    Favourite.objects.bulk_create([Favourite(profile_id=profile_id, product_id=product_id)
+                                   for profile_id, product_id in links], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0008_searchindexentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Favourite',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='search.Product')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='search.Profile')),
+            ],
+        ),
+        migrations.RunPython(copy_registered_products, migrations.RunPython.noop),
+        # A ManyToManyField can not be altered to use a through model
+        migrations.RemoveField(
+            model_name='profile',
+            name='products',
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='products',
+            field=models.ManyToManyField(blank=True, related_name='users', through='search.Favourite', to='search.Product'),
+        ),
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(fields=['profile', '-created_at', '-id'], name='search_favo_profile_bd815b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='favourite',
+            unique_together={('profile', 'product')},
+        ),
+    ]
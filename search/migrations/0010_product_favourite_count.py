@@ -0,0 +1,31 @@
+# Generated by Django 2.1.2 on 2026-10-19 17:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def set_favourite_count(apps, schema_editor):
+    """
+    The number of users who registered each product is calculated once,
+    then it is kept up to date by the Favourite signals
+    """
+    Product = apps.get_model('search', 'Product')
+    products = Product.objects.annotate(favourites=Count('favourite')).filter(favourites__gt=0)
+    for product_id, favourites in products.values_list('id', 'favourites'):
+        Product.objects.filter(id=product_id).update(favourite_count=favourites)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0009_favourite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='favourite_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(set_favourite_count, migrations.RunPython.noop),
+    ]
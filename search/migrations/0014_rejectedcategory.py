@@ -0,0 +1,23 @@
+# Generated by Django 2.1.2 on 2026-10-19 18:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0013_querylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RejectedCategory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('api_id', models.CharField(max_length=200, unique=True)),
+                ('total_products', models.IntegerField()),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
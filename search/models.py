@@ -7,6 +7,8 @@ class Category(models.Model):
     api_id = models.CharField(max_length=200)
     total_products = models.IntegerField(default=0)
     enough_good_nutriscore = models.BooleanField(default=False)
+    last_synced = models.DateTimeField(null=True)
+    parents = models.ManyToManyField('self', symmetrical=False, related_name='children', blank=True)
 
     def __str__(self):
         return self.name
@@ -17,7 +19,17 @@ class Product(models.Model):
     nutriscore = models.CharField(max_length=1)
     description = models.TextField(null=True)
     picture = models.URLField(null=True)
+    ingredients = models.TextField(null=True)
+    ingredients_picture = models.URLField(null=True)
+    nutriments_picture = models.URLField(null=True)
+    fat = models.FloatField(null=True)
+    saturated_fat = models.FloatField(null=True)
+    sugar = models.FloatField(null=True)
+    salt = models.FloatField(null=True)
+    details_updated = models.DateTimeField(null=True)
     last_interaction = models.DateTimeField(default=timezone.now)
+    # Number of users who registered the product (kept up to date by the Favourite signals)
+    favourite_count = models.IntegerField(default=0, db_index=True)
     categories = models.ManyToManyField(Category, related_name='products', blank=True)
 
     def __str__(self):
@@ -25,7 +37,124 @@ class Product(models.Model):
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    products = models.ManyToManyField(Product, related_name='users', blank=True)
+    products = models.ManyToManyField(Product, related_name='users', blank=True, through='Favourite')
 
     def __str__(self):
-        return self.user.username
\ No newline at end of file
+        return self.user.username
+
+class Favourite(models.Model):
+    """
+    A product registered by a user, with the time it was saved
+    """
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('profile', 'product')
+        indexes = [
+            # The favourites pages are read from the most recent one
+            models.Index(fields=['profile', '-created_at', '-id']),
+        ]
+
+    def __str__(self):
+        return "{} - {}".format(self.profile, self.product)
+
+
+class SearchIndexEntry(models.Model):
+    """
+    A row of the inverted index: a normalized token found in the name
+    of a category or a product
+    """
+    token = models.CharField(max_length=100)
+    element_type = models.CharField(max_length=10)
+    element_id = models.IntegerField()
+    frequency = models.IntegerField(default=1)
+    length = models.IntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['element_type', 'token']),
+            models.Index(fields=['element_type', 'element_id']),
+        ]
+
+    def __str__(self):
+        return self.token
+
+class QueuedEmail(models.Model):
+    """
+    An email waiting to be sent by the sendmails command (see utils/mail_queue.py).
+    next_attempt is null when all the attempts failed
+    """
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    from_email = models.CharField(max_length=200, blank=True)
+    to = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, null=True, db_index=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.subject
+
+class Job(models.Model):
+    """
+    A task run in background by the runworker command (see utils/jobs.py).
+    The arguments and the result are stored in json
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    name = models.CharField(max_length=100)
+    arguments = models.TextField(default='{}')
+    # The username of the user who asked for the job (only he can read its status)
+    owner = models.CharField(max_length=150, blank=True)
+    status = models.CharField(max_length=10, default=QUEUED)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # The worker takes the queued jobs which are due
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return "{} ({})".format(self.name, self.status)
+
+class QueryLog(models.Model):
+    """
+    The number of times a search, a substitute list or a product page was asked
+    (see utils/query_log.py). hits are the times it was found in the database,
+    misses the times the API was requested
+    """
+    kind = models.CharField(max_length=20)
+    query = models.CharField(max_length=200)
+    hits = models.IntegerField(default=0)
+    misses = models.IntegerField(default=0)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('kind', 'query')
+
+    def __str__(self):
+        return "{}: {}".format(self.kind, self.query)
+
+class RejectedCategory(models.Model):
+    """
+    A category of the API checked by dbinit and rejected (not enough healthy products).
+    It is only checked again when its number of products changes
+    """
+    api_id = models.CharField(max_length=200, unique=True)
+    total_products = models.IntegerField()
+    checked_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.api_id
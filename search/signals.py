@@ -0,0 +1,19 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.db.models import F
+from .models import Product
+
+def increment_favourite_count(sender, instance, created=False, **kwargs):
+    """
+    This function is connected to the post_save signal of Favourite: the product
+    has one more user who registered it
+    """
+    if created:
+        Product.objects.filter(id=instance.product_id).update(favourite_count=F('favourite_count') + 1)
+
+def decrement_favourite_count(sender, instance, **kwargs):
+    """
+    This function is connected to the post_delete signal of Favourite (also sent
+    when a user or a profile is deleted)
+    """
+    Product.objects.filter(id=instance.product_id).update(favourite_count=F('favourite_count') - 1)
@@ -0,0 +1,39 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+The tasks which can be run in background by the runworker command (see utils/jobs.py).
+This module is imported by SearchConfig.ready() to register them
+"""
+from .utils.jobs import task
+from .utils.api_interactions import OpenFoodFactsInteractions
+from .utils.resilience import ApiUnavailable
+from .utils.db_interactions import DBInteractions
+from .utils.treatment import Treatment
+
+@task
+def register_product(username, product_ref):
+    """
+    This task registers a product to a user: the row counting, the eviction
+    and the request of the product from the API are done out of the request
+    """
+    return Treatment().register_product(username, product_ref)
+
+@task
+def refresh_product_details(product_ref):
+    """
+    This task updates the product details stored in the database from the API.
+    If the product is not in the API anymore or the API is unavailable, the attempt is
+    marked on the product so the page does not request a refresh at each view
+    (the job is still tried again later when the API is unavailable)
+    """
+    db_interactions = DBInteractions()
+    try:
+        product_info = OpenFoodFactsInteractions().get_selected_product(product_ref)
+    except ApiUnavailable:
+        db_interactions.postpone_product_details_refresh(product_ref)
+        raise
+    if product_info:
+        db_interactions.set_product_details(product_info)
+    else:
+        db_interactions.postpone_product_details_refresh(product_ref)
+    return bool(product_info)
@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+from ..utils.bundles import get_bundle_paths
+
+register = template.Library()
+
+TAGS = {
+    '.css': '<link href="{}" rel="stylesheet">',
+    '.js': '<script src="{}"></script>',
+}
+
+def _extension(name):
+    return '.css' if name.endswith('.css') else '.js'
+
+@register.simple_tag
+def bundle(name):
+    """
+    This tag loads a bundle of settings.STATIC_BUNDLES (or its source files if it is not built)
+    """
+    return format_html_join('\n', TAGS[_extension(name)], ((static(path),) for path in get_bundle_paths(name)))
+
+@register.simple_tag
+def preload_bundles():
+    """
+    This tag asks the browser to download the bundles built from the head of the page,
+    before it reaches the scripts at the bottom of the body
+    """
+    links = []
+    for name in settings.STATIC_BUNDLES:
+        paths = get_bundle_paths(name)
+        if paths != list(settings.STATIC_BUNDLES[name]):
+            links.append((static(paths[0]), 'style' if _extension(name) == '.css' else 'script'))
+    return format_html_join('\n', '<link rel="preload" href="{}" as="{}">', links)
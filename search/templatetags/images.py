@@ -0,0 +1,13 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django import template
+from ..utils.images import thumbnail_url
+
+register = template.Library()
+
+@register.filter
+def thumbnail(url, size):
+    """
+    This filter gives the url of the thumbnail of a product picture: {{ element.image_url|thumbnail:"card" }}
+    """
+    return thumbnail_url(url, size)
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+Budgets of the hot paths, for the regression tests (see test_query_budgets.py):
+    -> assertBudget checks the number of queries and of external calls (Open Food Facts)
+       of a call, the external calls fail as if the API was unreachable
+    -> assertConstantQueries checks that the number of queries of a call does not grow
+       with the data: the call is measured on datasets of several sizes
+"""
+
+from unittest.mock import patch
+import requests
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from ..utils.category_graph import category_graph
+from ..utils.catalogue import product_catalogue
+from ..utils.search_index import get_search_index
+
+class ExternalCalls:
+    """
+    This class counts the HTTP requests sent by the code (all of them go through
+    the requests transport adapter) and makes them fail without using the network
+    """
+
+    def __init__(self):
+        self.urls = []
+
+    def send(self, adapter, request, **kwargs):
+        self.urls.append(request.url)
+        raise requests.ConnectionError("external call during a budget test: {}".format(request.url))
+
+    def __len__(self):
+        return len(self.urls)
+
+class Budget:
+    """
+    This class is a context manager measuring the queries and the external calls of a block
+    """
+
+    def __init__(self):
+        self.queries = CaptureQueriesContext(connection)
+        self.external_calls = ExternalCalls()
+        calls = self.external_calls
+        self.patcher = patch('requests.adapters.HTTPAdapter.send',
+                             lambda adapter, request, **kwargs: calls.send(adapter, request, **kwargs))
+
+    def __enter__(self):
+        self.queries.__enter__()
+        self.patcher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.patcher.stop()
+        self.queries.__exit__(exc_type, exc_value, traceback)
+
+    def describe(self):
+        return "\n".join(["Queries:"] + ["  " + query['sql'] for query in self.queries.captured_queries]
+                         + ["External calls:"] + ["  " + url for url in self.external_calls.urls])
+
+class BudgetTestMixin:
+    """
+    This class adds the budget assertions to a TestCase
+    """
+
+    def assertBudget(self, func, *args, queries=None, external_calls=0, **kwargs):
+        """
+        This method calls func and checks its number of queries (at most) and of external calls.
+        It returns the result of func
+        """
+        with Budget() as budget:
+            result = func(*args, **kwargs)
+        if queries is not None and len(budget.queries) > queries:
+            self.fail("{} queries for a budget of {}\n{}".format(len(budget.queries), queries, budget.describe()))
+        if len(budget.external_calls) > external_calls:
+            self.fail("{} external calls for a budget of {}\n{}".format(
+                len(budget.external_calls), external_calls, budget.describe()))
+        return result
+
+    def assertConstantQueries(self, func, make_data, sizes=(10, 1000)):
+        """
+        This method checks that func(data) does the same number of queries whatever the size
+        of the data created by make_data(size). Each dataset is removed before the next one.
+        It returns the number of queries
+        """
+        counts = []
+        for size in sizes:
+            with transaction.atomic():
+                data = make_data(size)
+                # The bulk insertions do not reload the in-memory caches
+                category_graph.invalidate()
+                product_catalogue.invalidate()
+                get_search_index().invalidate()
+                with Budget() as budget:
+                    func(data)
+                counts.append((size, len(budget.queries), budget.describe()))
+                transaction.set_rollback(True)
+        category_graph.invalidate()
+        product_catalogue.invalidate()
+        get_search_index().invalidate()
+        if len({count for size, count, description in counts}) > 1:
+            self.fail("The number of queries grows with the data: {}\n{}".format(
+                ", ".join("{} for {}".format(count, size) for size, count, description in counts),
+                counts[-1][2]))
+        return counts[0][1]
@@ -0,0 +1,165 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import gzip
+import json
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from ..models import Product, Profile, Favourite
+from ..utils.jobs import run_pending_jobs
+
+class ApiTestCase(TestCase):
+    """
+    This class tests the endpoints of the JSON API (v1)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('username-api', 'api@register.com', 'api-ref')
+        Profile(user=user).save()
+        for numb in range(8):
+            product = Product.objects.create(name="jus {}".format(numb), ref=str(numb), nutriscore="a",
+                                             description="un jus de fruits " * 10)
+            if numb < 7:
+                Favourite.objects.create(profile=user.profile, product=product)
+
+    def setUp(self):
+        self.selection = {
+            'type': 'product',
+            'number': 2,
+            'elements': [
+                {'name': 'jus 0', 'ref': '0', 'nutriscore': 'a', 'description': '', 'image_url': ''},
+                {'name': 'jus 7', 'ref': '7', 'nutriscore': 'a', 'description': '', 'image_url': ''},
+            ]
+        }
+
+    @patch('search.utils.treatment.Treatment.get_choice_selection')
+    def test_search_fields(self, mock_choice_selection):
+        mock_choice_selection.return_value = self.selection
+        response = self.client.get(reverse('api:search'), {'q': 'jus', 'fields': 'ref,name'})
+        self.assertEqual(response.json(), {
+            'type': 'product',
+            'number': 2,
+            'elements': [{'name': 'jus 0', 'ref': '0'}, {'name': 'jus 7', 'ref': '7'}],
+        })
+        mock_choice_selection.assert_called_once_with('jus')
+
+    def test_search_without_query(self):
+        response = self.client.get(reverse('api:search'))
+        self.assertEqual(response.status_code, 400)
+
+    @patch('search.utils.treatment.Treatment.get_choice_selection')
+    def test_search_etag(self, mock_choice_selection):
+        """
+        This method tests that the client which already has the response gets a 304
+        """
+        mock_choice_selection.return_value = self.selection
+        response = self.client.get(reverse('api:search'), {'q': 'jus'})
+        response = self.client.get(reverse('api:search'), {'q': 'jus'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    @patch('search.utils.treatment.Treatment.get_choice_selection')
+    def test_search_gzip(self, mock_choice_selection):
+        mock_choice_selection.return_value = {'type': 'product', 'number': 20,
+                                              'elements': self.selection['elements'] * 10}
+        response = self.client.get(reverse('api:search'), {'q': 'jus'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content).decode('utf-8'))['number'], 20)
+
+    @patch('search.utils.treatment.Treatment.get_substitute_selection')
+    def test_substitutes_registered(self, mock_substitute_selection):
+        mock_substitute_selection.return_value = self.selection
+        self.client.login(username='username-api', password='api-ref')
+        response = self.client.get(reverse('api:substitutes', args=['category', 'en:beverages']),
+                                   {'fields': 'ref,product_registered'})
+        self.assertEqual(response.json()['elements'], [{'ref': '0', 'product_registered': True},
+                                                       {'ref': '7', 'product_registered': False}])
+
+    def test_substitutes_unknown_type(self):
+        response = self.client.get(reverse('api:substitutes', args=['brand', 'ferrero']))
+        self.assertEqual(response.status_code, 404)
+
+    @patch('search.utils.treatment.Treatment.get_selected_product')
+    def test_product_not_found(self, mock_selected_product):
+        mock_selected_product.return_value = None
+        response = self.client.get(reverse('api:product', args=['00000']))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Product not found'})
+
+    @patch('search.utils.treatment.Treatment.get_selected_product')
+    def test_product_etag_before_search(self, mock_selected_product):
+        """
+        This method tests that a product stored in the database gets a 304
+        without being searched, and that the ETag changes with the favourites
+        """
+        mock_selected_product.return_value = {'ref': '0', 'name': 'jus 0'}
+        Product.objects.filter(ref='0').update(details_updated=timezone.now())
+        self.client.login(username='username-api', password='api-ref')
+        response = self.client.get(reverse('api:product', args=['0']))
+        self.assertEqual(response.json(), {'ref': '0', 'name': 'jus 0', 'product_registered': True})
+        etag = response['ETag']
+
+        # The version of the product, the user with the profile and the version of the favourites
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api:product', args=['0']), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(mock_selected_product.call_count, 1)
+
+        Favourite.objects.filter(product__ref='0').delete()
+        response = self.client.get(reverse('api:product', args=['0']), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['product_registered'], False)
+
+    def test_favourites_pages(self):
+        self.client.login(username='username-api', password='api-ref')
+        response = self.client.get(reverse('api:favourites'), {'fields': 'ref'})
+        page = response.json()
+        self.assertEqual(page['elements'], [{'ref': ref} for ref in "654321"])
+        response = self.client.get(reverse('api:favourites'), {'fields': 'ref', 'after': page['next_cursor']})
+        self.assertEqual(response.json(), {'number': 1, 'elements': [{'ref': '0'}], 'next_cursor': None})
+
+    def test_favourites_non_connected(self):
+        response = self.client.get(reverse('api:favourites'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_favourites_register_and_delete(self):
+        self.client.login(username='username-api', password='api-ref')
+        response = self.client.post(reverse('api:favourites'), '{"codes": ["7"]}', content_type='application/json')
+        self.assertEqual(response.json(), {'statuses': {'7': 'registered'}})
+        response = self.client.delete(reverse('api:favourite', args=['7']))
+        self.assertEqual(response.json(), {'status': 'success'})
+        response = self.client.put(reverse('api:favourite', args=['7']))
+        self.assertEqual(response.json(), {'status': 'registered'})
+        self.assertEqual(Favourite.objects.filter(product__ref='7').count(), 1)
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    @override_settings(JOBS_EAGER=False)
+    def test_favourite_registered_in_background(self, mock_api_selected_product):
+        """
+        This method tests that a product which is not in the database is registered
+        by a job, whose status is given by the API
+        """
+        mock_api_selected_product.return_value = None
+        self.client.login(username='username-api', password='api-ref')
+        response = self.client.put(reverse('api:favourite', args=['99999']))
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job']
+        self.assertEqual(self.client.get(reverse('api:job', args=[job_id])).json()['status'], 'queued')
+
+        run_pending_jobs()
+        self.assertEqual(self.client.get(reverse('api:job', args=[job_id])).json(), {
+            'id': job_id, 'name': 'register_product', 'status': 'done', 'result': 'product unavailable'})
+
+        self.client.logout()
+        User.objects.create_user('username-other', 'other@register.com', 'other-ref')
+        self.client.login(username='username-other', password='other-ref')
+        self.assertEqual(self.client.get(reverse('api:job', args=[job_id])).status_code, 404)
+
+    def test_favourites_bad_json(self):
+        self.client.login(username='username-api', password='api-ref')
+        response = self.client.post(reverse('api:favourites'), '{"codes": "7"}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
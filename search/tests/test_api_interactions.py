@@ -3,6 +3,7 @@
 from django.test import TestCase
 from unittest.mock import patch
 from search.utils.api_interactions import OpenFoodFactsInteractions
+from search.utils.resilience import ApiUnavailable
 
 class TestApiInteractions(TestCase):
     """
@@ -362,6 +363,32 @@ class TestApiInteractions(TestCase):
             ] 
         }
 
+    def test_select_appropriate_products_query_as_text(self):
+        """
+        This method tests that the query is not used as a regex and ignores the accents
+        """
+        data = {
+            "count": 2,
+            "products": [
+                {
+                    "product_name_fr": "Pâte à tartiner (750g)",
+                    "code": "1",
+                    "nutrition_grade_fr": "e",
+                    "categories_hierarchy": ["en:spreads"],
+                },
+                {
+                    "product_name_fr": "Nutella",
+                    "code": "2",
+                    "nutrition_grade_fr": "e",
+                    "categories_hierarchy": ["en:spreads"],
+                },
+            ]
+        }
+        result = self.api_interaction._select_appropriate_products(data, "pate a tartiner (750g")
+        self.assertEqual([element["ref"] for element in result["elements"]], ["1"])
+        result = self.api_interaction._select_appropriate_products(data, "(a|aa)*c")
+        self.assertEqual(result["number"], 0)
+
     @patch('search.utils.api_interactions.OpenFoodFactsInteractions._get_products_from_api_search')
     def test_get_products_selection(self, mock_get_products_from_api):
 
@@ -485,6 +512,70 @@ class TestApiInteractions(TestCase):
 
         self.assertEqual(self.api_interaction.get_substitute_products_from_api("product", code, 6), None)
 
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions._get_products_from_api_search')
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions._get_product_from_api_code_search')
+    def test_get_substitute_products_from_api_product_search_success(self, mock_api_code, mock_api_category):
+        """
+        This method tests that the most specific category with enough "a" products
+        is choosen when the categories are requested by batches
+        """
+
+        code = "3017620429484"
+        mock_api_code.return_value = {
+            "status": 1,
+            "status_verbose": "product found",
+            "product": {
+                "product_name_fr" : "Nutella",
+                "code": "3017620429484",
+                "categories_hierarchy": [
+                    "en:breakfasts",
+                    "en:spreads",
+                    "en:sweet-spreads",
+                    "fr:pates-a-tartiner",
+                    "en:chocolate-spreads",
+                ],
+            },
+        }
+
+        def category_products(query_type, category, page_size):
+            healthy_products = {"en:breakfasts": 6, "en:spreads": 7}.get(category, 0)
+            products = [
+                {
+                    "product_name_fr": "{} {}".format(category, numb),
+                    "code": "{}".format(numb),
+                    "nutrition_grade_fr": "a",
+                }
+                for numb in range(healthy_products)
+            ]
+            return {"count": len(products), "products": products}
+
+        mock_api_category.side_effect = category_products
+
+        result = self.api_interaction.get_substitute_products_from_api("product", code, 6)
+        self.assertEqual(result["number"], 6)
+        for product in result["elements"]:
+            self.assertTrue(product["name"].startswith("en:spreads"))
+        # The most specific category alone, then a batch of 3
+        self.assertEqual(mock_api_category.call_count, 4)
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions._get_products_from_api_search')
+    def test_get_categories_from_api_search_failures(self, mock_api_category):
+        """
+        This method tests that a failed category of a batch does not lose the others,
+        and that ApiUnavailable is raised when all of them failed
+        """
+        def category_products(query_type, category, page_size):
+            if category == "en:sweet-spreads":
+                raise ApiUnavailable("timeout")
+            return {"count": 0, "products": []}
+
+        mock_api_category.side_effect = category_products
+        self.assertEqual(self.api_interaction._get_categories_from_api_search(
+            ["en:spreads", "en:sweet-spreads", "en:breakfasts"]),
+            [{"count": 0, "products": []}, None, {"count": 0, "products": []}])
+        with self.assertRaises(ApiUnavailable):
+            self.api_interaction._get_categories_from_api_search(["en:sweet-spreads"])
+
     @patch('search.utils.api_interactions.OpenFoodFactsInteractions._get_product_from_api_code_search')
     def test_get_selected_product_success(self, mock_api_code):
 
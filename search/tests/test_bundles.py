@@ -0,0 +1,76 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from ..utils.bundles import minify_css, build_bundles, get_manifest, _rebase_urls
+
+BUNDLES = {
+    'site.css': ['magnific-popup/magnific-popup.css', 'css/creative.css'],
+    'site.js': ['magnific-popup/magnific-popup.min.js', 'js/creative.min.js'],
+}
+
+class TestBundles(SimpleTestCase):
+    """
+    This class groups the unit tests linked to the bundles of static files
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(STATIC_BUNDLES=BUNDLES, STATIC_BUNDLES_ROOT=self.root,
+                                              STATIC_BUNDLES_ENABLED=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_manifest.cache_clear()
+        self.addCleanup(get_manifest.cache_clear)
+
+    def test_minify_css(self):
+        css = """/* titre */
+        .card > h5 ,
+        .card-title {
+            font-family: 'Open Sans',  "Helvetica Neue";
+            background: url("data:image/svg+xml;charset=utf8,%3Csvg viewBox='0 0 30 30'%3E");
+        }"""
+        self.assertEqual(minify_css(css), """.card > h5,.card-title{font-family:'Open Sans',"Helvetica Neue";"""
+                                          """background:url("data:image/svg+xml;charset=utf8,%3Csvg viewBox='0 0 30 30'%3E")}""")
+
+    def test_rebase_urls(self):
+        self.assertEqual(_rebase_urls('a{background:url("../img/header.jpg")} b{background:url(data:x)}',
+                                      'css/creative.css'),
+                         'a{background:url("../img/header.jpg")} b{background:url(data:x)}')
+        self.assertEqual(_rebase_urls("a{background:url(img/close.png)}", 'magnific-popup/popup.css'),
+                         "a{background:url(../magnific-popup/img/close.png)}")
+
+    def test_build_bundles(self):
+        manifest = build_bundles()
+        self.assertRegex(manifest['site.css'], r'^site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, 'manifest.json')) as manifest_file:
+            self.assertEqual(json.load(manifest_file), manifest)
+        with open(os.path.join(self.root, manifest['site.js']), 'rb') as bundle, \
+                gzip.open(os.path.join(self.root, manifest['site.js'] + '.gz')) as compressed:
+            self.assertEqual(bundle.read(), compressed.read())
+        self.assertEqual(build_bundles(write=False), manifest)
+
+        # An old bundle is removed when the bundles are built again
+        old_bundle = os.path.join(self.root, 'site.0123456789ab.css')
+        open(old_bundle, 'w').close()
+        build_bundles()
+        self.assertFalse(os.path.exists(old_bundle))
+
+    def test_bundle_tag(self):
+        template = Template("{% load bundles %}{% preload_bundles %}|{% bundle 'site.css' %}")
+        self.assertEqual(template.render(Context()),
+                         '|<link href="/static/magnific-popup/magnific-popup.css" rel="stylesheet">\n'
+                         '<link href="/static/css/creative.css" rel="stylesheet">')
+
+        manifest = build_bundles()
+        self.assertEqual(template.render(Context()),
+                         '<link rel="preload" href="/static/bundles/{0}" as="style">\n'
+                         '<link rel="preload" href="/static/bundles/{1}" as="script">|'
+                         '<link href="/static/bundles/{0}" rel="stylesheet">'.format(
+                             manifest['site.css'], manifest['site.js']))
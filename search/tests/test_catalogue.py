@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from datetime import datetime, timedelta, timezone
+from django.test import TestCase, override_settings
+from ..models import Product, Category
+from ..utils.catalogue import ProductCatalogue, product_catalogue
+from ..utils.db_interactions import DBInteractions
+
+class TestProductCatalogue(TestCase):
+    """
+    This class groups the unit tests linked to the in-memory product catalogue
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        beverages = Category.objects.create(name="boissons", api_id="en:beverages", total_products=20000)
+        juices = Category.objects.create(name="jus de fruits", api_id="en:fruit-juices", total_products=3000)
+        products = [
+            ("jus d'orange", "1", "a", [beverages, juices]),
+            ("jus de pomme", "2", "c", [beverages, juices]),
+            ("eau gazeuse", "3", "a", [beverages]),
+            ("jus de raisin", "4", "a", [beverages, juices]),
+        ]
+        for name, ref, nutriscore, categories in products:
+            product = Product.objects.create(name=name, ref=ref, nutriscore=nutriscore, description="",
+                                             picture="https://static.openfoodfacts.org/images/front.jpg")
+            product.categories.add(*categories)
+
+    def setUp(self):
+        self.catalogue = ProductCatalogue(memory_budget=1024 * 1024)
+
+    def tearDown(self):
+        # The database is rolled back after each test without any signal
+        product_catalogue.invalidate()
+
+    def test_load(self):
+        data = self.catalogue.get_data()
+        self.assertEqual(list(data.refs), ["1", "2", "3", "4"])
+        self.assertEqual(data.nutriscores.tobytes(), b"acaa")
+        self.assertEqual(self.catalogue.get_product_categories(data, "3"), ["en:beverages"])
+        self.assertEqual(self.catalogue.get_product_categories(data, "99"), None)
+
+    def test_search(self):
+        data = self.catalogue.get_data()
+        products = self.catalogue.search_products(data, ["pomme", "raisin"])
+        self.assertEqual([product.ref for product in products], ["2", "4"])
+        categories = self.catalogue.search_categories(data, ["jus"])
+        self.assertEqual([category.api_id for category in categories], ["en:fruit-juices"])
+
+    def test_get_healthy_products(self):
+        data = self.catalogue.get_data()
+        products = self.catalogue.get_healthy_products(data, "en:fruit-juices", 6)
+        self.assertEqual([product.ref for product in products], ["1", "4"])
+        self.assertEqual(self.catalogue.get_healthy_products(data, "en:unknown", 6), None)
+
+    def test_memory_budget(self):
+        """
+        This method tests that the catalogue is not used when it is bigger than its budget
+        """
+        self.assertEqual(ProductCatalogue(memory_budget=1024).get_data(), None)
+        self.assertEqual(ProductCatalogue(memory_budget=0).get_data(), None)
+
+    def test_flush_interactions(self):
+        """
+        This method tests that the last interaction of the products returned
+        by the catalogue is saved at the flush
+        """
+        limit = datetime.now(timezone.utc) - timedelta(days=1)
+        Product.objects.update(last_interaction=limit)
+        data = self.catalogue.get_data()
+        self.catalogue.get_healthy_products(data, "en:fruit-juices", 6)
+        self.catalogue.flush_interactions()
+        recent = Product.objects.filter(last_interaction__gt=limit).values_list('ref', flat=True)
+        self.assertEqual(sorted(recent), ["1", "4"])
+
+    def test_flush_interactions_by_size(self):
+        """
+        This method tests that the last interactions are saved without waiting
+        for a reload once flush_size products were seen
+        """
+        limit = datetime.now(timezone.utc) - timedelta(days=1)
+        Product.objects.update(last_interaction=limit)
+        catalogue = ProductCatalogue(memory_budget=1024 * 1024, flush_size=2)
+        data = catalogue.get_data()
+        catalogue.get_healthy_products(data, "en:beverages", 1)
+        self.assertEqual(Product.objects.filter(last_interaction__gt=limit).count(), 0)
+        catalogue.get_healthy_products(data, "en:fruit-juices", 6)
+        recent = Product.objects.filter(last_interaction__gt=limit).values_list('ref', flat=True)
+        self.assertEqual(sorted(recent), ["1", "4"])
+        self.assertEqual(catalogue.pending_interactions, set())
+
+    @override_settings(PRODUCT_CATALOGUE_MEMORY_BUDGET=1024 * 1024)
+    def test_db_interactions_with_catalogue(self):
+        """
+        This method tests that DBInteractions gives the same results with the catalogue
+        and that the catalogue is reloaded when a product is added
+        """
+        analysis = DBInteractions()
+        result = analysis.get_substitute_products_in_db("category", "en:fruit-juices")
+        self.assertEqual([element["ref"] for element in result["elements"]], ["1", "4"])
+        self.assertEqual(analysis.get_search_selection("Pomme")["elements"][0]["ref"], "2")
+
+        product = Product.objects.create(name="jus de pamplemousse", ref="5", nutriscore="a")
+        product.categories.add(Category.objects.get(api_id="en:fruit-juices"))
+        result = analysis.get_substitute_products_in_db("category", "en:fruit-juices")
+        self.assertEqual([element["ref"] for element in result["elements"]], ["1", "4", "5"])
+        with self.assertNumQueries(0):
+            analysis.get_substitute_products_in_db("category", "en:fruit-juices")
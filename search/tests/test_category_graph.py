@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.test import TestCase
+from ..models import Product, Category
+from ..utils.category_graph import CategoryGraph, category_graph
+
+class TestCategoryGraph(TestCase):
+    """
+    This class groups the unit tests linked to the in-memory category graph
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        The hierarchy is:
+            beverages -> plant-based-beverages -> fruit-juices -> grape-juices
+                      -> non-alcoholic-beverages -> fruit-juices
+        """
+        categories = [
+            ("boissons", "en:beverages", 20000),
+            ("boissons a base de vegetaux", "en:plant-based-beverages", 9000),
+            ("boissons sans alcool", "en:non-alcoholic-beverages", 7000),
+            ("jus de fruits", "en:fruit-juices", 3000),
+            ("jus de raisin", "en:grape-juices", 300),
+        ]
+        for name, api_id, total_products in categories:
+            Category.objects.create(name=name, api_id=api_id, total_products=total_products,
+                                    enough_good_nutriscore=True)
+
+        links = [
+            ("en:plant-based-beverages", "en:beverages"),
+            ("en:non-alcoholic-beverages", "en:beverages"),
+            ("en:fruit-juices", "en:plant-based-beverages"),
+            ("en:fruit-juices", "en:non-alcoholic-beverages"),
+            ("en:grape-juices", "en:fruit-juices"),
+        ]
+        for child, parent in links:
+            Category.objects.get(api_id=child).parents.add(Category.objects.get(api_id=parent))
+
+        # 4 healthy products in the fruit juices, 1 in the grape juices
+        for numb in range(4):
+            product = Product.objects.create(name="jus {}".format(numb), ref=str(numb), nutriscore="a")
+            product.categories.add(*Category.objects.filter(api_id__in=["en:beverages", "en:fruit-juices"]))
+        Product.objects.get(ref="3").categories.add(Category.objects.get(api_id="en:grape-juices"))
+        product = Product.objects.create(name="jus sucre", ref="10", nutriscore="e")
+        product.categories.add(Category.objects.get(api_id="en:grape-juices"))
+
+    def setUp(self):
+        self.graph = CategoryGraph()
+
+    def tearDown(self):
+        # The database is rolled back after each test without any signal
+        category_graph.invalidate()
+
+    def test_load(self):
+        nodes = self.graph.get_nodes()
+        self.assertEqual(nodes["en:beverages"].depth, 0)
+        self.assertEqual(nodes["en:fruit-juices"].depth, 2)
+        self.assertEqual(nodes["en:grape-juices"].depth, 3)
+        self.assertEqual(nodes["en:fruit-juices"].healthy_products, 4)
+        self.assertEqual(nodes["en:grape-juices"].healthy_products, 1)
+        self.assertEqual(sorted(nodes["en:beverages"].children),
+                         ["en:non-alcoholic-beverages", "en:plant-based-beverages"])
+
+    def test_most_specific_category(self):
+        """
+        This method tests that the deepest ancestor with enough healthy products is choosen
+        """
+        self.assertEqual(self.graph.most_specific_category(["en:grape-juices"], 1), "en:grape-juices")
+        self.assertEqual(self.graph.most_specific_category(["en:grape-juices"], 2), "en:fruit-juices")
+        self.assertEqual(self.graph.most_specific_category(["en:grape-juices"], 5), None)
+        self.assertEqual(self.graph.most_specific_category(["en:unknown"], 1), None)
+
+    def test_cycle(self):
+        """
+        This method tests that a cycle in the hierarchy does not block the graph
+        """
+        Category.objects.get(api_id="en:beverages").parents.add(Category.objects.get(api_id="en:grape-juices"))
+        self.assertIn(self.graph.most_specific_category(["en:grape-juices"], 2),
+                      ["en:beverages", "en:fruit-juices"])
+
+    def test_invalidation_by_signals(self):
+        """
+        This method tests that the shared graph is reloaded when a healthy product is added
+        """
+        self.assertEqual(category_graph.most_specific_category(["en:grape-juices"], 2), "en:fruit-juices")
+        product = Product.objects.create(name="jus de raisin bio", ref="20", nutriscore="a")
+        product.categories.add(Category.objects.get(api_id="en:grape-juices"))
+        self.assertEqual(category_graph.most_specific_category(["en:grape-juices"], 2), "en:grape-juices")
@@ -0,0 +1,30 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.test import SimpleTestCase, override_settings
+from ..checks import (check_debug_apps, check_whitenoise_position, check_static_bundles,
+                      measure_middleware_cost, SECURITY, WHITENOISE)
+from ..utils.bundles import get_manifest
+
+class TestChecks(SimpleTestCase):
+    """
+    This class groups the unit tests linked to the checks of the settings
+    """
+
+    @override_settings(DEBUG=False, INSTALLED_APPS=['django.contrib.auth', 'debug_toolbar'])
+    def test_debug_toolbar_in_production(self):
+        self.assertEqual([error.id for error in check_debug_apps(None)], ['search.W001'])
+
+    @override_settings(MIDDLEWARE=[SECURITY, 'django.contrib.sessions.middleware.SessionMiddleware', WHITENOISE])
+    def test_whitenoise_after_other_middleware(self):
+        self.assertEqual([error.id for error in check_whitenoise_position(None)], ['search.W002'])
+
+    @override_settings(MIDDLEWARE=[SECURITY, WHITENOISE, 'django.contrib.sessions.middleware.SessionMiddleware'])
+    def test_whitenoise_position(self):
+        self.assertEqual(check_whitenoise_position(None), [])
+        self.assertGreaterEqual(measure_middleware_cost(iterations=10), 0)
+
+    @override_settings(STATIC_BUNDLES_ENABLED=True, STATIC_BUNDLES_ROOT='/nonexistent/bundles')
+    def test_static_bundles_not_built(self):
+        get_manifest.cache_clear()
+        self.addCleanup(get_manifest.cache_clear)
+        self.assertEqual([error.id for error in check_static_bundles(None)], ['search.W003'])
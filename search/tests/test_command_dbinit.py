@@ -4,7 +4,7 @@ from unittest.mock import patch
 from django.test import TestCase
 from ..management.commands.dbinit import DBInit
 from django.contrib.auth.models import User
-from..models import Product, Category, Profile
+from..models import Product, Category, Profile, Favourite, RejectedCategory
 
 class TestCommandDBInit(TestCase):
     """
@@ -140,9 +140,9 @@ class TestCommandDBInit(TestCase):
         user_profile = Profile(user=user)
         user_profile.save()
         product = Product.objects.get(ref="9")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
         product = Product.objects.get(ref="987")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
 
         #Second one
         username = 'test-update'
@@ -153,9 +153,9 @@ class TestCommandDBInit(TestCase):
         user_profile = Profile(user=user)
         user_profile.save()
         product = Product.objects.get(ref="59")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
         product = Product.objects.get(ref="987691")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
 
     def setUp(self):
         self.db_init = DBInit()
@@ -450,4 +450,106 @@ class TestCommandDBInit(TestCase):
             "<Product: jus de chaussettes>",
             "<Product: liquide inconnu>",
         ]
-        self.assertQuerysetEqual(products, products_result, ordered=False)
\ No newline at end of file
+        self.assertQuerysetEqual(products, products_result, ordered=False)
+    @patch('search.management.commands.dbinit.DBInit._get_from_api_products_info_from_page_category')
+    @patch('search.management.commands.dbinit.DBInit._get_categories_from_api')
+    def test_db_sync(self, mock_get_categories_from_api, mock_api_product):
+        """
+        The objective is to test that the synchronization only updates what changed
+        in the API and keeps the users with their products
+        """
+        mock_get_categories_from_api.return_value = self.categories_api_return
+        mock_api_product.return_value = self.products_api_return
+
+        self.db_init.sync()
+
+        # The categories which are not in the API anymore are deleted
+        categories = Category.objects.all()
+        categories_result = [
+            "<Category: grains>",
+            "<Category: boissons magiques>",
+        ]
+        self.assertQuerysetEqual(categories, categories_result, ordered=False)
+        self.assertEqual(Category.objects.filter(last_synced=None).exists(), False)
+
+        # The users and their products are kept
+        self.assertEqual(User.objects.all().count(), 2)
+        user = User.objects.get(username='test-ref')
+        user_products_result = [
+            "<Product: haricots magiques>",
+            "<Product: perroquet>",
+        ]
+        self.assertQuerysetEqual(user.profile.products.all(), user_products_result, ordered=False)
+        self.assertEqual(User.objects.get(username='test-update').profile.products.count(), 2)
+
+        # The product which left its category and which is not registered is deleted
+        self.assertEqual(Product.objects.filter(ref="456").exists(), False)
+        self.assertEqual(Product.objects.filter(ref="951753").exists(), True)
+
+        # A second synchronization does not request the categories pages again
+        calls = mock_api_product.call_count
+        self.db_init.sync()
+        self.assertEqual(mock_api_product.call_count, calls)
+
+    @patch('search.management.commands.dbinit.DBInit._get_from_api_products_info_from_page_category')
+    @patch('search.management.commands.dbinit.DBInit._get_categories_from_api')
+    def test_rejected_category_not_checked_again(self, mock_get_categories_from_api, mock_api_product):
+        """
+        The objective is to test that the products of a rejected category are only
+        downloaded again when its number of products changed
+        """
+        category = {"id": "en:druids-soups", "name": "Soupes de druides", "products": 500}
+        mock_get_categories_from_api.return_value = {"tags": [category]}
+        mock_api_product.return_value = {"products": [{"nutrition_grade_fr": "e"}]}
+
+        self.db_init.set_categories()
+        self.assertEqual(mock_api_product.call_count, 1)
+        self.assertEqual(RejectedCategory.objects.get(api_id="en:druids-soups").total_products, 500)
+
+        self.db_init.set_categories()
+        self.assertEqual(mock_api_product.call_count, 1)
+
+        category["products"] = 501
+        self.db_init.set_categories()
+        self.assertEqual(mock_api_product.call_count, 2)
+        self.assertEqual(RejectedCategory.objects.get(api_id="en:druids-soups").total_products, 501)
+        self.assertEqual(Category.objects.filter(api_id="en:druids-soups").exists(), False)
+
+    @patch('search.management.commands.dbinit.DBInit._get_categories_taxonomy_from_api')
+    def test_set_categories_hierarchy(self, mock_get_taxonomy):
+        """
+        The objective is to test that each category is linked to its nearest
+        parents stored in the database
+        """
+        mock_get_taxonomy.return_value = {
+            "en:insects": {"parents": ["en:animals"]},
+            "en:animals": {"parents": ["en:magic-foods"]},
+            "en:birds": {"parents": ["en:magic-foods", "en:insects"]},
+            "en:magic-foods": {},
+        }
+
+        self.db_init.set_categories_hierarchy()
+
+        insects = Category.objects.get(api_id="en:insects")
+        self.assertQuerysetEqual(insects.parents.all(), ["<Category: nourritures magiques>"])
+        birds = Category.objects.get(api_id="en:birds")
+        self.assertQuerysetEqual(birds.parents.all(),
+                                 ["<Category: nourritures magiques>", "<Category: insectes>"],
+                                 ordered=False)
+        self.assertEqual(Category.objects.get(api_id="en:cereales").parents.exists(), False)
+
+    def test_get_product_details_with_null_values(self):
+        """
+        The objective is to test that the null values sent by the API
+        are replaced by the missing information texts
+        """
+        details = self.db_init._get_product_details({
+            "ingredients_text_fr": None,
+            "image_ingredients_url": None,
+            "image_nutrition_url": None,
+            "nutriments": None,
+        })
+        self.assertEqual(details['ingredients'], "Information manquante")
+        self.assertEqual(details['ingredients_picture'], "Image manquante")
+        self.assertEqual(details['nutriments_picture'], "Image manquante")
+        self.assertEqual(details['fat'], None)
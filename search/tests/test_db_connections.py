@@ -0,0 +1,45 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from io import StringIO
+from unittest.mock import Mock, patch
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from ..utils.db_connections import check_connections
+
+class TestConnectionHealth(SimpleTestCase):
+    """
+    This class groups the unit tests linked to the health checks of the persistent connections
+    """
+
+    def setUp(self):
+        self.conn = Mock(connection=object(), settings_dict={'CONN_MAX_AGE': 500}, spec=[
+            'connection', 'settings_dict', 'is_usable', 'close'])
+        self.conn.is_usable.return_value = False
+        patcher = patch('search.utils.db_connections.connections')
+        patcher.start().all.return_value = [self.conn]
+        self.addCleanup(patcher.stop)
+
+    def test_unusable_connection_closed(self):
+        check_connections()
+        self.conn.close.assert_called_once_with()
+
+    @override_settings(DB_HEALTH_CHECK_INTERVAL=60)
+    def test_checked_once_per_interval(self):
+        check_connections()
+        check_connections()
+        self.assertEqual(self.conn.is_usable.call_count, 1)
+
+    def test_connection_per_request_not_checked(self):
+        self.conn.settings_dict['CONN_MAX_AGE'] = 0
+        check_connections()
+        self.conn.is_usable.assert_not_called()
+
+class TestBenchConnections(TransactionTestCase):
+    """
+    This class tests the command which measures the cost of the connections
+    """
+
+    def test_benchconnections(self):
+        out = StringIO()
+        call_command('benchconnections', '--requests', '5', stdout=out)
+        self.assertIn("Connection overhead:", out.getvalue())
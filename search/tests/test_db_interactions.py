@@ -1,10 +1,10 @@
 #! /usr/bin/env python3
 # coding: utf-8
 from unittest.mock import patch
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from django.test import TestCase
 from django.contrib.auth.models import User
-from ..models import Product, Category, Profile
+from ..models import Product, Category, Profile, Favourite
 from ..utils.db_interactions  import DBInteractions
 
 class TestDBInteractions(TestCase):
@@ -208,7 +208,7 @@ class TestDBInteractions(TestCase):
         user_profile = Profile(user=user)
         user_profile.save()
         product = Product.objects.get(ref="123456789")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
 
         
             
@@ -222,6 +222,7 @@ class TestDBInteractions(TestCase):
     def test_get_search_selection_category_success(self):
         """
         This tests checked all the process of queryanalysis with category found
+        (the shortest names containing the query words come first)
         """
         query = "boissons gazeuses"
         result = {
@@ -229,17 +230,17 @@ class TestDBInteractions(TestCase):
                 'number' : 4,
                 'elements': [
                     {
-                        'name' : 'aliments et boissons à base de végétaux',
+                        'name' : 'boissons',
                         'ref' : '',
                         'nutriscore' : '',
-                        'description' : 'en:plant-based-foods-and-beverages',
+                        'description' : 'en:beverages',
                         'image_url' : '' 
                     },
                     {
-                        'name' : 'boissons',
+                        'name' : 'boissons sans alcool',
                         'ref' : '',
                         'nutriscore' : '',
-                        'description' : 'en:beverages',
+                        'description' : 'en:non-alcoholic-beverages',
                         'image_url' : '' 
                     },
                     {
@@ -250,10 +251,10 @@ class TestDBInteractions(TestCase):
                         'image_url' : '' 
                     },
                     {
-                        'name' : 'boissons sans alcool',
+                        'name' : 'aliments et boissons à base de végétaux',
                         'ref' : '',
                         'nutriscore' : '',
-                        'description' : 'en:non-alcoholic-beverages',
+                        'description' : 'en:plant-based-foods-and-beverages',
                         'image_url' : '' 
                     },
                 ]
@@ -388,8 +389,9 @@ class TestDBInteractions(TestCase):
     def test_count_global_rows_in_db(self):
         """
         This method tests the public method count_global_rows_in_db
+        (33 rows + 56 tokens in the search index)
         """
-        self.assertEqual(self.analysis.count_global_rows_in_db(), 33)
+        self.assertEqual(self.analysis.count_global_rows_in_db(), 89)
 
     def test_check_db_for_registration_rows_ok(self):
         """
@@ -421,10 +423,75 @@ class TestDBInteractions(TestCase):
         user_profile.save()
         
         for product in Product.objects.all():
-            user_profile.products.add(product.id)
+            Favourite.objects.create(profile=user_profile, product_id=product.id)
 
         self.assertEqual(self.analysis.check_db_for_registration(10000), False)
 
+    def test_get_products_registered_page(self):
+        """
+        This method tests that the registered products are returned page by page,
+        from the most recently saved, with one query per page
+        """
+        user_profile = User.objects.get(username='test-ref').profile
+        saved_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for numb, product in enumerate(Product.objects.exclude(ref="123456789").order_by('id')):
+            Favourite.objects.create(profile=user_profile, product=product,
+                                     created_at=saved_at + timedelta(days=numb))
+        # The product registered in setUpTestData is the most recent one
+        expected = ["123456789"]
+        expected.extend(Product.objects.exclude(ref="123456789").order_by('-id').values_list('ref', flat=True))
+
+        with self.assertNumQueries(1):
+            first_page = self.analysis.get_products_registered_page('test-ref', page_size=6)
+        self.assertEqual([product["ref"] for product in first_page["elements"]], expected[:6])
+        self.assertEqual(first_page["elements"][0]["product_registered"], True)
+
+        with self.assertNumQueries(1):
+            second_page = self.analysis.get_products_registered_page('test-ref', first_page["next_cursor"], 6)
+        self.assertEqual([product["ref"] for product in second_page["elements"]], expected[6:])
+        self.assertEqual(second_page["next_cursor"], None)
+
+        # A wrong cursor gives the first page
+        self.assertEqual(self.analysis.get_products_registered_page('test-ref', "wrong", 6)["number"], 6)
+
+    def test_favourite_count(self):
+        """
+        This method tests that the number of users who registered a product
+        follows the registrations and deletions, even when a user is deleted
+        """
+        self.assertEqual(Product.objects.get(ref="123456789").favourite_count, 1)
+        user = User.objects.create_user('test-count', 'test-count@register.com', 'count-test')
+        Profile.objects.create(user=user)
+        self.analysis.save_product_for_user('test-count', '123456789')
+        self.analysis.save_product_for_user('test-count', '123456789')
+        self.assertEqual(Product.objects.get(ref="123456789").favourite_count, 2)
+
+        self.analysis.delete_product_registered('test-ref', '123456789')
+        self.assertEqual(Product.objects.get(ref="123456789").favourite_count, 1)
+        user.delete()
+        self.assertEqual(Product.objects.get(ref="123456789").favourite_count, 0)
+
+    def test_get_profile_once(self):
+        """
+        This method tests that the profile of a user is requested once, with its user
+        """
+        with self.assertNumQueries(1):
+            profile = self.analysis.get_profile('test-ref')
+            self.assertEqual(profile.user.username, 'test-ref')
+            self.assertIs(self.analysis.get_profile('test-ref'), profile)
+
+    def test_check_db_for_registration_deletes_oldest_product(self):
+        """
+        This method tests that the product deleted to free some space is the one
+        with the oldest interaction among the products registered by nobody
+        """
+        Product.objects.update(last_interaction=datetime.now(timezone.utc))
+        Product.objects.filter(ref__in=["123456789", "987654321"]).update(
+            last_interaction=datetime(2026, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(self.analysis.check_db_for_registration(10000), True)
+        self.assertEqual(Product.objects.filter(ref="987654321").exists(), False)
+        self.assertEqual(Product.objects.filter(ref="123456789").exists(), True)
+
     def test_delete_product_registered_succes(self):
         user = self.client.login(username='test-ref', password='ref-test-view')
         status = self.analysis.delete_product_registered('test-ref', '123456789')
@@ -434,4 +501,74 @@ class TestDBInteractions(TestCase):
         query = user_profile.profile.products.all()
 
         self.assertQuerysetEqual(query, result, ordered=False)
-        self.assertEqual(status, 'success')        
\ No newline at end of file
+        self.assertEqual(status, 'success')        
+    def test_get_product_details_without_details(self):
+        """
+        This method tests the public method get_product_details with a product
+        in the database whose details had never been stored
+        """
+        self.assertEqual(self.analysis.get_product_details('123456789'), None)
+
+    def test_set_and_get_product_details(self):
+        """
+        This method tests that the product page information stored with set_product_details
+        is returned by get_product_details
+        """
+        product_info = {
+            "name" : "cola à la mousse de bière",
+            "ref" : "456789123",
+            "description": "du coca et de la bière, ca mousse pas mal",
+            "nutriscore": "d",
+            "image_url": "https://static.openfoodfacts.org/images/products/152/on-en-reve-tous.jpg",
+            "categories": [
+                "en:beverages",
+                "en:plant-based-foods-and-beverages",
+            ],
+            "ingredients": "du cola et de la bière",
+            "nutriments": {
+                "fat": 0,
+                "saturated_fat": -1,
+                "sugar": 12.5,
+                "salt": 0.1
+            },
+            "ingredients_image_url": "https://static.openfoodfacts.org/images/products/152/ingredients.jpg",
+            "nutriments_image_url": "Image manquante",
+        }
+
+        self.analysis.set_product_details(product_info)
+        result = self.analysis.get_product_details('456789123')
+
+        self.assertEqual(result["ingredients"], "du cola et de la bière")
+        self.assertEqual(result["nutriments"], product_info["nutriments"])
+        self.assertEqual(result["ingredients_image_url"], product_info["ingredients_image_url"])
+        self.assertEqual(result["nutriments_image_url"], "Image manquante")
+        self.assertEqual(sorted(result["categories"]), sorted(product_info["categories"]))
+        self.assertEqual(self.analysis.check_product_details_outdated('456789123'), False)
+
+    def test_check_product_details_outdated(self):
+        """
+        This method tests the public method check_product_details_outdated with
+        details stored a long time ago
+        """
+        Product.objects.filter(ref='456789123').update(details_updated=datetime.now() - timedelta(days=30))
+        self.assertEqual(self.analysis.check_product_details_outdated('456789123'), True)
+
+    def test_get_versions(self):
+        """
+        This method tests that the versions used in the ETag of the pages change
+        with the data they depend on
+        """
+        self.assertEqual(self.analysis.get_product_version('456789123'), None)
+        updated = datetime(2026, 1, 2, tzinfo=timezone.utc)
+        Product.objects.filter(ref='456789123').update(details_updated=updated)
+        self.assertEqual(self.analysis.get_product_version('456789123'), updated.isoformat())
+
+        data_version = self.analysis.get_data_version()
+        self.assertEqual(self.analysis.get_data_version(), data_version)
+        Product.objects.create(name="jus d'orange", ref="11111111", nutriscore="a")
+        self.assertNotEqual(self.analysis.get_data_version(), data_version)
+
+        favourites_version = self.analysis.get_favourites_version('test-ref')
+        Favourite.objects.create(profile=User.objects.get(username='test-ref').profile,
+                                 product=Product.objects.get(ref="11111111"))
+        self.assertNotEqual(self.analysis.get_favourites_version('test-ref'), favourites_version)
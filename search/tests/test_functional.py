@@ -4,7 +4,7 @@ from selenium.webdriver.firefox.webdriver import WebDriver
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.support.wait import WebDriverWait
 from django.contrib.auth.models import User
-from ..models import Product, Category, Profile
+from ..models import Product, Category, Profile, Favourite
 
 class SeleniumTests(StaticLiveServerTestCase):
     """
@@ -206,7 +206,7 @@ class SeleniumTests(StaticLiveServerTestCase):
         user_profile = Profile(user=user)
         user_profile.save()
         product = Product.objects.get(ref="123456789")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
     
     @classmethod
     def tearDownClass(cls):
@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import os
+import shutil
+import tempfile
+from unittest.mock import Mock
+from django.test import SimpleTestCase
+from search.utils.http_cache import HttpCache
+
+class TestHttpCache(SimpleTestCase):
+    """
+    This class groups the unit tests linked to the on-disk cache
+    of the API responses used by dbinit
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.session = Mock()
+        self.response = Mock(status_code=200, headers={"ETag": '"v1"'})
+        self.response.json.return_value = {"tags": [{"id": "en:beverages"}]}
+        self.session.get.return_value = self.response
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_independent_of_params_order(self):
+        cache = HttpCache(self.directory)
+        self.assertEqual(cache.key("https://api", {"page": 1, "json": 1}),
+                         cache.key("https://api", {"json": 1, "page": 1}))
+        self.assertNotEqual(cache.key("https://api", {"page": 1}),
+                            cache.key("https://api", {"page": 2}))
+
+    def test_fresh_entry_replayed(self):
+        """
+        This method tests that a fresh entry is returned without any request,
+        even by a new cache object (new dbinit run)
+        """
+        data = HttpCache(self.directory).get_json(self.session, "https://api", {"page": 1})
+        cache = HttpCache(self.directory)
+        self.assertEqual(cache.get_json(self.session, "https://api", {"page": 1}), data)
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertGreater(cache.size, 0)
+
+    def test_outdated_entry_revalidated(self):
+        """
+        This method tests that an outdated entry is revalidated with its ETag
+        and returned when the API answers 304
+        """
+        cache = HttpCache(self.directory, max_age=0)
+        data = cache.get_json(self.session, "https://api")
+        self.session.get.return_value = Mock(status_code=304, headers={})
+
+        self.assertEqual(cache.get_json(self.session, "https://api"), data)
+        headers = self.session.get.call_args[1]["headers"]
+        self.assertEqual(headers, {"If-None-Match": '"v1"'})
+
+    def test_eviction(self):
+        """
+        This method tests that the least recently used entries are deleted
+        when the cache is too big
+        """
+        cache = HttpCache(self.directory)
+        cache.get_json(self.session, "https://api", {"page": 1})
+        cache.max_size = cache.size + 64
+        old_path = cache._path("https://api", {"page": 1})
+        os.utime(old_path, (0, 0))
+
+        cache.get_json(self.session, "https://api", {"page": 2})
+        self.assertEqual(os.path.exists(old_path), False)
+        self.assertEqual(os.path.exists(cache._path("https://api", {"page": 2})), True)
+        self.assertLessEqual(cache.size, cache.max_size)
@@ -0,0 +1,95 @@
+#! /usr/bin/env python3
+# coding: utf-8
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from PIL import Image
+from django.test import TestCase, override_settings
+from ..utils.images import thumbnail_url, ThumbnailCache, ImageUnavailable
+
+PICTURE = "https://static.openfoodfacts.org/images/products/301/762/042/9484/front_fr.147.400.jpg"
+
+def _picture(width=1200, height=900):
+    content = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(content, 'PNG')
+    return content.getvalue()
+
+class ImagesTestCase(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        settings_override = override_settings(IMAGE_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+class TestThumbnailCache(ImagesTestCase):
+    """
+    This class groups the unit tests linked to the thumbnails of the product pictures
+    """
+
+    def test_thumbnail_url(self):
+        self.assertEqual(thumbnail_url(PICTURE, 'card'),
+                         "/search/images/card/static.openfoodfacts.org/images/products/301/762/042/9484/front_fr.147.400.jpg")
+        self.assertEqual(thumbnail_url("Image manquante", 'card'), "Image manquante")
+        self.assertEqual(thumbnail_url("https://example.com/front.jpg", 'card'), "https://example.com/front.jpg")
+
+    @patch('search.utils.images._download')
+    def test_get_thumbnail(self, mock_download):
+        mock_download.return_value = _picture()
+        cache = ThumbnailCache()
+        file_path, content_type = cache.get_thumbnail('static.openfoodfacts.org', 'images/front.jpg', 'card')
+        self.assertEqual(content_type, 'image/jpeg')
+        with Image.open(file_path) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('JPEG', (400, 300)))
+
+        # The thumbnail is downloaded once
+        self.assertEqual(cache.get_thumbnail('static.openfoodfacts.org', 'images/front.jpg', 'card')[0], file_path)
+        mock_download.assert_called_once_with("https://static.openfoodfacts.org/images/front.jpg")
+
+        file_path, content_type = cache.get_thumbnail('static.openfoodfacts.org', 'images/front.jpg', 'detail',
+                                                      webp=True)
+        with Image.open(file_path) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (640, 480)))
+
+    @patch('search.utils.images._download')
+    def test_least_recently_used_evicted(self, mock_download):
+        mock_download.return_value = _picture()
+        cache = ThumbnailCache()
+        first = cache.get_thumbnail('static.openfoodfacts.org', 'images/1.jpg', 'card')[0]
+        second = cache.get_thumbnail('static.openfoodfacts.org', 'images/2.jpg', 'card')[0]
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+        # The first thumbnail is read again: the second one is now the least recently used
+        cache.get_thumbnail('static.openfoodfacts.org', 'images/1.jpg', 'card')
+        with override_settings(IMAGE_CACHE_MAX_BYTES=os.path.getsize(first) * 2):
+            third = cache.get_thumbnail('static.openfoodfacts.org', 'images/3.jpg', 'card')[0]
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertTrue(os.path.exists(third))
+
+class TestThumbnailView(ImagesTestCase):
+    """
+    This class tests the view of the image proxy
+    """
+
+    @patch('search.utils.images._download')
+    def test_thumbnail(self, mock_download):
+        mock_download.return_value = _picture()
+        response = self.client.get(thumbnail_url(PICTURE, 'card'), HTTP_ACCEPT='image/webp,image/*')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept')
+        response.close()
+
+    @patch('search.utils.images._download')
+    def test_picture_unavailable(self, mock_download):
+        mock_download.side_effect = ImageUnavailable("timeout")
+        response = self.client.get(thumbnail_url(PICTURE, 'detail'))
+        self.assertRedirects(response, PICTURE, fetch_redirect_response=False)
+
+    def test_other_host(self):
+        response = self.client.get('/search/images/card/example.com/front.jpg')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ..models import Job, Product
+from ..utils import jobs
+from ..utils.db_interactions import DBInteractions
+from ..utils.resilience import ApiUnavailable
+from ..utils.jobs import task, enqueue, claim_jobs, run_job, run_pending_jobs, purge_jobs, get_job_result
+
+calls = []
+
+@task
+def add_numbers(first, second):
+    calls.append((first, second))
+    return first + second
+
+@task
+def fail():
+    raise ValueError("API unavailable")
+
+@override_settings(JOBS_EAGER=False)
+class TestJobs(TestCase):
+    """
+    This class groups the unit tests linked to the background jobs
+    """
+
+    def setUp(self):
+        del calls[:]
+
+    def test_enqueue_and_run(self):
+        job = enqueue('add_numbers', owner='user', first=1, second=2)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(get_job_result(job), 3)
+        self.assertEqual(run_pending_jobs(), 0)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_enqueue_eager(self):
+        job = enqueue('add_numbers', first=1, second=2)
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, [(1, 2)])
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(KeyError):
+            enqueue('unknown')
+
+    def test_enqueue_unique(self):
+        job = enqueue('add_numbers', unique=True, first=1, second=2)
+        self.assertEqual(enqueue('add_numbers', unique=True, second=2, first=1), job)
+        self.assertNotEqual(enqueue('add_numbers', unique=True, first=2, second=2), job)
+
+    def test_claimed_job_leased(self):
+        """
+        This method tests that a job taken by a worker is not taken by another one
+        """
+        enqueue('add_numbers', first=1, second=2)
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_failed_job_retried(self):
+        job = enqueue('fail')
+        run_job(job)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.error, "ValueError: API unavailable")
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=jobs.RETRY_DELAY - 5))
+
+        job.attempts = jobs.MAX_ATTEMPTS - 1
+        run_job(job)
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_purge_jobs(self):
+        job = enqueue('add_numbers', first=1, second=2)
+        run_pending_jobs()
+        self.assertEqual(purge_jobs(), 0)
+        Job.objects.filter(id=job.id).update(finished_at=timezone.now() - timedelta(seconds=jobs.KEEP_DONE + 1))
+        self.assertEqual(purge_jobs(), 1)
+
+    # The worker would close the connection of the test transaction
+    @patch('search.management.commands.runworker.close_old_connections')
+    @patch('search.management.commands.runworker.purge_jobs')
+    @patch('search.management.commands.runworker.send_queued_emails')
+    def test_runworker_command(self, mock_send_queued_emails, mock_purge_jobs, mock_close_old_connections):
+        for numb in range(3):
+            enqueue('add_numbers', first=numb, second=1)
+        out = StringIO()
+        call_command('runworker', threads=1, once=True, stdout=out)
+        self.assertEqual(sorted(calls), [(0, 1), (1, 1), (2, 1)])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 3)
+        self.assertIn("add_numbers", out.getvalue())
+        self.assertTrue(mock_close_old_connections.called)
+        # The worker polled the jobs twice, the emails and the purge are on their own intervals
+        self.assertEqual(mock_send_queued_emails.call_count, 1)
+        self.assertEqual(mock_purge_jobs.call_count, 1)
+
+@override_settings(JOBS_EAGER=False)
+class TestRefreshProductDetails(TestCase):
+    """
+    This class groups the unit tests linked to the refresh of the product details in background
+    """
+
+    def setUp(self):
+        self.updated = timezone.now() - timedelta(days=10)
+        Product.objects.create(name="nutella", ref="3017620422003", nutriscore="e",
+                               ingredients="sucre", details_updated=self.updated)
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_product_not_in_api(self, mock_get_selected_product):
+        mock_get_selected_product.return_value = None
+        job = run_job(enqueue('refresh_product_details', product_ref="3017620422003"))
+        self.assertEqual(job.status, Job.DONE)
+        product = Product.objects.get(ref="3017620422003")
+        self.assertEqual(product.ingredients, "sucre")
+        self.assertGreater(product.details_updated, self.updated)
+        self.assertEqual(DBInteractions().check_product_details_outdated("3017620422003"), False)
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_api_unavailable(self, mock_get_selected_product):
+        mock_get_selected_product.side_effect = ApiUnavailable("circuit open")
+        job = run_job(enqueue('refresh_product_details', product_ref="3017620422003"))
+        # The job is tried again later, but the page does not ask for a refresh meanwhile
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(DBInteractions().check_product_details_outdated("3017620422003"), False)
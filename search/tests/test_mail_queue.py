@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from ..models import QueuedEmail
+from ..utils.mail_queue import queue_email, send_queued_emails, purge_emails, MAX_ATTEMPTS, RETRY_DELAY, KEEP_FAILED
+
+class TestMailQueue(TestCase):
+    """
+    This class groups the unit tests linked to the queue of the emails
+    """
+
+    def setUp(self):
+        for numb in range(3):
+            queue_email(EmailMessage('Sujet {}'.format(numb), 'Message', to=['user{}@mail.com'.format(numb)]))
+
+    def test_send_queued_emails(self):
+        """
+        This method tests that the emails are sent over one connection and removed from the queue
+        """
+        self.assertEqual(send_queued_emails(), (3, 0))
+        self.assertEqual(sorted(email.subject for email in mail.outbox), ['Sujet 0', 'Sujet 1', 'Sujet 2'])
+        self.assertEqual(QueuedEmail.objects.count(), 0)
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    def test_send_queued_emails_batch(self):
+        self.assertEqual(send_queued_emails(batch_size=2), (2, 0))
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+
+    def test_server_unavailable(self):
+        """
+        This method tests that the emails are tried again later, with a longer delay each time
+        """
+        connection = Mock()
+        connection.open.side_effect = OSError("Connection refused")
+        self.assertEqual(send_queued_emails(connection=connection), (0, 3))
+        email = QueuedEmail.objects.get(subject='Sujet 0')
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, "Connection refused")
+        self.assertGreater(email.next_attempt, timezone.now() + timedelta(seconds=RETRY_DELAY - 5))
+
+        # The emails are not due yet
+        self.assertEqual(send_queued_emails(connection=connection), (0, 0))
+
+        QueuedEmail.objects.update(next_attempt=timezone.now(), attempts=MAX_ATTEMPTS - 1)
+        send_queued_emails(connection=connection)
+        self.assertEqual(QueuedEmail.objects.filter(next_attempt__isnull=True).count(), 3)
+
+    def test_purge_emails(self):
+        """
+        This method tests that only the emails which failed for good are deleted after KEEP_FAILED
+        """
+        QueuedEmail.objects.filter(subject='Sujet 0').update(next_attempt=None)
+        self.assertEqual(purge_emails(), 0)
+        QueuedEmail.objects.update(created_at=timezone.now() - timedelta(seconds=KEEP_FAILED + 1))
+        self.assertEqual(purge_emails(), 1)
+        self.assertEqual(QueuedEmail.objects.count(), 2)
+
+    def test_sendmails_command(self):
+        out = StringIO()
+        call_command('sendmails', stdout=out)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn("3 email(s) sent, 0 failed", out.getvalue())
@@ -0,0 +1,47 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.test import SimpleTestCase
+from search.utils.normalizer import normalize, clean_query, tokenize, NameMatcher
+
+class TestNormalizer(SimpleTestCase):
+    """
+    This class groups the unit tests linked to the normalization shared
+    by the search and dbinit
+    """
+
+    def test_normalize(self):
+        self.assertEqual(normalize("Crème Fraîche ÉPAISSE"), "creme fraiche epaisse")
+        self.assertEqual(normalize("bœuf"), "buf")
+        self.assertEqual(normalize("jus de pomme"), "jus de pomme")
+
+    def test_clean_query(self):
+        self.assertEqual(clean_query("Pâte à tartiner avec des noisettes"), "pate tartiner noisettes")
+        self.assertEqual(clean_query("le la les"), "")
+
+    def test_clean_query_memo(self):
+        clean_query.cache_clear()
+        clean_query("jus de pomme")
+        clean_query("jus de pomme")
+        self.assertEqual(clean_query.cache_info().hits, 1)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Petit-déjeuner, 100% céréales"), ["petit", "dejeuner", "100", "cereales"])
+
+    def test_name_matcher(self):
+        matcher = NameMatcher("pate a tartiner")
+        self.assertEqual(matcher.match("Pâte à tartiner Nutella"), True)
+        self.assertEqual(matcher.match("Tartiner la pâte"), True)
+        self.assertEqual(matcher.match("Nutella"), False)
+        self.assertEqual(NameMatcher("").match("Nutella"), True)
+
+    def test_name_matcher_regex_characters(self):
+        """
+        This method tests that the query is used as a literal text
+        """
+        self.assertEqual(NameMatcher("nutella (750g)").match("Nutella (750g)"), True)
+        self.assertEqual(NameMatcher("nutella [750g").match("Nutella 750g"), True)
+        self.assertEqual(NameMatcher("(a+)+$").match("a" * 5000 + "!"), False)
+
+    def test_name_matcher_match_all(self):
+        names = ["Pâte à tartiner", "Nutella", "pâte\nà tartiner"]
+        self.assertEqual(NameMatcher("pate").match_all(names), [True, False, True])
@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
+from ..models import Product, Category, Profile, Favourite
+from ..utils.db_interactions import DBInteractions
+from ..utils.treatment import Treatment
+from .budgets import BudgetTestMixin
+
+@override_settings(QUERY_LOG_SAMPLE_RATE=0, JOBS_EAGER=False)
+class QueryBudgetTestCase(BudgetTestMixin, TestCase):
+    """
+    This class checks the number of queries and external calls of the hot paths,
+    the queries must not grow with the number of categories, products or favourites
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name="boissons", api_id="en:beverages", total_products=1000,
+                                           enough_good_nutriscore=True)
+        user = User.objects.create_user('username-budget', 'budget@register.com', 'budget-ref')
+        cls.profile = Profile.objects.create(user=user)
+        cls.product = Product.objects.create(name="jus de pomme", ref="budget-0", nutriscore="a",
+                                             description="un jus", details_updated=timezone.now())
+        cls.product.categories.add(cls.root)
+
+    def create_catalogue(self, size):
+        """
+        This method creates size categories under en:beverages with one healthy product each
+        """
+        categories = Category.objects.bulk_create([
+            Category(name="jus {}".format(numb), api_id="en:juice-{}".format(numb), total_products=1)
+            for numb in range(size)])
+        categories = list(Category.objects.filter(api_id__startswith="en:juice-"))
+        Category.parents.through.objects.bulk_create([
+            Category.parents.through(from_category_id=category.id, to_category_id=self.root.id)
+            for category in categories])
+        Product.objects.bulk_create([Product(name="jus de fruits {}".format(numb), ref="juice-{}".format(numb),
+                                             nutriscore="a") for numb in range(size)])
+        products = {product.ref: product.id for product in Product.objects.filter(ref__startswith="juice-")}
+        Product.categories.through.objects.bulk_create(
+            [Product.categories.through(product_id=products["juice-{}".format(numb)], category_id=category.id)
+             for numb, category in enumerate(sorted(categories, key=lambda category: category.id))]
+            + [Product.categories.through(product_id=product_id, category_id=self.root.id)
+               for product_id in products.values()])
+        return products
+
+    def create_favourites(self, size):
+        """
+        This method creates size products registered by the user
+        """
+        products = self.create_catalogue(size)
+        Favourite.objects.bulk_create([Favourite(profile=self.profile, product_id=product_id)
+                                       for product_id in products.values()])
+        return products
+
+    ## DBInteractions ##
+    def test_count_global_rows_in_db(self):
+        self.assertConstantQueries(lambda data: DBInteractions().count_global_rows_in_db(),
+                                   self.create_catalogue)
+
+    def test_get_search_selection(self):
+        self.assertConstantQueries(lambda data: DBInteractions().get_search_selection("jus"),
+                                   self.create_catalogue)
+
+    def test_get_substitute_products_in_db(self):
+        self.assertConstantQueries(
+            lambda data: DBInteractions().get_substitute_products_in_db("category", "en:beverages"),
+            self.create_catalogue)
+        self.assertConstantQueries(
+            lambda data: DBInteractions().get_substitute_products_in_db("product", "budget-0"),
+            self.create_catalogue)
+
+    def test_get_products_registered(self):
+        self.assertConstantQueries(lambda data: DBInteractions().get_products_registered('username-budget'),
+                                   self.create_favourites)
+        self.assertConstantQueries(
+            lambda data: DBInteractions().get_products_registered_page('username-budget'),
+            self.create_favourites)
+
+    def test_save_products_for_user(self):
+        def save_products(products_info):
+            DBInteractions().save_products_for_user('username-budget', [info["ref"] for info in products_info],
+                                                    products_info)
+
+        def create_products_info(size):
+            return [{"name": "soda {}".format(numb), "ref": "soda-{}".format(numb), "nutriscore": "b",
+                     "description": "", "image_url": "", "categories": ["en:beverages"],
+                     "ingredients": "", "ingredients_image_url": "", "nutriments_image_url": "", "nutriments": {}}
+                    for numb in range(size)]
+        self.assertConstantQueries(save_products, create_products_info, sizes=(1, 50))
+
+    ## Treatment ##
+    def test_treatment_from_database(self):
+        """
+        The selections found in the database do not call the API
+        """
+        # The search index is read once by word of the query
+        self.assertBudget(Treatment().get_choice_selection, "jus de pomme", queries=7)
+        self.assertBudget(Treatment().get_substitute_selection, "category", "en:beverages", queries=6)
+        self.assertBudget(Treatment().get_selected_product, "budget-0", queries=4)
+
+    def test_treatment_unknown_product(self):
+        """
+        A product which is not in the database is requested from the API (with one retry)
+        """
+        self.assertBudget(Treatment().get_selected_product, "unknown", queries=4, external_calls=2)
+
+    ## Views ##
+    def test_substitute_page(self):
+        self.client.login(username='username-budget', password='budget-ref')
+        url = reverse('search:substitute', args=('category', 'en:beverages'))
+        self.assertConstantQueries(lambda data: self.client.get(url), self.create_favourites)
+
+    def test_product_registered_page(self):
+        self.client.login(username='username-budget', password='budget-ref')
+        self.assertConstantQueries(lambda data: self.client.get(reverse('search:product_registered')),
+                                   self.create_favourites)
+        self.assertConstantQueries(lambda data: self.client.get(reverse('api:favourites')),
+                                   self.create_favourites)
+
+    def test_product_page(self):
+        self.client.login(username='username-budget', password='budget-ref')
+        self.assertBudget(self.client.get, reverse('search:product', args=['budget-0']), queries=8)
@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from ..models import QueryLog, Product
+from ..utils.query_log import QueryLogger, query_logger, SEARCH, SUBSTITUTE, PRODUCT
+
+class TestQueryLog(TestCase):
+    """
+    This class groups the unit tests linked to the query logs and the warmcache command
+    """
+
+    def tearDown(self):
+        query_logger.pending = {}
+
+    def test_log_batches(self):
+        """
+        This method tests that the queries are normalized and saved by batches
+        """
+        logger = QueryLogger(sample_rate=1, batch_size=2)
+        logger.log(SEARCH, "Pâte à tartiner", hit=True)
+        logger.log(SEARCH, "pate tartiner", hit=False)
+        self.assertEqual(QueryLog.objects.count(), 0)
+        logger.log(PRODUCT, "3017620422003", hit=True)
+        self.assertEqual(QueryLog.objects.count(), 2)
+
+        logger.log(SEARCH, "pate a tartiner", hit=True)
+        logger.flush()
+        log = QueryLog.objects.get(kind=SEARCH)
+        self.assertEqual((log.query, log.hits, log.misses), ("pate tartiner", 2, 1))
+
+    def test_log_sampled(self):
+        logger = QueryLogger(sample_rate=0, batch_size=1)
+        logger.log(SEARCH, "nutella", hit=True)
+        logger.flush()
+        self.assertEqual(QueryLog.objects.count(), 0)
+
+    def test_top_queries_and_trim(self):
+        for numb in range(5):
+            QueryLog.objects.create(kind=SEARCH, query="query {}".format(numb), hits=numb, misses=1)
+        self.assertEqual(query_logger.get_top_queries(SEARCH, 2), ["query 4", "query 3"])
+        self.assertEqual(query_logger.trim(3), 2)
+        self.assertEqual(query_logger.get_top_queries(SEARCH, 5), ["query 4", "query 3", "query 2"])
+
+    @patch('search.utils.treatment.Treatment.get_choice_selection')
+    def test_views_log_queries(self, mock_choice):
+        mock_choice.return_value = None
+        with patch('search.utils.query_log.query_logger.batch_size', 1):
+            self.client.get('/search/choice', {'search': 'Nutella'})
+        self.assertEqual(QueryLog.objects.filter(kind=SEARCH, query='nutella').exists(), True)
+
+    @patch('search.utils.treatment.Treatment.get_selected_product')
+    @patch('search.utils.treatment.Treatment.get_substitute_selection')
+    @patch('search.utils.treatment.Treatment.get_choice_selection')
+    def test_warmcache_command(self, mock_choice, mock_substitute, mock_product):
+        QueryLog.objects.create(kind=SEARCH, query="nutella", hits=10)
+        QueryLog.objects.create(kind=SEARCH, query="jus pomme", hits=1)
+        QueryLog.objects.create(kind=SUBSTITUTE, query="category/en:beverages", hits=1, misses=3)
+        # A stored product without details: the replay stores them
+        Product.objects.create(name="nutella", ref="3017620422003", nutriscore="e")
+        QueryLog.objects.create(kind=PRODUCT, query="3017620422003", misses=3)
+        # Not in the database: replaying it would only request the API
+        QueryLog.objects.create(kind=PRODUCT, query="3000000000000", misses=20)
+
+        out = StringIO()
+        call_command('warmcache', top=1, concurrency=1, stdout=out)
+        mock_choice.assert_called_once_with("nutella")
+        mock_substitute.assert_called_once_with("category", "en:beverages")
+        mock_product.assert_called_once_with("3017620422003")
+        self.assertIn("3 queries replayed", out.getvalue())
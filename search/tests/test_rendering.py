@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.contrib.auth.models import User
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from ..utils.rendering import measure_template_rendering, _sample_products
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-fragments'},
+})
+class TestRendering(TestCase):
+    """
+    This class groups the unit tests linked to the rendering of the result lists
+    """
+
+    def render_list(self, elements):
+        return render_to_string('search/list.html', {
+            'source': 'substitute_page', 'element_number': len(elements), 'element_type': 'product',
+            'list': elements, 'user': User(username='card-user'),
+        })
+
+    def test_cached_card_follows_the_product(self):
+        elements = _sample_products(1)
+        self.assertIn("SUPPRIMER", self.render_list(elements))
+        elements[0]["product_registered"] = False
+        elements[0]["name"] = "Jus de pomme"
+        html = self.render_list(elements)
+        self.assertIn("AJOUTER", html)
+        self.assertIn("Jus de pomme", html)
+        self.assertEqual(html, self.render_list(elements))
+
+    def test_measure_template_rendering(self):
+        durations = measure_template_rendering(iterations=1)
+        self.assertEqual(set(durations), {'index.html', 'choice.html', 'substitute.html',
+                                          'product.html', 'product_registered.html'})
+        self.assertTrue(all(duration['mean'] > 0 for duration in durations.values()))
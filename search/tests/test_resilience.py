@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from unittest.mock import patch, Mock
+from django.test import SimpleTestCase
+import requests
+from search.utils.resilience import ApiUnavailable, LatencyBudget, CircuitBreaker, get_json
+
+class TestResilience(SimpleTestCase):
+    """
+    This class groups the unit tests linked to the protections used
+    for the calls to the API
+    """
+
+    def setUp(self):
+        self.session = Mock()
+        self.response = Mock(status_code=200)
+        self.response.json.return_value = {"count": 0}
+
+    def test_circuit_breaker_opens_after_failures(self):
+        """
+        This method tests that the circuit breaker refuses the calls after
+        failure_threshold consecutive failures and closes after a success
+        """
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertEqual(breaker.allow_request(), True)
+        breaker.record_failure()
+        self.assertEqual(breaker.allow_request(), False)
+        self.assertEqual(breaker.is_open(), True)
+
+        breaker.record_success()
+        self.assertEqual(breaker.allow_request(), True)
+
+    def test_circuit_breaker_half_open(self):
+        """
+        This method tests that only one call is allowed once reset_timeout is over
+        """
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.reset_timeout = 30
+        breaker.opened_at -= 31
+        self.assertEqual(breaker.allow_request(), True)
+        self.assertEqual(breaker.allow_request(), False)
+
+    def test_latency_budget_spent(self):
+        """
+        This method tests that no call can be done once the budget is spent
+        """
+        budget = LatencyBudget(0)
+        with self.assertRaises(ApiUnavailable):
+            budget.timeout(5)
+        self.assertEqual(LatencyBudget(10).timeout(3), 3)
+
+    def test_get_json_success(self):
+        self.session.get.return_value = self.response
+        self.assertEqual(get_json(self.session, "https://api", timeout=3), {"count": 0})
+        self.session.get.assert_called_once_with("https://api", params=None, headers=None, timeout=3)
+
+    @patch('search.utils.resilience.time.sleep')
+    def test_get_json_retry(self, mock_sleep):
+        """
+        This method tests that a timeout is retried before giving up
+        """
+        self.session.get.side_effect = [requests.Timeout(), self.response]
+        self.assertEqual(get_json(self.session, "https://api", retries=1), {"count": 0})
+        self.assertEqual(self.session.get.call_count, 2)
+
+    @patch('search.utils.resilience.time.sleep')
+    def test_get_json_fail(self, mock_sleep):
+        """
+        This method tests that ApiUnavailable is raised when all the attempts failed
+        and that the circuit breaker is opened
+        """
+        breaker = CircuitBreaker(failure_threshold=2)
+        self.session.get.return_value = Mock(status_code=503)
+        with self.assertRaises(ApiUnavailable):
+            get_json(self.session, "https://api", retries=1, breaker=breaker)
+        self.assertEqual(self.session.get.call_count, 2)
+
+        with self.assertRaises(ApiUnavailable):
+            get_json(self.session, "https://api", retries=1, breaker=breaker)
+        self.assertEqual(self.session.get.call_count, 2)
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# coding: utf-8
+from django.test import TestCase
+from ..models import Product, Category, SearchIndexEntry
+from ..utils.search_index import tokenize, MemorySearchIndex, DatabaseSearchIndex
+
+class TestSearchIndex(TestCase):
+    """
+    This class groups the unit tests linked to the inverted index used by the search,
+    with its two storages
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(name="jus de fruits", api_id="en:fruit-juices")
+        Category.objects.create(name="céréales pour petit-déjeuner", api_id="en:breakfast-cereals")
+        products = ["jus d'orange", "jus de pomme à boire, jus frais", "compote de pommes",
+                    "pâte à tartiner aux noisettes et au cacao"]
+        for numb, name in enumerate(products):
+            Product.objects.create(name=name, ref=str(numb), nutriscore="a")
+
+    def setUp(self):
+        self.indexes = [MemorySearchIndex(), DatabaseSearchIndex()]
+
+    def get_names(self, index, element_type, query):
+        model = Category if element_type == "category" else Product
+        return [model.objects.get(id=element_id).name for element_id in index.search(element_type, query)]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Pâte à tartiner, aux noisettes!"), ["pate", "tartiner", "aux", "noisettes"])
+
+    def test_index_maintained_on_insertion(self):
+        """
+        This method tests that the saved elements are in the table of the index
+        """
+        entries = SearchIndexEntry.objects.filter(element_type="product", token="jus")
+        self.assertEqual(entries.count(), 2)
+        self.assertEqual(entries.get(element_id=Product.objects.get(ref="1").id).frequency, 2)
+
+        product = Product.objects.create(name="jus de raisin", ref="10", nutriscore="b")
+        self.assertEqual(SearchIndexEntry.objects.filter(element_id=product.id, element_type="product").count(), 2)
+        product.delete()
+        self.assertEqual(SearchIndexEntry.objects.filter(element_id=product.id, element_type="product").count(), 0)
+
+    def test_accents_and_prefix(self):
+        for index in self.indexes:
+            self.assertEqual(self.get_names(index, "category", "cereale"), ["céréales pour petit-déjeuner"])
+            self.assertEqual(self.get_names(index, "product", "pomme"),
+                             ["compote de pommes", "jus de pomme à boire, jus frais"])
+
+    def test_ranking(self):
+        """
+        This method tests that the elements matching more words,
+        then more times the same word, come first
+        """
+        for index in self.indexes:
+            self.assertEqual(self.get_names(index, "product", "jus pomme"),
+                             ["jus de pomme à boire, jus frais", "compote de pommes", "jus d'orange"])
+            self.assertEqual(self.get_names(index, "product", "jus"),
+                             ["jus de pomme à boire, jus frais", "jus d'orange"])
+            self.assertEqual(index.search("product", "biscuit"), [])
+
+    def test_empty_index(self):
+        """
+        This method tests that None is returned when the index has not been built
+        """
+        SearchIndexEntry.objects.all().delete()
+        self.assertEqual(DatabaseSearchIndex().search("product", "jus"), None)
+        DatabaseSearchIndex().rebuild()
+        self.assertEqual(len(DatabaseSearchIndex().search("product", "jus")), 2)
+
+    def test_database_statistics_cached(self):
+        """
+        This method tests that the statistics of the database index are computed once,
+        then again when the index changes
+        """
+        index = DatabaseSearchIndex()
+        index.search("product", "jus")
+        with self.assertNumQueries(1):
+            index.search("product", "jus")
+        documents, average_length = index._get_statistics("product")
+        self.assertEqual(documents, 4)
+
+        # One more token for one of the 4 products
+        index.index_element("product", Product.objects.get(ref="0").id, "jus d'orange pressée")
+        self.assertEqual(index._get_statistics("product"), (4, average_length + 0.25))
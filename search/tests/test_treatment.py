@@ -6,8 +6,9 @@ from unittest.mock import patch
 from search.utils.db_interactions import DBInteractions
 from search.utils.api_interactions import OpenFoodFactsInteractions
 from search.utils.treatment import Treatment
+from search.utils.resilience import ApiUnavailable
 from django.contrib.auth.models import User
-from ..models import Product, Category, Profile
+from ..models import Product, Category, Profile, Favourite
 
 class TestTreatment(TestCase):
     """
@@ -209,7 +210,7 @@ class TestTreatment(TestCase):
         user_profile = Profile(user=user)
         user_profile.save()
         product = Product.objects.get(ref="123456789")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
     
     def setUp(self):
         self.treatment = Treatment()
@@ -655,7 +656,7 @@ class TestTreatment(TestCase):
         user_profile.save()
         
         for product in Product.objects.all():
-            user_profile.products.add(product.id)
+            Favourite.objects.create(profile=user_profile, product_id=product.id)
 
         user = self.client.login(username='test-ref', password='ref-test-view')
 
@@ -689,4 +690,162 @@ class TestTreatment(TestCase):
         result = [
             "<Product: le jus de raisin 100% jus de fruits>",]
         self.assertQuerysetEqual(query, result, ordered=False)
-        self.assertEqual(status, 'database full') 
\ No newline at end of file
+        self.assertEqual(status, 'database full')
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_register_products(self, mock_api_selected_product):
+        """
+        This method tests the public method register_products with a product already registered,
+        a product in the database and two products requested from the API (one is unavailable)
+        """
+        user = User.objects.get(username='test-ref')
+        product_info = {
+            "name" : "Biscuits aux graines de tournesol",
+            "ref" : "99999999999",
+            "description": "Un biscuit sain pour un corps sain qui aime les graines",
+            "nutriscore": "a",
+            "image_url": "https://static.openfoodfacts.org/images/products/152/sushine-cookie.jpg",
+            "categories": ["en:beverages", "en:plant-based-foods-and-beverages", "en:unknown"],
+            "ingredients": "pleins pleins de graines",
+            "nutriments": {"fat": 0.2, "saturated_fat": 0.1, "sugar": 15, "salt": 3},
+            "ingredients_image_url": "https://static.openfoodfacts.org/images/products/152/sunshine-ingredients.jpg",
+            "nutriments_image_url": "https://static.openfoodfacts.org/images/products/152/sunshine-nutriments.jpg",
+        }
+        mock_api_selected_product.side_effect = lambda ref: product_info if ref == "99999999999" else None
+        registered_ref = user.profile.products.get().ref
+
+        statuses = self.treatment.register_products(
+            user.username, [registered_ref, "456789123", "99999999999", "88888888888", "456789123"])
+        self.assertEqual(statuses, {
+            registered_ref: "registered",
+            "456789123": "registered",
+            "99999999999": "registered",
+            "88888888888": "product unavailable",
+        })
+        self.assertEqual(sorted(user.profile.products.values_list('ref', flat=True)),
+                         sorted([registered_ref, "456789123", "99999999999"]))
+
+        new_product = Product.objects.get(ref="99999999999")
+        self.assertEqual(new_product.name, "biscuits aux graines de tournesol")
+        self.assertEqual(new_product.favourite_count, 1)
+        self.assertEqual(Product.objects.get(ref="456789123").favourite_count, 1)
+        self.assertEqual(Product.objects.get(ref=registered_ref).favourite_count, 1)
+        self.assertEqual(sorted(new_product.categories.values_list('api_id', flat=True)),
+                         ["en:beverages", "en:plant-based-foods-and-beverages"])
+        # The new product can be found by the search
+        self.assertEqual(DBInteractions().get_search_selection("tournesol")["elements"][0]["ref"], "99999999999")
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    @patch('search.utils.db_interactions.DBInteractions.count_global_rows_in_db')
+    def test_register_products_too_much_rows(self, mock_count_global_rows, mock_api_selected_product):
+        """
+        This method tests that register_products counts the rows once and deletes one product
+        not registered by a user for each registration, without deleting the products to register
+        """
+        mock_count_global_rows.return_value = 10000
+        user = User.objects.get(username='test-ref')
+        refs = list(Product.objects.filter(favourite_count=0).order_by('last_interaction')
+                    .values_list('ref', flat=True))
+        to_register, to_delete = refs[0], refs[1]
+
+        statuses = self.treatment.register_products(user.username, [to_register])
+        self.assertEqual(statuses, {to_register: "registered"})
+        self.assertEqual(mock_count_global_rows.call_count, 1)
+        self.assertEqual(Product.objects.filter(ref=to_register).exists(), True)
+        self.assertEqual(Product.objects.filter(ref=to_delete).exists(), False)
+
+        # When there is no product to delete anymore, the registrations are refused
+        Product.objects.filter(favourite_count=0).exclude(ref="456789123").delete()
+        statuses = self.treatment.register_products(user.username, ["456789123", to_register])
+        self.assertEqual(statuses, {"456789123": "database full", to_register: "database full"})
+        mock_api_selected_product.assert_not_called()
+
+    @patch('search.utils.treatment.Treatment._refresh_product_details')
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_get_selected_product_from_db(self, mock_api_selected_product, mock_refresh):
+        """
+        This method tests that the product page of a product with stored details
+        is served from the database without any API call
+        """
+        Product.objects.filter(ref="987695121").update(ingredients="du boeuf",
+                                                       fat=12,
+                                                       details_updated=datetime.now())
+
+        result = self.treatment.get_selected_product("987695121")
+        self.assertEqual(result["name"], "steack charal")
+        self.assertEqual(result["ingredients"], "du boeuf")
+        self.assertEqual(result["nutriments"]["fat"], 12)
+        self.assertEqual(result["nutriments"]["salt"], -1)
+        self.assertEqual(mock_api_selected_product.call_count, 0)
+        self.assertEqual(mock_refresh.call_count, 0)
+
+    @patch('search.utils.treatment.Treatment._refresh_product_details')
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_get_selected_product_from_db_outdated(self, mock_api_selected_product, mock_refresh):
+        """
+        This method tests that outdated product details are still served from
+        the database and refreshed in background
+        """
+        Product.objects.filter(ref="987695121").update(ingredients="du boeuf",
+                                                       details_updated=datetime.now() - timedelta(days=30))
+
+        result = self.treatment.get_selected_product("987695121")
+        self.assertEqual(result["ingredients"], "du boeuf")
+        self.assertEqual(mock_api_selected_product.call_count, 0)
+        mock_refresh.assert_called_once_with("987695121")
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_get_selected_product_from_api_stored(self, mock_api_selected_product):
+        """
+        This method tests that the details of a known product requested from the API
+        are stored so the next product page is served from the database
+        """
+        mock_api_selected_product.return_value = {
+            "name" : "Steack Charal",
+            "ref" : "987695121",
+            "description": "mmmmmmhhhh Charal!!",
+            "nutriscore": "a",
+            "image_url": "https://static.openfoodfacts.org/images/products/152/haricot.jpg",
+            "categories": ["en:meats"],
+            "ingredients": "du boeuf",
+            "nutriments": {
+                "fat": 12,
+                "saturated_fat": 5,
+                "sugar": 0,
+                "salt": 0.5
+            },
+            "ingredients_image_url": "Image manquante",
+            "nutriments_image_url": "Image manquante",
+        }
+
+        self.treatment.get_selected_product("987695121")
+        self.treatment.get_selected_product("987695121")
+        self.assertEqual(mock_api_selected_product.call_count, 1)
+
+        product = Product.objects.get(ref="987695121")
+        self.assertEqual(product.ingredients, "du boeuf")
+        self.assertEqual(product.salt, 0.5)
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_selected_product')
+    def test_get_selected_product_api_unavailable(self, mock_api_selected_product):
+        """
+        This method tests that the product from the database is returned when the API
+        is unavailable, even if its details had never been stored
+        """
+        mock_api_selected_product.side_effect = ApiUnavailable("circuit breaker open")
+
+        result = self.treatment.get_selected_product("987695121")
+        self.assertEqual(result["name"], "steack charal")
+        self.assertEqual(result["ingredients"], "Information manquante")
+        self.assertEqual(result["nutriments"]["fat"], -1)
+
+        self.assertEqual(self.treatment.get_selected_product("00000000"), None)
+
+    @patch('search.utils.api_interactions.OpenFoodFactsInteractions.get_products_selection')
+    def test_get_choice_selection_api_unavailable(self, mock_get_products_selection):
+        """
+        This method tests that the search returns None instead of failing
+        when the API is unavailable
+        """
+        mock_get_products_selection.side_effect = ApiUnavailable("latency budget spent")
+        self.assertEqual(self.treatment.get_choice_selection("céréales"), None)
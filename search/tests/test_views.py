@@ -1,5 +1,6 @@
 #! /usr/bin/env python3
 # coding: utf-8
+from datetime import datetime, timezone
 from unittest.mock import patch
 from django.test import TestCase
 from django.urls import reverse
@@ -8,7 +9,8 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from ..views import index, choice
 from ..utils.treatment import Treatment
-from ..models import Product, Category, Profile
+from ..utils.mail_queue import send_queued_emails
+from ..models import Product, Category, Profile, Favourite
 
 class IndexPageTestCase(TestCase):
     """
@@ -152,7 +154,7 @@ class ProductPageTestCase(TestCase):
         user_profile = Profile(user=user)
         user_profile.save()
         product = Product.objects.get(ref="123456789")
-        user_profile.products.add(product.id)
+        Favourite.objects.create(profile=user_profile, product_id=product.id)
 
     @patch('search.utils.treatment.Treatment.get_selected_product')
     def test_product_page_get(self, mock_get_selected_product):
@@ -259,6 +261,91 @@ class ProductPageTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context['product_registered'], False)
 
+    @patch('search.utils.treatment.Treatment.get_selected_product')
+    def test_product_page_not_modified(self, mock_get_selected_product):
+        """
+        This method tests that a product page built from the database is not searched
+        again when the browser already has it, unless the user registers the product
+        """
+        Product.objects.filter(ref="987654321").update(details_updated=datetime.now(timezone.utc))
+        mock_get_selected_product.return_value = {"name": "Le haricot 100% naturellement bleue",
+                                                  "ref": "987654321"}
+        self.client.login(username='test-ref', password='ref-test-view')
+        url = reverse('search:product', args=("987654321",))
+
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(mock_get_selected_product.call_count, 1)
+
+        user_profile = User.objects.get(username='test-ref').profile
+        Favourite.objects.create(profile=user_profile, product=Product.objects.get(ref="987654321"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @patch('search.utils.treatment.Treatment.get_selected_product')
+    def test_product_page_from_api_without_etag(self, mock_get_selected_product):
+        mock_get_selected_product.return_value = None
+        response = self.client.get(reverse('search:product', args=("123456789",)))
+        self.assertEqual(response.has_header('ETag'), False)
+
+class SubstitutePageTestCase(TestCase):
+    """
+    This class tests the conditional responses of the substitute page
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(name="jus de pomme", ref="1", nutriscore="a")
+
+    @patch('search.utils.treatment.Treatment.get_substitute_selection')
+    def test_substitute_page_not_modified(self, mock_substitute_selection):
+        mock_substitute_selection.return_value = {
+            'type': 'product',
+            'number': 1,
+            'elements': [{'name': 'jus de pomme', 'ref': '1', 'nutriscore': 'a',
+                          'description': '', 'image_url': ''}],
+        }
+        url = reverse('search:substitute', args=('category', 'en:beverages'))
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(mock_substitute_selection.call_count, 1)
+
+        # A new product changes the data version
+        Product.objects.create(name="jus d'orange", ref="2", nutriscore="a")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @patch('search.utils.treatment.Treatment.get_substitute_selection')
+    def test_substitute_page_registered_products(self, mock_substitute_selection):
+        """
+        This method tests the products registered by the user on the page: the session
+        comes from the cache and the profile is loaded with the user
+        """
+        mock_substitute_selection.return_value = {
+            'type': 'product',
+            'number': 1,
+            'elements': [{'name': 'jus de pomme', 'ref': '1', 'nutriscore': 'a',
+                          'description': '', 'image_url': ''}],
+        }
+        user = User.objects.create_user('username-substitute', 'substitute@test.com', 'substitute-ref')
+        profile = Profile.objects.create(user=user)
+        Favourite.objects.create(profile=profile, product=Product.objects.get(ref="1"))
+        self.client.login(username='username-substitute', password='substitute-ref')
+        # user and profile, ETag (data and favourites versions), registered products
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('search:substitute', args=('category', 'en:beverages')))
+        self.assertTrue(response.context["list"][0]["product_registered"])
+
+    @patch('search.utils.treatment.Treatment.get_substitute_selection')
+    def test_substitute_page_empty_not_stored(self, mock_substitute_selection):
+        mock_substitute_selection.return_value = None
+        response = self.client.get(reverse('search:substitute', args=('category', 'en:beverages')))
+        self.assertIn('no-store', response['Cache-Control'])
+
 class RegisterPageTestCase(TestCase):
     """
     This class tests the register page view
@@ -293,6 +380,12 @@ class RegisterPageTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, reverse('log_in'))
 
+        # The activation email is queued, it is sent by the sendmails command
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['test-unitaire@register.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Activer votre compte.')
+
     def test_register_page_fail_registration(self):
         """
         The methods tests the behavior of the app when a registration is done
@@ -409,6 +502,17 @@ class PersonalPageTestCase(TestCase):
         response = self.client.get(reverse('search:personal'))
         self.assertEqual(response.status_code, 200)
 
+    def test_personal_page_session_of_model_backend(self):
+        """
+        This method tests that a session opened with the former authentication backend
+        is still connected
+        """
+        user = User.objects.get(username='username-existing')
+        self.client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('search:personal'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, user)
+
     def test_personal_page_non_connected(self):
         """
         This method tests the behavior of the app when a non-connected user
@@ -442,6 +546,26 @@ class ProductRegisteredPageTestCase(TestCase):
         response = self.client.get(reverse('search:product_registered'))
         self.assertEqual(response.status_code, 200)
 
+    def test_product_registered_next_page(self):
+        """
+        This method tests the json page of registered products used by the infinite scroll
+        """
+        user_profile = User.objects.get(username='username-existing').profile
+        for numb in range(8):
+            product = Product.objects.create(name="jus {}".format(numb), ref=str(numb), nutriscore="a")
+            Favourite.objects.create(profile=user_profile, product=product)
+
+        user = self.client.login(username='username-existing', password='existing-ref')
+        response = self.client.get(reverse('search:product_registered'))
+        self.assertEqual(len(response.context['list']), 6)
+        cursor = response.context['next_cursor']
+
+        response = self.client.get(reverse('search:product_registered_page'), {'after': cursor})
+        page = response.json()
+        self.assertEqual([product["ref"] for product in page["elements"]], ["1", "0"])
+        self.assertEqual(page["elements"][0]["url"], reverse('search:product', kwargs={'code': "1"}))
+        self.assertEqual(page["next_cursor"], None)
+
     def test_product_registered_page_non_connected(self):
         """
         This method tests the behavior of the app when a non-connected user
@@ -451,6 +575,52 @@ class ProductRegisteredPageTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, '/login/?next=/search/product-registered')
 
+class SaveTreatmentsTestCase(TestCase):
+    """
+    This class tests the view registering several products at once
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('username-batch', 'batch@register.com', 'batch-ref')
+        Profile(user=user).save()
+        Product.objects.create(name="jus de pomme", ref="1", nutriscore="a")
+        Product.objects.create(name="jus d'orange", ref="2", nutriscore="b")
+
+    def test_save_treatments_json(self):
+        self.client.login(username='username-batch', password='batch-ref')
+        response = self.client.post(reverse('search:save_treatments'), '{"codes": ["1", "2"]}',
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'statuses': {'1': 'registered', '2': 'registered'}})
+        user = User.objects.get(username='username-batch')
+        self.assertEqual(sorted(user.profile.products.values_list('ref', flat=True)), ["1", "2"])
+
+    def test_save_treatments_form(self):
+        self.client.login(username='username-batch', password='batch-ref')
+        response = self.client.post(reverse('search:save_treatments'), {'codes': ["1", "2"]},
+                                    HTTP_REFERER='/search/list/product/3')
+        self.assertRedirects(response, '/search/list/product/3', fetch_redirect_response=False)
+        self.assertEqual(Favourite.objects.filter(profile__user__username='username-batch').count(), 2)
+
+    def test_save_treatments_bad_request(self):
+        self.client.login(username='username-batch', password='batch-ref')
+        response = self.client.post(reverse('search:save_treatments'), '{"codes": "1"',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('search:save_treatments'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_save_treatments_codes_not_a_list(self):
+        self.client.login(username='username-batch', password='batch-ref')
+        response = self.client.post(reverse('search:save_treatments'), '{"codes": "3017620422003"}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Favourite.objects.filter(profile__user__username='username-batch').count(), 0)
+
+    def test_save_treatments_non_connected(self):
+        response = self.client.post(reverse('search:save_treatments'), {'codes': ["1"]})
+        self.assertEqual(response.status_code, 302)
+
 class EmailTest(TestCase):
 
     def test_send_email(self):
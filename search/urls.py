@@ -8,6 +8,9 @@ urlpatterns = [
     path('product/<code>', views.product, name="product"),
     path('personal-account', views.personal, name="personal"),
     path('product-registered', views.product_registered, name="product_registered"),
+    path('product-registered/page', views.product_registered_page, name="product_registered_page"),
+    path('save-treatment/batch', views.save_treatments, name="save_treatments"),
     path('save-treatment/<code>', views.save_treatment, name="save_treatment"),
     path('delete-treatment/<code>', views.delete_treatment, name="delete_treatment"),
+    path('images/<size>/<host>/<path:path>', views.thumbnail, name="thumbnail"),
 ]
\ No newline at end of file
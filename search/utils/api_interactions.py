@@ -1,14 +1,40 @@
 #! /usr/bin/env python3
 # coding: utf-8
 
-import re
 import random
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from .resilience import ApiUnavailable, CircuitBreaker, get_json
+from .normalizer import get_name_matcher
+
+# One HTTP session is shared by all the threads of a worker so the connections
+# to the API are kept alive between the requests
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# The circuit breaker is shared too: when the API fails for a request, the other
+# requests of the worker stop waiting for it
+breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
 
 class OpenFoodFactsInteractions:
     """
-    This class groups all the methods to interact with the Openfoodfacts API
+    This class groups all the methods to interact with the Openfoodfacts API.
+    All the calls raise ApiUnavailable if the API does not answer in time
     """
+
+    # Number of categories requested at the same time when we look for substitutes,
+    # once the most specific category alone was not enough
+    categories_batch_size = 3
+
+    # Timeout (in seconds) for each endpoint of the API
+    timeouts = {
+        'search': 5,
+        'product': 3,
+    }
+
+    def __init__(self, budget=None):
+        self.budget = budget
     
     def get_products_selection(self, query, max_numb):
         """
@@ -36,9 +62,11 @@ class OpenFoodFactsInteractions:
 
 
 
-    def get_substitute_products_from_api(self, element_type, info_id, max_numb):
+    def get_substitute_products_from_api(self, element_type, info_id, max_numb, category_graph=None):
         """
-        This method coordinates all 
+        This method coordinates all the process to get substitute products from the API.
+        For a product, the category graph (if given) chooses directly the category
+        instead of probing all the categories of the product
         """
         if element_type == "category":
             data_from_api = self._get_products_from_api_search('categories', info_id, 1000)
@@ -50,21 +78,33 @@ class OpenFoodFactsInteractions:
             data_from_api = {}
             validated = False
 
-            # We try to find an associated category to the product where there are at least 6 "a" products
-            while not validated and len(product_categories) > 0:
-                category_to_check = product_categories.pop()
-                check_category = self._get_products_from_api_search('categories', category_to_check, 1000)
-                substitute_product = 0
-                for product in check_category["products"]:
-                    try:
-                        if product["nutrition_grade_fr"] == "a":
-                            substitute_product += 1
-                    except:
-                        pass 
-                if substitute_product >= max_numb:
+            # The graph knows the categories of the database with enough healthy products
+            choosen_category = None
+            if category_graph:
+                choosen_category = category_graph.most_specific_category(product_categories, max_numb)
+            if choosen_category:
+                check_category = self._get_products_from_api_search('categories', choosen_category, 1000)
+                if self._count_healthy_products(check_category) >= max_numb:
                     validated = True
                     data_from_api = check_category
 
+            # We try to find an associated category to the product where there are at least 6 "a" products.
+            # The most specific categories are at the end of the hierarchy: the most specific one
+            # is requested alone (it is often enough), then the next ones by batches at the same time,
+            # checked in order
+            batch_size = 1
+            while not validated and len(product_categories) > 0:
+                categories_to_check = []
+                while product_categories and len(categories_to_check) < batch_size:
+                    categories_to_check.append(product_categories.pop())
+                batch_size = self.categories_batch_size
+
+                for check_category in self._get_categories_from_api_search(categories_to_check):
+                    if check_category and self._count_healthy_products(check_category) >= max_numb:
+                        validated = True
+                        data_from_api = check_category
+                        break
+
             # If we don't find any categories, we set up count attribute to 0
             if not validated:
                 data_from_api["count"] = 0
@@ -106,11 +146,46 @@ class OpenFoodFactsInteractions:
             'page' : '1'
         }
 
-        request = requests.get('https://fr.openfoodfacts.org/cgi/search.pl', params=payload)
-        data = request.json()
+        data = self._get_from_api('search', 'https://fr.openfoodfacts.org/cgi/search.pl', payload)
 
         return data
 
+    def _count_healthy_products(self, data):
+        """
+        This method counts the products with a nutriscore "a" in the data from the API
+        """
+        healthy_products = 0
+        for product in data["products"]:
+            try:
+                if product["nutrition_grade_fr"] == "a":
+                    healthy_products += 1
+            except:
+                pass
+        return healthy_products
+
+    def _get_categories_from_api_search(self, categories):
+        """
+        This method requests at the same time the products of several categories
+        and returns the results in the same order as the categories.
+        A failed request gives None without losing the others,
+        ApiUnavailable is raised only if all of them failed
+        """
+        def get_category(category):
+            try:
+                return self._get_products_from_api_search('categories', category, 1000), None
+            except ApiUnavailable as error:
+                return None, error
+
+        if len(categories) == 1:
+            results = [get_category(categories[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(categories)) as executor:
+                results = list(executor.map(get_category, categories))
+
+        if all(data is None for data, error in results):
+            raise results[0][1]
+        return [data for data, error in results]
+
     def _get_products_from_api_large_search(self, query, page_size):
         """
         This method gets all the products from the API linked to a query asked by the user (query)
@@ -125,18 +200,26 @@ class OpenFoodFactsInteractions:
             'page' : '1',
             'json' : '1'
         }
-        request = requests.get('https://fr.openfoodfacts.org/cgi/search.pl', params=payload)
-        data = request.json()
+        data = self._get_from_api('search', 'https://fr.openfoodfacts.org/cgi/search.pl', payload)
 
         return data
 
     def _get_product_from_api_code_search(self, code):
 
-        request = requests.get("https://fr.openfoodfacts.org/api/v0/product/" + code + ".json")
-        data = request.json()
+        data = self._get_from_api('product', "https://fr.openfoodfacts.org/api/v0/product/" + code + ".json")
 
         return data
 
+    def _get_from_api(self, endpoint, url, params=None):
+        """
+        This method requests the API with the timeout of the endpoint, in the limit
+        of the latency budget of the request and if the circuit breaker is closed
+        """
+        return get_json(session, url, params=params,
+                        timeout=self.timeouts[endpoint],
+                        budget=self.budget,
+                        breaker=breaker)
+
     def _select_product_info(self, data):
         
         product_info = {
@@ -278,7 +361,7 @@ class OpenFoodFactsInteractions:
         """
         This method gets the data from API and cleaned them to return only
         products
-            -> where the query matchs with the product name
+            -> where the query matchs with the product name (see NameMatcher)
             -> with a nutriscore 
         """
         products_info = {
@@ -286,11 +369,12 @@ class OpenFoodFactsInteractions:
             'number' : 0,
             'elements': []
         }
-        test = re.compile(r".*%s.*" % query, re.IGNORECASE)
-        for product in data["products"]:
+        # The names of the page are matched all together (a missing name never matches)
+        names = [product.get("product_name_fr") or "" for product in data["products"]]
+        matches = get_name_matcher(query).match_all([str(name) for name in names])
+        for product, appropriate_name in zip(data["products"], matches):
             try:
                 at_least_one_category = product["categories_hierarchy"][0]
-                appropriate_name = test.match(product["product_name_fr"])
                 nutriscore = product["nutrition_grade_fr"]
             
                 if appropriate_name and nutriscore and at_least_one_category:
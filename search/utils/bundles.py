@@ -0,0 +1,150 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+The CSS and JS files used by every page are concatenated in a few bundles
+(settings.STATIC_BUNDLES) by "manage.py bundlestatic":
+    -> the CSS is minified, the JS files are already the minified versions
+    -> the name of a bundle has the hash of its content (ex: site.3f2a9c1b7d4e.css),
+       the browser can keep it forever
+    -> a gzip and a brotli version are written next to it, served by WhiteNoise
+    -> manifest.json gives the file of each bundle to the {% bundle %} template tag
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The bundles are written in static/bundles/ (STATIC_BUNDLES_ROOT)
+BUNDLES_PREFIX = 'bundles'
+MANIFEST_NAME = 'manifest.json'
+
+# Strings are kept as they are, comments are removed and spaces are collapsed
+CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*(?!!).*?\*/|(\s+)', re.S)
+CSS_PUNCTUATION = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|\s*([{};,])\s*|(:)\s+')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+BUNDLE_FILE = re.compile(r'^(.+\.[0-9a-f]{12}\.\w+)(\.gz|\.br)?$')
+JS_SOURCE_MAP = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.M)
+
+## PRIVATE FUNCTIONS ##
+def _read_source(path):
+    """
+    This function returns the content of a static file, found like collectstatic does
+    """
+    full_path = finders.find(path)
+    if not full_path:
+        raise FileNotFoundError("Static file not found: {}".format(path))
+    with open(full_path, encoding='utf-8') as source:
+        return source.read()
+
+def _rebase_urls(css, path):
+    """
+    This function changes the relative urls of a CSS file so they are valid from the bundle
+    """
+    source_dir = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^(data:|[a-z]+:|/|#)', url):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(source_dir, url))
+        return 'url({0}{1}{0})'.format(quote, posixpath.relpath(target, BUNDLES_PREFIX))
+    return CSS_URL.sub(replace, css)
+
+def _join_sources(name, sources):
+    """
+    This function returns the content of a bundle
+    """
+    contents = []
+    for path in sources:
+        content = _read_source(path)
+        if name.endswith('.css'):
+            contents.append(minify_css(_rebase_urls(content, path)))
+        else:
+            contents.append(JS_SOURCE_MAP.sub('', content).strip())
+    # A JS file without a final semicolon must not be joined with the next one
+    return ('\n' if name.endswith('.css') else '\n;\n').join(contents) + '\n'
+
+## PUBLIC FUNCTIONS ##
+def get_bundles_root():
+    return getattr(settings, 'STATIC_BUNDLES_ROOT', os.path.join(settings.BASE_DIR, 'static', BUNDLES_PREFIX))
+
+def minify_css(css):
+    """
+    This function removes the comments (but /*! licences */) and the useless spaces of a CSS file
+    """
+    css = CSS_TOKENS.sub(lambda match: match.group(1) or (' ' if match.group(2) else ''), css)
+
+    def replace(match):
+        string, punctuation, colon = match.groups()
+        return string or punctuation or colon
+    return CSS_PUNCTUATION.sub(replace, css).replace(';}', '}').strip()
+
+def build_bundles(write=True):
+    """
+    This function builds the bundles of settings.STATIC_BUNDLES.
+    It returns the manifest {bundle name: hashed file name}; the files are written
+    (with their compressed versions) only if write is True, the old bundles are removed
+    """
+    root = get_bundles_root()
+    manifest = {}
+    files = {}
+    for name, sources in settings.STATIC_BUNDLES.items():
+        content = _join_sources(name, sources).encode('utf-8')
+        base, extension = os.path.splitext(name)
+        hashed_name = "{}.{}{}".format(base, hashlib.md5(content).hexdigest()[:12], extension)
+        manifest[name] = hashed_name
+        files[hashed_name] = content
+    if not write:
+        return manifest
+
+    os.makedirs(root, exist_ok=True)
+    for file_name in os.listdir(root):
+        match = BUNDLE_FILE.match(file_name)
+        if match and match.group(1) not in files:
+            os.remove(os.path.join(root, file_name))
+    for hashed_name, content in files.items():
+        with open(os.path.join(root, hashed_name), 'wb') as bundle:
+            bundle.write(content)
+        with open(os.path.join(root, hashed_name + '.gz'), 'wb') as bundle:
+            bundle.write(gzip.compress(content, 9))
+        if brotli:
+            with open(os.path.join(root, hashed_name + '.br'), 'wb') as bundle:
+                bundle.write(brotli.compress(content))
+    with open(os.path.join(root, MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=4, sort_keys=True)
+    get_manifest.cache_clear()
+    return manifest
+
+@lru_cache(maxsize=1)
+def get_manifest():
+    """
+    This function returns the manifest of the bundles built, read once by each worker
+    (empty if the bundles were never built)
+    """
+    try:
+        with open(os.path.join(get_bundles_root(), MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+def get_bundle_paths(name):
+    """
+    This function returns the static paths to load for a bundle: the bundle itself
+    if it is built and enabled, otherwise its source files
+    """
+    if getattr(settings, 'STATIC_BUNDLES_ENABLED', True):
+        hashed_name = get_manifest().get(name)
+        if hashed_name:
+            return [posixpath.join(BUNDLES_PREFIX, hashed_name)]
+    return list(settings.STATIC_BUNDLES[name])
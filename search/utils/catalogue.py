@@ -0,0 +1,298 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import sys
+import time
+import atexit
+import bisect
+import datetime
+import threading
+from array import array
+from collections import namedtuple
+from django.conf import settings
+from ..models import Product, Category
+
+CatalogueProduct = namedtuple('CatalogueProduct', ['id', 'name', 'ref', 'nutriscore', 'description', 'picture'])
+CatalogueCategory = namedtuple('CatalogueCategory', ['id', 'name', 'api_id'])
+
+class CatalogueData:
+    """
+    This class holds the columns of one load of the catalogue:
+        -> the products are stored in columns (one array or list per field),
+            the position of a product is the same in every column
+        -> the nutriscores are stored as bytes, the names are interned
+        -> the products of each category are stored as a CSR adjacency:
+            the products of the category i are category_products[offsets[i]:offsets[i + 1]]
+            (and the same for the categories of each product)
+    """
+
+    def __init__(self):
+        self.category_ids = array('l')
+        self.category_names = []
+        self.category_api_ids = []
+        self.category_positions = {}
+        self.product_ids = array('l')
+        self.refs = []
+        self.names = []
+        self.nutriscores = array('B')
+        self.descriptions = []
+        self.pictures = []
+        self.product_positions = {}
+        self.offsets = array('l', [0])
+        self.category_products = array('l')
+        self.product_offsets = array('l', [0])
+        self.product_categories = array('l')
+
+    def get_size(self):
+        """
+        This method estimates the memory taken by the columns (in bytes).
+        The interned strings are counted once
+        """
+        size = 0
+        strings = {}
+        for column in vars(self).values():
+            size += sys.getsizeof(column)
+            if isinstance(column, list):
+                strings.update((id(value), value) for value in column if value is not None)
+        size += sum(sys.getsizeof(value) for value in strings.values())
+        return size
+
+class ProductCatalogue:
+    """
+    This class keeps in memory a read-only copy of the products and categories
+    of the database, so the searches and the substitutes can be answered
+    without any query.
+    The catalogue is loaded at the first use, then reloaded when the database changes
+    in this process (signals) or after ttl seconds for the changes done by dbinit.
+    If it takes more than the memory budget, it is dropped and the database is used.
+    The last interactions of the products seen are saved by batches: every flush_size
+    products or flush_interval seconds, at each reload and when the process exits
+    """
+
+    def __init__(self, memory_budget=None, ttl=300, flush_size=500, flush_interval=300):
+        self.memory_budget = memory_budget
+        self.ttl = ttl
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.data = None
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.interactions_lock = threading.Lock()
+        self.pending_interactions = set()
+        self.flushed_at = time.monotonic()
+
+    def invalidate(self, **kwargs):
+        """
+        This method asks for a reload of the catalogue at its next use.
+        It can be connected to the model signals
+        """
+        self.loaded_at = None
+
+    def get_memory_budget(self):
+        """
+        This method returns the memory budget of the catalogue (in bytes),
+        0 means the catalogue is not used
+        """
+        if self.memory_budget is not None:
+            return self.memory_budget
+        return getattr(settings, 'PRODUCT_CATALOGUE_MEMORY_BUDGET', 0)
+
+    def get_data(self):
+        """
+        This method returns the columns of the catalogue, loaded from the database if needed.
+        It returns None if the catalogue is not used or is bigger than its memory budget
+        """
+        if not self.get_memory_budget():
+            return None
+        loaded_at = self.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            with self.lock:
+                if self.loaded_at is loaded_at:
+                    self.load()
+        return self.data
+
+    def load(self):
+        """
+        This method builds the catalogue from the database in three queries
+        """
+        self.flush_interactions()
+        data = CatalogueData()
+
+        category_index = {}
+        for category_id, name, api_id in Category.objects.order_by('id').values_list('id', 'name', 'api_id'):
+            category_index[category_id] = len(data.category_ids)
+            data.category_ids.append(category_id)
+            data.category_names.append(sys.intern(name))
+            data.category_api_ids.append(sys.intern(api_id))
+
+        product_index = {}
+        products = Product.objects.order_by('id').values_list('id', 'name', 'ref', 'nutriscore',
+                                                              'description', 'picture')
+        for product_id, name, ref, nutriscore, description, picture in products:
+            product_index[product_id] = len(data.product_ids)
+            data.product_ids.append(product_id)
+            data.names.append(sys.intern(name))
+            data.refs.append(ref)
+            data.nutriscores.append(ord(nutriscore) if nutriscore else 0)
+            data.descriptions.append(description)
+            data.pictures.append(picture)
+
+        category_links = [[] for category in data.category_ids]
+        product_links = [[] for product in data.product_ids]
+        links = Product.categories.through.objects.values_list('product_id', 'category_id')
+        for product_id, category_id in links:
+            category, product = category_index.get(category_id), product_index.get(product_id)
+            if category is not None and product is not None:
+                category_links[category].append(product)
+                product_links[product].append(category)
+
+        data.offsets, data.category_products = self._to_csr(category_links)
+        data.product_offsets, data.product_categories = self._to_csr(product_links)
+        data.category_positions = {api_id: numb for numb, api_id in enumerate(data.category_api_ids)}
+        data.product_positions = {ref: numb for numb, ref in enumerate(data.refs)}
+
+        self.data = data if data.get_size() <= self.get_memory_budget() else None
+        self.loaded_at = time.monotonic()
+
+    def search_categories(self, data, words, max_numb=6):
+        """
+        This method returns the first max_numb categories whose name contains
+        one of the words (like name__icontains in the database)
+        """
+        positions = self._search(data.category_names, words, max_numb)
+        return self._get_categories(data, positions)
+
+    def search_products(self, data, words, max_numb=6):
+        """
+        This method returns the first max_numb products whose name contains
+        one of the words (like name__icontains in the database)
+        """
+        positions = self._search(data.names, words, max_numb)
+        return self._get_products(data, positions)
+
+    def get_elements_by_id(self, data, element_type, element_ids):
+        """
+        This method returns the categories or products with the given ids, in the same order.
+        The unknown ids are ignored
+        """
+        ids = data.category_ids if element_type == "category" else data.product_ids
+        positions = []
+        for element_id in element_ids:
+            position = bisect.bisect_left(ids, element_id)
+            if position < len(ids) and ids[position] == element_id:
+                positions.append(position)
+        if element_type == "category":
+            return self._get_categories(data, positions)
+        return self._get_products(data, positions)
+
+    def get_healthy_products(self, data, api_id, max_numb=6):
+        """
+        This method returns the first max_numb products of the category with a "a" nutriscore.
+        It returns None if the category is unknown
+        """
+        category = data.category_positions.get(api_id)
+        if category is None:
+            return None
+        healthy = ord("a")
+        positions = []
+        for position in data.category_products[data.offsets[category]:data.offsets[category + 1]]:
+            if data.nutriscores[position] == healthy:
+                positions.append(position)
+                if len(positions) == max_numb:
+                    break
+        return self._get_products(data, positions)
+
+    def get_product_categories(self, data, ref):
+        """
+        This method returns the api_id of the categories of a product.
+        It returns None if the product is unknown
+        """
+        product = data.product_positions.get(ref)
+        if product is None:
+            return None
+        self._touch(data, [product])
+        categories = data.product_categories[data.product_offsets[product]:data.product_offsets[product + 1]]
+        return [data.category_api_ids[category] for category in categories]
+
+    def flush_interactions(self):
+        """
+        This method saves in the database the last interaction of the products
+        returned by the catalogue since the last flush, in one query
+        """
+        with self.interactions_lock:
+            product_ids, self.pending_interactions = self.pending_interactions, set()
+            self.flushed_at = time.monotonic()
+        if product_ids:
+            Product.objects.filter(id__in=product_ids).update(
+                last_interaction=datetime.datetime.now(datetime.timezone.utc))
+
+    def _search(self, names, words, max_numb):
+        positions = []
+        for position, name in enumerate(names):
+            name = name.lower()
+            if any(word in name for word in words):
+                positions.append(position)
+                if len(positions) == max_numb:
+                    break
+        return positions
+
+    def _get_categories(self, data, positions):
+        return [CatalogueCategory(data.category_ids[position], data.category_names[position],
+                                  data.category_api_ids[position]) for position in positions]
+
+    def _get_products(self, data, positions):
+        self._touch(data, positions)
+        products = []
+        for position in positions:
+            nutriscore = data.nutriscores[position]
+            products.append(CatalogueProduct(data.product_ids[position], data.names[position],
+                                             data.refs[position], chr(nutriscore) if nutriscore else "",
+                                             data.descriptions[position], data.pictures[position]))
+        return products
+
+    def record_interactions(self, product_ids):
+        """
+        This method keeps the products seen by a user, their last interaction
+        is saved at the next flush (before the next load or a database cleaning,
+        or now if flush_size products or flush_interval seconds are reached)
+        """
+        with self.interactions_lock:
+            self.pending_interactions.update(product_ids)
+            due = (len(self.pending_interactions) >= self.flush_size
+                   or time.monotonic() - self.flushed_at >= self.flush_interval)
+        if due:
+            self.flush_interactions()
+
+    def _touch(self, data, positions):
+        self.record_interactions(data.product_ids[position] for position in positions)
+
+    def _to_csr(self, links):
+        offsets = array('l', [0])
+        targets = array('l')
+        for row in links:
+            targets.extend(sorted(row))
+            offsets.append(len(targets))
+        return offsets, targets
+
+product_catalogue = ProductCatalogue()
+
+def flush_product_interactions_at_exit():
+    """
+    This function saves the last interactions kept by the catalogue when the worker exits
+    (restart after max-requests, dyno cycling), the database can be unavailable by then
+    """
+    try:
+        product_catalogue.flush_interactions()
+    except Exception:
+        pass
+
+atexit.register(flush_product_interactions_at_exit)
+
+def invalidate_product_catalogue(sender, update_fields=None, **kwargs):
+    """
+    This function is connected to the signals of the models used by the catalogue.
+    Saving only the last interaction of a product does not change the catalogue
+    """
+    if update_fields and set(update_fields) <= {'last_interaction'}:
+        return
+    product_catalogue.invalidate()
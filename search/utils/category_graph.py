@@ -0,0 +1,145 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import time
+import threading
+from django.db.models import Count, Q
+from ..models import Category
+
+class CategoryNode:
+    """
+    This class represents a category in the graph
+    """
+
+    __slots__ = ('parents', 'children', 'total_products', 'healthy_products', 'depth')
+
+    def __init__(self, total_products, healthy_products):
+        self.parents = []
+        self.children = []
+        self.total_products = total_products
+        self.healthy_products = healthy_products
+        self.depth = 0
+
+class CategoryGraph:
+    """
+    This class keeps in memory the hierarchy of the categories from the database
+    (parents / children edges) with, for each category:
+        -> its total number of products in the API
+        -> its number of healthy products ("a" nutriscore) in the database
+        -> its depth in the hierarchy (the deeper, the more specific)
+    The graph is loaded at the first use, then reloaded when the database changes
+    in this process (signals) or after ttl seconds for the changes done by dbinit
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.nodes = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def invalidate(self, **kwargs):
+        """
+        This method asks for a reload of the graph at its next use.
+        It can be connected to the model signals
+        """
+        self.loaded_at = None
+
+    def get_nodes(self):
+        """
+        This method returns the nodes of the graph, loaded from the database if needed
+        """
+        loaded_at = self.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            with self.lock:
+                if self.loaded_at is loaded_at:
+                    self.load()
+        return self.nodes
+
+    def load(self):
+        """
+        This method builds the graph from the database in two queries
+        """
+        nodes = {}
+        api_ids = {}
+        categories = Category.objects.annotate(
+            healthy_products=Count('products', filter=Q(products__nutriscore="a"))
+        ).values_list('id', 'api_id', 'total_products', 'healthy_products')
+        for category_id, api_id, total_products, healthy_products in categories:
+            nodes[api_id] = CategoryNode(total_products, healthy_products)
+            api_ids[category_id] = api_id
+
+        edges = Category.parents.through.objects.values_list('from_category_id', 'to_category_id')
+        for child_id, parent_id in edges:
+            child, parent = api_ids.get(child_id), api_ids.get(parent_id)
+            if child and parent:
+                nodes[child].parents.append(parent)
+                nodes[parent].children.append(child)
+
+        self._set_depths(nodes)
+        self.nodes = nodes
+        self.loaded_at = time.monotonic()
+
+    def most_specific_category(self, api_ids, min_healthy_products):
+        """
+        This method returns, among the categories api_ids and their ancestors, the most
+        specific one with at least min_healthy_products healthy products.
+        The most specific is the deepest in the hierarchy, then the one with the less products.
+        It returns None if there is no category with enough healthy products
+        """
+        nodes = self.get_nodes()
+        candidates = set()
+        to_visit = [api_id for api_id in api_ids if api_id in nodes]
+        while to_visit:
+            api_id = to_visit.pop()
+            if api_id not in candidates:
+                candidates.add(api_id)
+                to_visit.extend(nodes[api_id].parents)
+
+        choosen_category = None
+        choosen_key = None
+        for api_id in candidates:
+            node = nodes[api_id]
+            if node.healthy_products >= min_healthy_products:
+                key = (-node.depth, node.total_products, api_id)
+                if choosen_key is None or key < choosen_key:
+                    choosen_category, choosen_key = api_id, key
+
+        return choosen_category
+
+    def _set_depths(self, nodes):
+        """
+        This method calculates the depth of each category: the length of the
+        longest path from a category without parent.
+        The walk is iterative and ignores the edges which would create a cycle
+        """
+        depths = {}
+        for start in nodes:
+            to_visit = [(start, False)]
+            in_progress = set()
+            while to_visit:
+                api_id, parents_done = to_visit.pop()
+                if api_id in depths:
+                    continue
+                if parents_done:
+                    in_progress.discard(api_id)
+                    parents = [parent for parent in nodes[api_id].parents if parent in depths]
+                    depths[api_id] = 1 + max(depths[parent] for parent in parents) if parents else 0
+                elif api_id not in in_progress:
+                    in_progress.add(api_id)
+                    to_visit.append((api_id, True))
+                    to_visit.extend((parent, False) for parent in nodes[api_id].parents
+                                    if parent not in depths and parent not in in_progress)
+
+        for api_id, depth in depths.items():
+            nodes[api_id].depth = depth
+
+category_graph = CategoryGraph()
+
+def invalidate_category_graph(sender, update_fields=None, **kwargs):
+    """
+    This function is connected to the signals of the models used by the graph.
+    Saving only the last interaction of a product does not change the graph
+    """
+    if update_fields and set(update_fields) <= {'last_interaction'}:
+        return
+    category_graph.invalidate()
@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+The connections to the database are kept open by the workers (CONN_MAX_AGE).
+A connection kept open can be closed by the server (restart, pooler, timeout):
+it is checked at the start of a request, at most every DB_HEALTH_CHECK_INTERVAL seconds,
+and replaced if it does not answer anymore
+"""
+
+import time
+from django.conf import settings
+from django.core.signals import request_started, request_finished
+from django.db import connections
+
+def check_connections(**kwargs):
+    """
+    This function closes the persistent connections which do not answer anymore,
+    so the request opens a new one instead of failing (connected to request_started)
+    """
+    interval = getattr(settings, 'DB_HEALTH_CHECK_INTERVAL', 30)
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is None or not conn.settings_dict['CONN_MAX_AGE']:
+            continue
+        if now - getattr(conn, 'last_health_check', 0) < interval:
+            continue
+        conn.last_health_check = now
+        if not conn.is_usable():
+            conn.close()
+
+def measure_connection_overhead(requests=100, alias='default'):
+    """
+    This function simulates requests which make one query, first with a new connection
+    for each request (CONN_MAX_AGE = 0), then with the persistent connection.
+    It returns the mean duration (in seconds) of a request for both
+    """
+    conn = connections[alias]
+    max_age = conn.settings_dict['CONN_MAX_AGE']
+
+    def measure(conn_max_age):
+        conn.close()
+        conn.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        start = time.perf_counter()
+        for numb in range(requests):
+            request_started.send(sender=__name__)
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            request_finished.send(sender=__name__)
+        return (time.perf_counter() - start) / requests
+
+    try:
+        return {
+            'new_connection': measure(0),
+            # None: the connection is never closed
+            'persistent': measure(max_age if max_age else None),
+        }
+    finally:
+        conn.settings_dict['CONN_MAX_AGE'] = max_age
+        conn.close()
@@ -1,13 +1,19 @@
 #! /usr/bin/env python3
 # coding: utf-8
+import base64
 import operator
-import unicodedata
 import datetime
 from functools import reduce
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, F, Count, Max
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth.models import User
-from ..models import Product, Category, Profile
+from ..models import Product, Category, Profile, Favourite, SearchIndexEntry, QueuedEmail, Job, QueryLog, RejectedCategory
+from .category_graph import category_graph
+from .catalogue import product_catalogue
+from .search_index import get_search_index
+from .normalizer import clean_query
 
 class DBInteractions:
     """
@@ -15,6 +21,10 @@ class DBInteractions:
         -> Search process
     """
 
+    def __init__(self):
+        # The profiles already found, by username (see get_profile)
+        self.profiles = {}
+
     ## PUBLIC METHODS ##
     def get_search_selection(self, query):
         """
@@ -62,20 +72,41 @@ class DBInteractions:
         """
         db_ok = False
         if rows > 8500:
-            products = Product.objects.all().order_by('last_interaction')
-            product_checked = 0
-            while not db_ok and product_checked < products.count() - 1:
-                product = products[product_checked]
-                if not product.users.all().exists():
-                    product.delete()
-                    db_ok = True
-                else:
-                    product_checked += 1
+            # The last interactions kept by the catalogue are needed to choose the product
+            product_catalogue.flush_interactions()
+            product = Product.objects.filter(favourite_count=0).order_by('last_interaction').first()
+            if product:
+                product.delete()
+                db_ok = True
         else:
             db_ok = True
 
         return db_ok
 
+    def check_db_for_registrations(self, rows, number, kept_refs=()):
+        """
+        This method checks the database capacity before registering several products
+        at once, with the same limits as check_db_for_registration:
+            -> if the volume of rows is > to 8500, one product which had not been registered
+                by a user is deleted for each registration (the oldest last_interaction first)
+            -> the products of kept_refs (the ones we want to register) are never deleted
+        It returns the number of registrations which can be done
+        """
+        if rows <= 8500:
+            return number
+
+        product_catalogue.flush_interactions()
+        product_ids = list(Product.objects.filter(favourite_count=0).exclude(ref__in=kept_refs)
+                           .order_by('last_interaction').values_list('id', flat=True)[:number])
+        Product.objects.filter(id__in=product_ids).delete()
+        return len(product_ids)
+
+    def get_products_refs_in_db(self, product_refs):
+        """
+        This method returns the refs of the products which exist in the database, in one query
+        """
+        return set(Product.objects.filter(ref__in=product_refs).values_list('ref', flat=True))
+
     def check_product_existence_in_db(self, product_ref):
         """
         This method checks if a product exists in the database
@@ -92,7 +123,8 @@ class DBInteractions:
                                                 ref=product_info["ref"],
                                                 nutriscore=product_info["nutriscore"],
                                                 picture=product_info["image_url"],
-                                                description=product_info["description"])
+                                                description=product_info["description"],
+                                                **self._product_details_to_fields(product_info))
         for category in product_info["categories"]:
             try:
                 cat_in_db = Category.objects.get(api_id=category) 
@@ -100,14 +132,146 @@ class DBInteractions:
             except:
                 pass
 
+    def get_product_details(self, product_ref, details_required=True):
+        """
+        This method gets from the database all the information displayed on the product page.
+        It returns None if the product is not in the database or if its details
+        had never been stored (except if details_required is False)
+        """
+        products = Product.objects.filter(ref=product_ref)
+        if details_required:
+            products = products.filter(details_updated__isnull=False)
+        product = products.first()
+        if product:
+            Product.objects.filter(id=product.id).update(last_interaction=timezone.now())
+            return self._product_to_dict(product)
+        else:
+            return None
+
+    def set_product_details(self, product_info):
+        """
+        This method stores the information displayed on the product page
+        for a product which is already in the database
+        """
+        Product.objects.filter(ref=product_info["ref"]).update(**self._product_details_to_fields(product_info))
+
+    def postpone_product_details_refresh(self, product_ref):
+        """
+        This method keeps the product details stored but marks them as checked, when the API
+        could not give new ones: they are not seen as outdated before max_age days again
+        """
+        Product.objects.filter(ref=product_ref, details_updated__isnull=False) \
+                       .update(details_updated=timezone.now())
+
+    def check_product_details_outdated(self, product_ref, max_age=7):
+        """
+        This method checks if the details of a product had been stored for
+        more than max_age days and need to be refreshed from the API
+        """
+        limit = timezone.now() - datetime.timedelta(days=max_age)
+        outdated = Product.objects.filter(ref=product_ref, details_updated__lt=limit).exists()
+        return outdated
+
+    def get_product_version(self, product_ref):
+        """
+        This method returns the version of the product page information stored in the database
+        (the date of its details), or None if the details are not in the database.
+        The product is seen by the user even if the page is not sent again (304),
+        so its last interaction is kept for the next flush of the catalogue
+        """
+        product = Product.objects.filter(ref=product_ref, details_updated__isnull=False) \
+                                 .values_list('id', 'details_updated').first()
+        if not product:
+            return None
+        product_catalogue.record_interactions([product[0]])
+        return product[1].isoformat()
+
+    def get_data_version(self):
+        """
+        This method returns a version of the categories and products in the database.
+        It changes when a product is added or deleted, when product details are stored
+        and when the categories are synchronized by dbinit
+        """
+        products = Product.objects.aggregate(number=Count('id'), last_id=Max('id'),
+                                             last_details=Max('details_updated'))
+        categories = Category.objects.aggregate(number=Count('id'), last_synced=Max('last_synced'))
+        return "{number}-{last_id}-{last_details}/".format(**products) \
+               + "{number}-{last_synced}".format(**categories)
+
+    def get_favourites_version(self, username):
+        """
+        This method returns a version of the products registered by a user,
+        it changes when a product is registered or removed
+        """
+        favourites = Favourite.objects.filter(profile__user__username=username) \
+                                      .aggregate(number=Count('id'), last_id=Max('id'))
+        return "{number}-{last_id}".format(**favourites)
+
+    def get_profile(self, username):
+        """
+        This method returns the profile of a user (with the user) in one query.
+        It is requested once by DBInteractions instance, so once by request
+        """
+        if username not in self.profiles:
+            self.profiles[username] = Profile.objects.select_related('user').get(user__username=username)
+        return self.profiles[username]
+
     def save_product_for_user(self, username, product_ref):
         """
         This method registers a product to a user
         """
 
-        user = User.objects.get(username=username)
+        profile = self.get_profile(username)
         product = Product.objects.get(ref=product_ref)
-        user.profile.products.add(product.id)   
+        # The favourite and the favourite_count of the product are saved together
+        with transaction.atomic():
+            Favourite.objects.get_or_create(profile=profile, product=product)
+
+    def save_products_for_user(self, username, product_refs, products_info):
+        """
+        This method registers several products to a user in one transaction:
+            -> the products which are not yet in the database (products_info, from the API)
+                are inserted all together, and so are their links to the categories
+            -> the favourites are inserted all together, the products already registered
+                by the user are kept as they are
+        The bulk insertions do not send any signal, so the favourite counts, the search index
+        and the in-memory caches are updated here
+        """
+        profile = self.get_profile(username)
+        api_ids = {api_id for product_info in products_info for api_id in product_info["categories"]}
+        with transaction.atomic():
+            Product.objects.bulk_create([
+                Product(name=product_info["name"].lower(),
+                        ref=product_info["ref"],
+                        nutriscore=product_info["nutriscore"],
+                        picture=product_info["image_url"],
+                        description=product_info["description"],
+                        **self._product_details_to_fields(product_info))
+                for product_info in products_info
+            ])
+            # The ids of the new products are not given back by every database
+            products = dict(Product.objects.filter(ref__in=product_refs).values_list('ref', 'id'))
+            categories = dict(Category.objects.filter(api_id__in=api_ids).values_list('api_id', 'id'))
+            Product.categories.through.objects.bulk_create([
+                Product.categories.through(product_id=products[product_info["ref"]],
+                                           category_id=categories[api_id])
+                for product_info in products_info
+                for api_id in set(product_info["categories"]) if api_id in categories
+            ])
+
+            registered = set(Favourite.objects.filter(profile=profile, product_id__in=products.values())
+                             .values_list('product_id', flat=True))
+            new_ids = [products[ref] for ref in product_refs if products[ref] not in registered]
+            Favourite.objects.bulk_create([Favourite(profile=profile, product_id=product_id)
+                                           for product_id in new_ids])
+            Product.objects.filter(id__in=new_ids).update(favourite_count=F('favourite_count') + 1)
+
+            get_search_index().index_elements('product', [(products[product_info["ref"]], product_info["name"].lower())
+                                                          for product_info in products_info])
+
+        if products_info:
+            category_graph.invalidate()
+            product_catalogue.invalidate()
 
     def count_global_rows_in_db(self):
         """
@@ -117,22 +281,27 @@ class DBInteractions:
         """
         rows = 0
         # We count Categories
-        categories = Category.objects.all()
-        rows += categories.count()
+        rows += Category.objects.count()
         # We count Products
         products = Product.objects.all().count()
         rows += products
+        # We count Categories hierarchy links
+        rows += Category.parents.through.objects.count()
+        # We count the rows of the search index
+        rows += SearchIndexEntry.objects.count()
         # We count Categories-Products associations
-        for category in categories:
-            products_per_category = category.products.count()
-            rows += products_per_category
+        rows += Product.categories.through.objects.count()
         # We count Users
         users = User.objects.all()
         rows += users.count()
         # We count User-Products associations
-        for user in users:
-            products_per_user = user.profile.products.count()
-            rows += products_per_user
+        rows += Favourite.objects.count()
+        # We count the emails waiting to be sent and the background jobs
+        rows += QueuedEmail.objects.count()
+        rows += Job.objects.count()
+        # We count the query logs and the categories rejected by dbinit
+        rows += QueryLog.objects.count()
+        rows += RejectedCategory.objects.count()
 
         return rows
 
@@ -141,27 +310,50 @@ class DBInteractions:
         This method gets all the products registered by a user and returns them
         into a formatted dictionnary
         """
-        user = User.objects.get(username=username)
-        check_products = user.profile.products.all().exists()
-        if check_products:
-            query = user.profile.products.all()
+        query = list(self.get_profile(username).products.all())
+        if query:
             products = self._queryset_to_dict(query, 'product')
             return products
         else:
             return None
 
+    def get_products_registered_page(self, username, cursor=None, page_size=6):
+        """
+        This method gets one page of the products registered by a user, from the
+        most recently saved, in one query.
+        The pages are found with the position of the last product of the previous page
+        (cursor) instead of an offset, so every page costs the same whatever its number.
+        It returns the formatted dictionnary with the cursor of the next page (None for the last one)
+        """
+        favourites = Favourite.objects.filter(profile__user__username=username)
+        position = self._decode_cursor(cursor)
+        if position:
+            created_at, favourite_id = position
+            favourites = favourites.filter(Q(created_at__lt=created_at)
+                                           | Q(created_at=created_at, id__lt=favourite_id))
+        favourites = list(favourites.select_related('product').order_by('-created_at', '-id')[:page_size + 1])
+
+        products = self._queryset_to_dict([favourite.product for favourite in favourites[:page_size]], 'product')
+        for product in products["elements"]:
+            product["product_registered"] = True
+        products["next_cursor"] = None
+        if len(favourites) > page_size:
+            products["next_cursor"] = self._encode_cursor(favourites[page_size - 1])
+        return products
+
     def delete_product_registered(self, username, product_ref):
         """
         This method removed a product from the user list of registered products.
         It removes the many-to-many relation between the user and the product
         """
 
-        user = User.objects.get(username=username)
+        profile = self.get_profile(username)
         product = Product.objects.get(ref=product_ref)
-        user.profile.products.remove(product)
+        with transaction.atomic():
+            Favourite.objects.filter(profile=profile, product=product).delete()
 
         status = ""
-        if user.profile.products.filter(ref=product_ref).exists():
+        if profile.products.filter(ref=product_ref).exists():
             status = "error"
         else:
             status = "success"
@@ -169,39 +361,42 @@ class DBInteractions:
 
     ## PRIVATE METHODS ##
     def _clean_query(self, query):
-        useless_terms = ['a', 'de', 'de', 'des', 'un', 'une', 'tout', 'tous', 'les',
-                         'la', 'le', 'qui', 'que', 'quoi', 'ce', 'ces', 'sans', 'avec']
-        
-        # set query in lowercase
-        query = query.lower()
-        
-        # Remove accents
-        try:
-            query = unicode(query, 'utf-8')
-        except NameError:
-            pass
-        query = unicodedata.normalize('NFD', query)
-        query = query.encode('ascii', 'ignore')
-        query = query.decode('utf-8')
-        query = str(query)
-
-        # Delete useless terms in query
-        query_list = query.split()
-        clean_query_list = []
-        for word in query_list:
-            if word not in useless_terms:
-                clean_query_list.append(word)
-
-        query = ' '.join(clean_query_list)
-        return query
+        """
+        This method removes the accents and the useless terms of the query
+        """
+        return clean_query(query)
 
     def _get_info_in_db(self, model, query):
         """
         This method gets in database the categories or products (max 6) according
-        usr query. If there is any category or product, it returns None
+        usr query. If there is any category or product, it returns None.
+        The elements are found and ranked with the inverted index of their names,
+        the substring search is only used while the index is empty
         """
         
         words_query = query.lower().split()
+        if not words_query:
+            return None
+
+        element_type = "category" if model is Category else "product"
+        catalogue_data = product_catalogue.get_data()
+        element_ids = get_search_index().search(element_type, query, 6)
+        if element_ids is not None:
+            if not element_ids:
+                return None
+            # The in-memory catalogue gives the elements without any query when it is used
+            if catalogue_data:
+                return product_catalogue.get_elements_by_id(catalogue_data, element_type, element_ids) or None
+            elements = model.objects.in_bulk(element_ids)
+            return [elements[element_id] for element_id in element_ids if element_id in elements] or None
+
+        if catalogue_data:
+            if model is Category:
+                elements = product_catalogue.search_categories(catalogue_data, words_query, 6)
+            else:
+                elements = product_catalogue.search_products(catalogue_data, words_query, 6)
+            return elements or None
+
         conditions = []
         for word in words_query:
             conditions.append(("name__icontains", word))
@@ -258,6 +453,79 @@ class DBInteractions:
         dict_info["number"] = len(dict_info["elements"])
         return dict_info
 
+    def _encode_cursor(self, favourite):
+        """
+        This method returns the position of a favourite as a string usable in an url
+        """
+        position = "{}|{}".format(favourite.created_at.isoformat(), favourite.id)
+        return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, cursor):
+        """
+        This method returns the (created_at, id) position from a cursor,
+        or None if there is no cursor or if it is not valid (the first page is returned)
+        """
+        if not cursor:
+            return None
+        try:
+            created_at, favourite_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                return None
+            return created_at, int(favourite_id)
+        except (ValueError, UnicodeError, TypeError):
+            return None
+
+    def _product_details_to_fields(self, product_info):
+        """
+        This method transforms the product page information from the API into
+        the Product fields. Missing nutriments (-1) are stored as null values
+        """
+        fields = {
+            'ingredients': product_info["ingredients"],
+            'ingredients_picture': product_info["ingredients_image_url"],
+            'nutriments_picture': product_info["nutriments_image_url"],
+            'details_updated': timezone.now(),
+        }
+        for nutriment in ('fat', 'saturated_fat', 'sugar', 'salt'):
+            try:
+                value = float(product_info["nutriments"][nutriment])
+                fields[nutriment] = value if value >= 0 else None
+            except (KeyError, TypeError, ValueError):
+                fields[nutriment] = None
+
+        return fields
+
+    def _product_to_dict(self, product):
+        """
+        This method transforms a product from the database into the same dictionnary
+        as the one built from the API for the product page
+        """
+
+        product_info = {
+            "name" : product.name,
+            "ref" : product.ref,
+            "description": product.description,
+            "nutriscore": product.nutriscore,
+            "image_url": product.picture,
+            "categories": [category.api_id for category in product.categories.all()],
+            "ingredients": product.ingredients or "Information manquante",
+            "nutriments": {
+                "fat": product.fat,
+                "saturated_fat": product.saturated_fat,
+                "sugar": product.sugar,
+                "salt": product.salt
+            },
+            "ingredients_image_url": product.ingredients_picture or "Image manquante",
+            "nutriments_image_url": product.nutriments_picture or "Image manquante",
+        }
+
+        for nutriment, value in product_info["nutriments"].items():
+            if value is None:
+                product_info["nutriments"][nutriment] = -1
+
+        return product_info
+
     def _get_selected_product(self, product_code):
         """
         This method gets all necessary information from a products thanks to its code
@@ -277,17 +545,20 @@ class DBInteractions:
     def _get_healthy_products_from_products(self, product_ref):
         
         try:
-            # We get product info
-            product = Product.objects.get(ref=product_ref)
-            product.last_interaction = datetime.datetime.now(datetime.timezone.utc)
-            product.save()
-            # We select the appropriate category associated by choosing the cat with the minimum size
-            total_product = -1
-            choosen_category = ""
-            for category in product.categories.all():
-                if category.total_products < total_product or total_product < 0:
-                    total_product = category.total_products
-                    choosen_category = category.api_id
+            # We get product categories, from the in-memory catalogue when it is used
+            catalogue_data = product_catalogue.get_data()
+            categories = None
+            if catalogue_data:
+                categories = product_catalogue.get_product_categories(catalogue_data, product_ref)
+            if categories is None:
+                product = Product.objects.get(ref=product_ref)
+                product.last_interaction = datetime.datetime.now(datetime.timezone.utc)
+                product.save(update_fields=['last_interaction'])
+                categories = list(product.categories.values_list('api_id', flat=True))
+            # We select the most specific category of the product with 6 healthy products
+            # (or at least one) thanks to the category graph
+            choosen_category = (category_graph.most_specific_category(categories, 6)
+                                or category_graph.most_specific_category(categories, 1))
             # We select the products to substitute thankts to the choosen_category
             products = self._get_healthy_products_from_categories(choosen_category)
             return products
@@ -300,12 +571,17 @@ class DBInteractions:
         This method gets dirty products to subsititude from a selected category:
             -> we use api_id value because it is cleaner than name
         """
+        catalogue_data = product_catalogue.get_data()
+        if catalogue_data:
+            products = product_catalogue.get_healthy_products(catalogue_data, category_name, 6)
+            if products is not None:
+                return products
+
         try:
             category = Category.objects.get(api_id=category_name)
-            products = Product.objects.filter(Q(categories=category.id) & Q(nutriscore="a"))[:6]
-            for product in products:
-                product.last_interaction = datetime.datetime.now(datetime.timezone.utc)
-                product.save()         
+            products = Product.objects.filter(Q(categories=category.id) & Q(nutriscore="a")).order_by('id')[:6]
+            Product.objects.filter(id__in=[product.id for product in products]).update(
+                last_interaction=datetime.datetime.now(datetime.timezone.utc))
             return products
         except:
             return None
@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import os
+import json
+import time
+import zlib
+import hashlib
+from urllib.parse import urlencode
+from .resilience import ApiUnavailable, get_response
+
+class HttpCache:
+    """
+    This class stores on disk the json responses from the API so they can be
+    replayed without downloading them again:
+        -> each entry is named with the hash of the url and its parameters
+        -> the entries are compressed with zlib
+        -> an entry younger than max_age is returned without any request,
+            an older one is revalidated with its ETag / Last-Modified headers
+        -> the least recently used entries are deleted when the cache is bigger than max_size
+    """
+
+    def __init__(self, directory, max_size=500 * 1024 * 1024, max_age=12 * 3600):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(self.directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self._entries())
+
+    def get_json(self, session, url, params=None, **kwargs):
+        """
+        This method returns the json data for the url from the cache if it is still fresh
+        or not modified, and from the API otherwise. kwargs are given to get_response
+        """
+        path = self._path(url, params)
+        entry = self._read(path)
+        headers = {}
+        if entry:
+            if time.time() - entry["stored_at"] < self.max_age:
+                self._touch(path)
+                return entry["data"]
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = get_response(session, url, params=params, headers=headers or None, **kwargs)
+        if response.status_code == 304 and entry:
+            entry["stored_at"] = time.time()
+            self._write(path, entry)
+            return entry["data"]
+
+        try:
+            data = response.json()
+        except ValueError as error:
+            raise ApiUnavailable(str(error))
+
+        self._write(path, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "stored_at": time.time(),
+            "data": data,
+        })
+        return data
+
+    def key(self, url, params=None):
+        """
+        This method returns the name of the entry linked to the url and its parameters.
+        The parameters are sorted so their order does not change the key
+        """
+        if params:
+            url = url + "?" + urlencode(sorted((str(key), str(value)) for key, value in params.items()))
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, url, params):
+        key = self.key(url, params)
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    yield os.path.join(root, name)
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as entry_file:
+                return json.loads(zlib.decompress(entry_file.read()).decode('utf-8'))
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def _write(self, path, entry):
+        """
+        This method writes an entry in a temporary file before moving it, so a
+        stopped dbinit never leaves a broken entry behind
+        """
+        content = zlib.compress(json.dumps(entry).encode('utf-8'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        with open(path + ".tmp", 'wb') as entry_file:
+            entry_file.write(content)
+        os.replace(path + ".tmp", path)
+        self.size += len(content) - old_size
+        if self.size > self.max_size:
+            self._evict()
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """
+        This method deletes the least recently used entries until the cache
+        is under max_size
+        """
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        for path in entries:
+            if self.size <= self.max_size:
+                break
+            self.size -= os.path.getsize(path)
+            os.remove(path)
@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+The product pictures of Open Food Facts are shown through our image proxy:
+    -> thumbnail_url gives the proxy url of a picture for a size ('card' or 'detail'),
+       the urls stored in the database stay the original ones
+    -> thumbnail_cache.get_thumbnail downloads the picture once, resizes it, encodes it in WebP
+       (if the browser accepts it) or JPEG and keeps it on the local disk
+    -> the least recently used thumbnails are removed when the disk cache is full
+"""
+
+import hashlib
+import io
+import os
+import threading
+from urllib.parse import urlsplit
+import requests
+from django.conf import settings
+from django.urls import reverse
+from .resilience import CircuitBreaker
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Maximum width and height of each size (the ratio is kept)
+THUMBNAIL_SIZES = {
+    'card': (400, 400),
+    'detail': (640, 640),
+}
+# Only the pictures of these hosts can be requested through the proxy
+IMAGE_HOSTS = ('static.openfoodfacts.org', 'images.openfoodfacts.org')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+MAX_SOURCE_BYTES = 5 * 1024 * 1024
+QUALITY = 80
+
+# The image hosts are not the API: they have their own breaker
+image_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+
+class ImageUnavailable(Exception):
+    """
+    This exception is raised when a picture can not be downloaded or decoded
+    """
+    pass
+
+## PRIVATE FUNCTIONS ##
+def _cache_dir():
+    return getattr(settings, 'IMAGE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'images'))
+
+def _download(url):
+    """
+    This function downloads a picture, in the limit of MAX_SOURCE_BYTES
+    """
+    if not image_breaker.allow_request():
+        raise ImageUnavailable("image hosts unavailable")
+    try:
+        response = requests.get(url, timeout=getattr(settings, 'IMAGE_PROXY_TIMEOUT', 5), stream=True)
+        response.raise_for_status()
+        content = b''
+        for chunk in response.iter_content(64 * 1024):
+            content += chunk
+            if len(content) > MAX_SOURCE_BYTES:
+                break
+    except requests.RequestException as error:
+        image_breaker.record_failure()
+        raise ImageUnavailable(str(error))
+    image_breaker.record_success()
+    if len(content) > MAX_SOURCE_BYTES:
+        raise ImageUnavailable("picture too large")
+    return content
+
+def _resize(content, size, image_format):
+    """
+    This function returns the picture resized to fit in the size, encoded in image_format
+    """
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.thumbnail(THUMBNAIL_SIZES[size], Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, image_format, quality=QUALITY, optimize=image_format == 'JPEG')
+    except (OSError, ValueError) as error:
+        raise ImageUnavailable(str(error))
+    return output.getvalue()
+
+## PUBLIC FUNCTIONS ##
+def is_proxied(url):
+    """
+    This function checks if a picture url can go through the proxy
+    """
+    parts = urlsplit(url or '')
+    return (parts.scheme in ('http', 'https') and parts.hostname in IMAGE_HOSTS
+            and parts.path.lower().endswith(IMAGE_EXTENSIONS) and not parts.query)
+
+def thumbnail_url(url, size):
+    """
+    This function returns the url of the thumbnail of a picture
+    (the url itself if it is not a picture of Open Food Facts, ex: "Image manquante")
+    """
+    if not is_proxied(url) or size not in THUMBNAIL_SIZES:
+        return url
+    parts = urlsplit(url)
+    return reverse('search:thumbnail', kwargs={'size': size, 'host': parts.hostname,
+                                               'path': parts.path.lstrip('/')})
+
+class ThumbnailCache:
+    """
+    This class keeps the thumbnails on the local disk. A thumbnail read is touched,
+    so the oldest modification dates are the least recently used thumbnails,
+    removed when the cache is larger than IMAGE_CACHE_MAX_BYTES
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Size of the cache on the disk (None: not measured yet by this worker)
+        self.size = None
+
+    def get_thumbnail(self, host, path, size, webp=False):
+        """
+        This method returns the file and the content type of a thumbnail,
+        downloaded and resized the first time
+        """
+        if Image is None:
+            raise ImageUnavailable("Pillow is not installed")
+        image_format, extension = ('WEBP', 'webp') if webp else ('JPEG', 'jpg')
+        key = hashlib.sha1("{}/{}".format(host, path).encode('utf-8')).hexdigest()
+        file_path = os.path.join(_cache_dir(), key[:2], "{}-{}.{}".format(key, size, extension))
+        content_type = 'image/' + extension.replace('jpg', 'jpeg')
+
+        try:
+            os.utime(file_path)
+            return file_path, content_type
+        except FileNotFoundError:
+            pass
+
+        content = _resize(_download("https://{}/{}".format(host, path)), size, image_format)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # The file is complete when another request finds it
+        temporary_path = "{}.{}.tmp".format(file_path, threading.get_ident())
+        with open(temporary_path, 'wb') as thumbnail:
+            thumbnail.write(content)
+        os.replace(temporary_path, file_path)
+        with self.lock:
+            if self.size is not None:
+                self.size += len(content)
+        if self.size is None or self.size > self._max_bytes():
+            self.evict()
+        return file_path, content_type
+
+    def _max_bytes(self):
+        return getattr(settings, 'IMAGE_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+    def evict(self):
+        """
+        This method removes the least recently used thumbnails until the cache fits
+        in IMAGE_CACHE_MAX_BYTES. It returns the number of thumbnails removed
+        """
+        max_bytes = self._max_bytes()
+        with self.lock:
+            files = []
+            for directory, _, file_names in os.walk(_cache_dir()):
+                for file_name in file_names:
+                    try:
+                        stat = os.stat(os.path.join(directory, file_name))
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, os.path.join(directory, file_name)))
+            total = sum(file[1] for file in files)
+            removed = 0
+            for mtime, file_size, file_path in sorted(files):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                total -= file_size
+                removed += 1
+            self.size = total
+            return removed
+
+thumbnail_cache = ThumbnailCache()
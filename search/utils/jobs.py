@@ -0,0 +1,109 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import json
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import Job
+
+# A job is tried MAX_ATTEMPTS times, the delay between two attempts
+# starts at RETRY_DELAY seconds and is doubled each time
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30
+
+# A job taken by a worker which stopped during LEASE seconds is run again
+LEASE = 600
+
+# The finished jobs are kept KEEP_DONE seconds (their status can be read by the clients)
+KEEP_DONE = 3600
+
+# The functions which can be run in background, by name (see search/tasks.py)
+tasks = {}
+
+def task(function):
+    """
+    This decorator registers a function which can be run in background
+    """
+    tasks[function.__name__] = function
+    return function
+
+def enqueue(name, owner='', unique=False, **arguments):
+    """
+    This function queues a task, the arguments have to be serializable in json.
+    If unique is set, the task is not queued again while the same one is waiting.
+    When JOBS_EAGER is set (development, tests), the task is run at once
+    """
+    if name not in tasks:
+        raise KeyError("Unknown task: {}".format(name))
+    arguments = json.dumps(arguments, sort_keys=True)
+    if unique:
+        job = Job.objects.filter(name=name, arguments=arguments, status__in=(Job.QUEUED, Job.RUNNING)).first()
+        if job:
+            return job
+    job = Job.objects.create(name=name, owner=owner, arguments=arguments)
+    if getattr(settings, 'JOBS_EAGER', False):
+        run_job(job)
+    return job
+
+def claim_jobs(limit):
+    """
+    This function takes the queued jobs which are due (the oldest first).
+    They are not taken by another worker until the end of their lease
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(Job.objects.select_for_update(skip_locked=True)
+                    .filter(status__in=(Job.QUEUED, Job.RUNNING), run_after__lte=now)
+                    .order_by('run_after', 'id')[:limit])
+        Job.objects.filter(id__in=[job.id for job in jobs]) \
+                   .update(status=Job.RUNNING, run_after=now + datetime.timedelta(seconds=LEASE))
+    return jobs
+
+def run_job(job):
+    """
+    This function runs a job and saves its result.
+    A failed job is queued again with a longer delay at each attempt
+    """
+    job.attempts += 1
+    try:
+        result = tasks[job.name](**json.loads(job.arguments))
+    except Exception as error:
+        job.error = "{}: {}".format(type(error).__name__, error)
+        if job.attempts < MAX_ATTEMPTS:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + datetime.timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.DONE
+        job.result = json.dumps(result)
+        job.finished_at = timezone.now()
+    job.save()
+    return job
+
+def run_pending_jobs(limit=10):
+    """
+    This function runs, one after the other, the jobs which are due.
+    It returns the number of jobs run
+    """
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+def purge_jobs():
+    """
+    This function deletes the jobs finished for more than KEEP_DONE seconds,
+    the rows of the database are limited on Heroku
+    """
+    limit = timezone.now() - datetime.timedelta(seconds=KEEP_DONE)
+    return Job.objects.filter(status__in=(Job.DONE, Job.FAILED), finished_at__lt=limit).delete()[0]
+
+def get_job_result(job):
+    """
+    This function returns the result of a finished job (None before)
+    """
+    return json.loads(job.result) if job.result else None
@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import datetime
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from ..models import QueuedEmail
+
+# An email is tried MAX_ATTEMPTS times, the delay between two attempts
+# starts at RETRY_DELAY seconds and is doubled each time
+MAX_ATTEMPTS = 6
+RETRY_DELAY = 60
+
+# The emails taken by a worker are not taken by another one during LEASE seconds
+LEASE = 300
+
+# The emails which failed MAX_ATTEMPTS times are kept KEEP_FAILED seconds (to read their error)
+KEEP_FAILED = 7 * 24 * 3600
+
+def queue_email(email):
+    """
+    This function stores an EmailMessage in the queue instead of sending it,
+    so the request does not wait for the mail server
+    """
+    return QueuedEmail.objects.create(subject=email.subject,
+                                      body=email.body,
+                                      from_email=email.from_email or '',
+                                      to=','.join(email.to))
+
+def send_queued_emails(batch_size=50, connection=None):
+    """
+    This function sends the emails of the queue which are due, all over one connection
+    to the mail server:
+        -> a sent email is deleted from the queue
+        -> a failed email is tried again later, with a longer delay at each attempt
+    It returns the number of emails sent and failed
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(QueuedEmail.objects.select_for_update(skip_locked=True)
+                      .filter(next_attempt__lte=now).order_by('next_attempt', 'id')[:batch_size])
+        QueuedEmail.objects.filter(id__in=[email.id for email in emails]) \
+                           .update(next_attempt=now + datetime.timedelta(seconds=LEASE))
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _postpone(email, error)
+        return 0, len(emails)
+
+    sent = 0
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, email.from_email or None,
+                                   email.to.split(','), connection=connection)
+            try:
+                message.send()
+            except Exception as error:
+                _postpone(email, error)
+            else:
+                email.delete()
+                sent += 1
+    finally:
+        connection.close()
+    return sent, len(emails) - sent
+
+def purge_emails():
+    """
+    This function deletes the emails which failed MAX_ATTEMPTS times and were queued
+    more than KEEP_FAILED seconds ago, the rows of the database are limited on Heroku
+    """
+    limit = timezone.now() - datetime.timedelta(seconds=KEEP_FAILED)
+    return QueuedEmail.objects.filter(next_attempt__isnull=True, created_at__lt=limit).delete()[0]
+
+def _postpone(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts < MAX_ATTEMPTS:
+        email.next_attempt = timezone.now() + datetime.timedelta(seconds=RETRY_DELAY * 2 ** (email.attempts - 1))
+    else:
+        email.next_attempt = None
+    email.save()
@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Terms removed from the queries and the indexed names
+STOP_WORDS = frozenset(['a', 'de', 'des', 'un', 'une', 'tout', 'tous', 'les', 'la', 'le',
+                        'qui', 'que', 'quoi', 'ce', 'ces', 'sans', 'avec'])
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def remove_accents(text):
+    """
+    This function removes the accents of a text with the NFD decomposition (é -> e),
+    the characters without ascii letters are deleted.
+    Most of the names and queries are already in ascii and are returned as they are
+    """
+    try:
+        text.encode('ascii')
+        return text
+    except UnicodeEncodeError:
+        pass
+    return unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('ascii')
+
+def normalize(text):
+    """
+    This function returns the text in lowercase and without accents.
+    It is used for the names injected by dbinit and for the queries
+    """
+    return remove_accents(text.lower())
+
+@lru_cache(maxsize=1024)
+def clean_query(query):
+    """
+    This function returns the normalized query without the useless terms.
+    The last queries are kept in memory: the same searches come back often
+    """
+    return ' '.join(word for word in normalize(query).split() if word not in STOP_WORDS)
+
+def tokenize(name):
+    """
+    This function returns the tokens of a name: normalized, without punctuation
+    and without the useless terms
+    """
+    return [token for token in TOKEN_PATTERN.findall(normalize(name)) if token not in STOP_WORDS]
+
+class NameMatcher:
+    """
+    This class checks if a product name matches a query, without regex:
+        -> the comparison is done on the normalized texts (lowercase, without accents)
+        -> a name matches if it contains the whole query, or all its words
+    The cost is linear in the length of the name whatever the query
+    """
+
+    __slots__ = ('phrase', 'words')
+
+    def __init__(self, query):
+        self.phrase = ' '.join(normalize(query).split())
+        self.words = tuple(tokenize(query))
+
+    def match(self, name):
+        return self._match_normalized(normalize(name))
+
+    def match_all(self, names):
+        """
+        This method returns the list of the results of match for a list of names.
+        The names are normalized all together, in one call, which is much faster
+        for a page of products from the API
+        """
+        text = '\n'.join(name.replace('\n', ' ') for name in names)
+        phrase, words = self.phrase, self.words
+        if not words:
+            return [phrase in name for name in normalize(text).split('\n')]
+        return [phrase in name or all(word in name for word in words)
+                for name in normalize(text).split('\n')]
+
+    def _match_normalized(self, name):
+        if self.phrase in name:
+            return True
+        return bool(self.words) and all(word in name for word in self.words)
+
+@lru_cache(maxsize=256)
+def get_name_matcher(query):
+    """
+    This function returns the NameMatcher of a query, the last ones are kept in memory
+    """
+    return NameMatcher(query)
@@ -0,0 +1,161 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from ..models import QueryLog, Product
+from .normalizer import clean_query
+from .treatment import Treatment
+
+# The kinds of logged queries
+SEARCH = 'search'
+SUBSTITUTE = 'substitute'
+PRODUCT = 'product'
+
+class QueryLogger:
+    """
+    This class counts the searches, substitute lists and product pages asked by the users,
+    and if they were found in the database (hit) or requested from the API (miss).
+    It is used by the warmcache command to replay the most frequent ones after a deploy:
+        -> only a sample of the requests is logged (QUERY_LOG_SAMPLE_RATE)
+        -> the counts are kept in memory and saved by batches of batch_size queries,
+            or after flush_interval seconds
+    """
+
+    def __init__(self, sample_rate=None, batch_size=50, flush_interval=60):
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def get_sample_rate(self):
+        if self.sample_rate is not None:
+            return self.sample_rate
+        return getattr(settings, 'QUERY_LOG_SAMPLE_RATE', 1)
+
+    def log(self, kind, query, hit):
+        """
+        This method counts a query, the counts are saved once batch_size queries are logged
+        or flush_interval seconds after the last save
+        """
+        if random.random() >= self.get_sample_rate():
+            return
+        if kind == SEARCH:
+            query = clean_query(query)
+        query = query[:200]
+        if not query:
+            return
+        with self.lock:
+            counts = self.pending.setdefault((kind, query), [0, 0])
+            counts[0 if hit else 1] += 1
+            full = (len(self.pending) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.flush_interval)
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        This method saves the counts kept in memory: one update per query,
+        the new queries are inserted together
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        now = timezone.now()
+        new_logs = []
+        for (kind, query), (hits, misses) in pending.items():
+            updated = QueryLog.objects.filter(kind=kind, query=query).update(
+                hits=F('hits') + hits, misses=F('misses') + misses, last_seen=now)
+            if not updated:
+                new_logs.append(QueryLog(kind=kind, query=query, hits=hits, misses=misses, last_seen=now))
+        try:
+            with transaction.atomic():
+                QueryLog.objects.bulk_create(new_logs)
+        except IntegrityError:
+            # Another worker inserted some of them in the meantime
+            for new_log in new_logs:
+                log, created = QueryLog.objects.get_or_create(kind=new_log.kind, query=new_log.query, defaults={
+                    'hits': new_log.hits, 'misses': new_log.misses, 'last_seen': now})
+                if not created:
+                    QueryLog.objects.filter(id=log.id).update(hits=F('hits') + new_log.hits,
+                                                              misses=F('misses') + new_log.misses, last_seen=now)
+
+    def get_top_queries(self, kind, top, found_only=False, among=None):
+        """
+        This method returns the top most frequent queries of a kind
+        (only the ones already found in the database if found_only is True,
+        only the ones in among if it is given)
+        """
+        logs = QueryLog.objects.filter(kind=kind)
+        if found_only:
+            logs = logs.filter(hits__gt=0)
+        if among is not None:
+            logs = logs.filter(query__in=among)
+        return list(logs.annotate(total=F('hits') + F('misses'))
+                    .order_by('-total', '-last_seen').values_list('query', flat=True)[:top])
+
+    def trim(self, keep):
+        """
+        This method deletes the least frequent queries of each kind above the keep first ones,
+        the rows of the database are limited on Heroku
+        """
+        deleted = 0
+        for kind in (SEARCH, SUBSTITUTE, PRODUCT):
+            kept = self.get_top_queries(kind, keep)
+            deleted += QueryLog.objects.filter(kind=kind).exclude(query__in=kept).delete()[0]
+        return deleted
+
+query_logger = QueryLogger()
+
+def replay_top_queries(top, concurrency=4):
+    """
+    This function replays through Treatment the top most frequent queries of each kind,
+    concurrency of them at the same time. It fills the caches shared by the workers:
+    the product details stored in the database and the last interactions which keep
+    the products from being deleted (and the in-memory caches of the process).
+    The searches and substitute lists never found in the database are not replayed: they
+    would only request the API. The product pages are replayed for the products stored in
+    the database, a page which was missed stores the details of its product.
+    It returns the number of queries replayed and found in the database
+    """
+    queries = [(kind, query) for kind in (SEARCH, SUBSTITUTE)
+               for query in query_logger.get_top_queries(kind, top, found_only=True)]
+    stored_refs = Product.objects.values('ref')
+    queries += [(PRODUCT, query) for query in query_logger.get_top_queries(PRODUCT, top, among=stored_refs)]
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(_replay_in_thread, queries))
+    else:
+        results = [_replay(kind, query) for kind, query in queries]
+    return len(results), results.count(True)
+
+def _replay(kind, query):
+    find_info = Treatment()
+    try:
+        if kind == SEARCH:
+            find_info.get_choice_selection(query)
+        elif kind == SUBSTITUTE:
+            element_type, info_id = query.split('/', 1)
+            find_info.get_substitute_selection(element_type, info_id)
+        else:
+            find_info.get_selected_product(query)
+    except Exception:
+        return False
+    return find_info.from_database
+
+def _replay_in_thread(kind_query):
+    # Each thread has its own connection to the database
+    try:
+        return _replay(*kind_query)
+    finally:
+        connection.close()
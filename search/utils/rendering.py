@@ -0,0 +1,62 @@
+#! /usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark of the rendering of the page templates, with the context given by the views
+for a full page of results (6 products)
+"""
+
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import get_template
+from django.test import RequestFactory
+from ..forms import HeaderSearchForm, HomeSearchForm
+
+def _sample_products(number=6):
+    return [{
+        'ref': "30000000000{}".format(numb),
+        'name': "Jus d'orange {}".format(numb),
+        'slug_name': "Jus-d'orange-{}".format(numb),
+        'nutriscore': "a",
+        'description': "Jus d'orange pressé, sans sucres ajoutés " * 3,
+        'image_url': "https://static.openfoodfacts.org/images/products/{}.jpg".format(numb),
+        'product_registered': numb % 2 == 0,
+    } for numb in range(number)]
+
+def _page_contexts():
+    """
+    This function returns the context of each page template, as built by the views
+    """
+    forms = {'header_form': HeaderSearchForm(), 'home_form': HomeSearchForm()}
+    product = dict(_sample_products(1)[0], ingredients="Jus d'orange", ingredients_image_url="",
+                   nutriments_image_url="", nutriments={'fat': 0.1, 'saturated_fat': 0,
+                                                        'sugar': 8.5, 'salt': 0})
+    def results(source):
+        return dict(forms, source=source, element_number=6, element_type='product', list=_sample_products())
+
+    return {
+        'index.html': dict(forms),
+        'choice.html': results('choice_page'),
+        'substitute.html': results('substitute_page'),
+        'product.html': dict(forms, product=product, product_registered=False),
+        'product_registered.html': dict(results('product_registered_page'), next_cursor="abc"),
+    }
+
+def measure_template_rendering(iterations=100, user=None):
+    """
+    This function renders each page template like render() does in the views.
+    It returns for each template the duration (in seconds) of the first rendering
+    (templates loaded and product cards not cached yet) and the mean of the next ones
+    """
+    request = RequestFactory().get('/')
+    request.user = user or AnonymousUser()
+    durations = {}
+    for template_name, context in _page_contexts().items():
+        start = time.perf_counter()
+        get_template(template_name).render(context, request)
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for numb in range(iterations):
+            get_template(template_name).render(context, request)
+        durations[template_name] = {'first': first, 'mean': (time.perf_counter() - start) / iterations}
+    return durations
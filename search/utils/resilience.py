@@ -0,0 +1,137 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import time
+import random
+import threading
+import requests
+
+class ApiUnavailable(Exception):
+    """
+    This exception is raised when the API can not be requested:
+        -> the circuit breaker is open
+        -> the latency budget of the request is spent
+        -> the API did not answer correctly after all the attempts
+    """
+    pass
+
+class LatencyBudget:
+    """
+    This class represents the maximum time (in seconds) a request can spend
+    waiting for the API. It is shared by all the API calls of the same request
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.start = time.monotonic()
+
+    def remaining(self):
+        """
+        This method returns the time left in the budget
+        """
+        return max(0, self.seconds - (time.monotonic() - self.start))
+
+    def timeout(self, timeout):
+        """
+        This method returns the timeout to use for an API call: the endpoint timeout
+        or the time left in the budget if it is shorter
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise ApiUnavailable("latency budget spent")
+        return min(timeout, remaining)
+
+class CircuitBreaker:
+    """
+    This class stops the calls to the API after several consecutive failures:
+        -> closed: the calls are done normally
+        -> open: the calls are refused during reset_timeout seconds
+        -> half-open: after reset_timeout, one call is allowed to test the API
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        This method checks if a call to the API is allowed
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half-open: we let this call test the API and wait for its result
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def is_open(self):
+        """
+        This method checks if the calls to the API are currently refused
+        """
+        with self.lock:
+            return self.opened_at is not None
+
+    def record_success(self):
+        """
+        This method closes the circuit after a successful call
+        """
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """
+        This method counts a failed call and opens the circuit after too many
+        consecutive failures
+        """
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+def get_response(session, url, params=None, headers=None, timeout=5, retries=1, backoff=0.2, budget=None, breaker=None):
+    """
+    This function requests the API with a GET and returns the response.
+    As GET requests are idempotent, they are retried after a connection error,
+    a timeout or a server error with a jittered exponential backoff.
+    ApiUnavailable is raised if the API can not give an answer
+    """
+    attempt = 0
+    while True:
+        if breaker and not breaker.allow_request():
+            raise ApiUnavailable("circuit breaker open")
+
+        call_timeout = budget.timeout(timeout) if budget else timeout
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=call_timeout)
+            if response.status_code >= 500:
+                raise requests.HTTPError("server error {}".format(response.status_code))
+        except requests.RequestException as error:
+            if breaker:
+                breaker.record_failure()
+            if attempt >= retries:
+                raise ApiUnavailable(str(error))
+            delay = random.uniform(0, backoff * 2 ** attempt)
+            if budget:
+                delay = min(delay, budget.remaining())
+            time.sleep(delay)
+            attempt += 1
+        else:
+            if breaker:
+                breaker.record_success()
+            return response
+
+def get_json(session, url, params=None, **kwargs):
+    """
+    This function requests the API with get_response and returns the json data
+    """
+    response = get_response(session, url, params=params, **kwargs)
+    try:
+        return response.json()
+    except ValueError as error:
+        raise ApiUnavailable(str(error))
@@ -0,0 +1,270 @@
+#! /usr/bin/env python3
+# coding: utf-8
+
+import math
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from ..models import Product, Category, SearchIndexEntry
+from .normalizer import tokenize
+
+class SearchIndex(ABC):
+    """
+    This class answers the searches with an inverted index of the names of the
+    categories and products (token -> elements containing it):
+        -> each word of the query matches the tokens starting with it
+        -> the elements matching at least one word are ranked with BM25,
+            then by id when they have the same score
+    The storage of the index is given by the subclasses (abstract methods)
+    """
+
+    element_models = {'category': Category, 'product': Product}
+
+    # BM25 parameters
+    k1 = 1.2
+    b = 0.75
+
+    def search(self, element_type, query, max_numb=6):
+        """
+        This method returns the ids of the max_numb best elements for the query.
+        It returns None if the index is empty for this type of elements
+        """
+        documents, average_length = self._get_statistics(element_type)
+        if not documents:
+            return None
+
+        scores = {}
+        for word in set(tokenize(query)):
+            postings = self._get_postings(element_type, word)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for element_id, (frequency, length) in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * length / (average_length or 1))
+                scores[element_id] = (scores.get(element_id, 0)
+                                      + idf * frequency * (self.k1 + 1) / (frequency + norm))
+
+        ranking = sorted(scores.items(), key=lambda score: (-score[1], score[0]))
+        return [element_id for element_id, score in ranking[:max_numb]]
+
+    @abstractmethod
+    def index_element(self, element_type, element_id, name):
+        """
+        This method updates the index when an element is saved
+        """
+
+    def index_elements(self, element_type, elements):
+        """
+        This method updates the index for several elements saved together ([(element_id, name), ...])
+        """
+        for element_id, name in elements:
+            self.index_element(element_type, element_id, name)
+
+    @abstractmethod
+    def remove_element(self, element_type, element_id):
+        """
+        This method updates the index when an element is deleted
+        """
+
+    @abstractmethod
+    def rebuild(self):
+        """
+        This method builds the whole index from the database
+        """
+
+    @abstractmethod
+    def _get_postings(self, element_type, prefix):
+        """
+        This method returns {element_id: (frequency, length)} for the elements
+        containing a token starting with prefix
+        """
+
+    @abstractmethod
+    def _get_statistics(self, element_type):
+        """
+        This method returns the number of indexed elements and their average length
+        """
+
+class MemorySearchIndex(SearchIndex):
+    """
+    This class keeps the index in memory. It is built from the names in the
+    database at the first use, then rebuilt when the database changes in this
+    process (signals) or after ttl seconds for the changes done by dbinit
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.indexes = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def invalidate(self, **kwargs):
+        self.loaded_at = None
+
+    def index_element(self, element_type, element_id, name):
+        self.invalidate()
+
+    def index_elements(self, element_type, elements):
+        self.invalidate()
+
+    def remove_element(self, element_type, element_id):
+        self.invalidate()
+
+    def rebuild(self):
+        """
+        This method builds one index per type of elements:
+            -> postings: token -> {element_id: frequency}
+            -> tokens: the sorted tokens for the prefix search
+            -> lengths: element_id -> number of tokens
+        """
+        indexes = {}
+        for element_type, model in self.element_models.items():
+            postings = {}
+            lengths = {}
+            for element_id, name in model.objects.values_list('id', 'name'):
+                tokens = Counter(tokenize(name))
+                lengths[element_id] = sum(tokens.values())
+                for token, frequency in tokens.items():
+                    postings.setdefault(token, {})[element_id] = frequency
+            indexes[element_type] = {
+                'postings': postings,
+                'tokens': sorted(postings),
+                'lengths': lengths,
+                'average_length': sum(lengths.values()) / len(lengths) if lengths else 0,
+            }
+        self.indexes = indexes
+        self.loaded_at = time.monotonic()
+
+    def get_index(self, element_type):
+        loaded_at = self.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            with self.lock:
+                if self.loaded_at is loaded_at:
+                    self.rebuild()
+        return self.indexes[element_type]
+
+    def _get_postings(self, element_type, prefix):
+        index = self.get_index(element_type)
+        postings = {}
+        position = bisect.bisect_left(index['tokens'], prefix)
+        while position < len(index['tokens']) and index['tokens'][position].startswith(prefix):
+            for element_id, frequency in index['postings'][index['tokens'][position]].items():
+                previous = postings.get(element_id, (0, 0))[0]
+                postings[element_id] = (previous + frequency, index['lengths'][element_id])
+            position += 1
+        return postings
+
+    def _get_statistics(self, element_type):
+        index = self.get_index(element_type)
+        return len(index['lengths']), index['average_length']
+
+class DatabaseSearchIndex(SearchIndex):
+    """
+    This class stores the index in the SearchIndexEntry table
+    (one row per token of each element). It is built by dbinit and updated
+    when a category or a product is saved.
+    The statistics of the index are kept in memory: they are computed again when
+    the index changes in this process or after ttl seconds for the other processes
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        # element_type -> (time of the computation, (documents, average_length))
+        self.statistics = {}
+
+    def invalidate(self, **kwargs):
+        self.statistics = {}
+
+    def index_element(self, element_type, element_id, name):
+        self.index_elements(element_type, [(element_id, name)])
+
+    def index_elements(self, element_type, elements):
+        # The old entries are replaced with one deletion and one insertion for all the elements
+        entries = []
+        for element_id, name in elements:
+            tokens = Counter(tokenize(name))
+            length = sum(tokens.values())
+            entries.extend(SearchIndexEntry(token=token, element_type=element_type, element_id=element_id,
+                                            frequency=frequency, length=length)
+                           for token, frequency in tokens.items())
+        with transaction.atomic():
+            SearchIndexEntry.objects.filter(element_type=element_type,
+                                            element_id__in=[element[0] for element in elements]).delete()
+            SearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+        self.invalidate()
+
+    def remove_element(self, element_type, element_id):
+        SearchIndexEntry.objects.filter(element_type=element_type, element_id=element_id).delete()
+        self.invalidate()
+
+    def rebuild(self):
+        entries = []
+        for element_type, model in self.element_models.items():
+            for element_id, name in model.objects.values_list('id', 'name'):
+                tokens = Counter(tokenize(name))
+                length = sum(tokens.values())
+                entries.extend(SearchIndexEntry(token=token, element_type=element_type, element_id=element_id,
+                                                frequency=frequency, length=length)
+                               for token, frequency in tokens.items())
+        with transaction.atomic():
+            SearchIndexEntry.objects.all().delete()
+            SearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+        self.invalidate()
+
+    def _get_postings(self, element_type, prefix):
+        # A range on the token uses the index of the table, whatever its collation
+        entries = SearchIndexEntry.objects.filter(
+            element_type=element_type, token__gte=prefix, token__lt=prefix + '\uffff'
+        ).values_list('token', 'element_id', 'frequency', 'length')
+        postings = {}
+        for token, element_id, frequency, length in entries:
+            if token.startswith(prefix):
+                previous = postings.get(element_id, (0, 0))[0]
+                postings[element_id] = (previous + frequency, length)
+        return postings
+
+    def _get_statistics(self, element_type):
+        cached = self.statistics.get(element_type)
+        if cached and time.monotonic() - cached[0] <= self.ttl:
+            return cached[1]
+        statistics = SearchIndexEntry.objects.filter(element_type=element_type).aggregate(
+            documents=Count('element_id', distinct=True), tokens=Sum('frequency'))
+        if statistics['documents']:
+            result = statistics['documents'], statistics['tokens'] / statistics['documents']
+        else:
+            result = 0, 0
+        self.statistics[element_type] = (time.monotonic(), result)
+        return result
+
+search_indexes = {
+    'memory': MemorySearchIndex(),
+    'database': DatabaseSearchIndex(),
+}
+
+def get_search_index():
+    """
+    This function returns the index chosen in the settings (SEARCH_INDEX_BACKEND)
+    """
+    return search_indexes[getattr(settings, 'SEARCH_INDEX_BACKEND', 'database')]
+
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+    This function is connected to the post_save signal of the categories and products.
+    Saving an element without changing its name does not change the index
+    """
+    if update_fields and 'name' not in update_fields:
+        return
+    element_type = 'category' if sender is Category else 'product'
+    get_search_index().index_element(element_type, instance.id, instance.name)
+
+def remove_from_search_index(sender, instance, **kwargs):
+    """
+    This function is connected to the post_delete signal of the categories and products
+    """
+    element_type = 'category' if sender is Category else 'product'
+    get_search_index().remove_element(element_type, instance.id)
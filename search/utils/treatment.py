@@ -1,22 +1,36 @@
 #! /usr/bin/env python3
 # coding: utf-8
 
+from concurrent.futures import ThreadPoolExecutor
 from .db_interactions import DBInteractions
-from .api_interactions import OpenFoodFactsInteractions
+from .api_interactions import OpenFoodFactsInteractions, breaker
+from .resilience import ApiUnavailable, LatencyBudget
+from .category_graph import category_graph
+from .jobs import enqueue, get_job_result
 
 class Treatment:
 
-    def __init__(self):
+    def __init__(self, latency_budget=8):
+        """
+        latency_budget is the maximum time (in seconds) the API calls of the request
+        can take all together
+        """
         self.db_interactions = DBInteractions()
-        self.api_interactions = OpenFoodFactsInteractions()
+        self.api_interactions = OpenFoodFactsInteractions(LatencyBudget(latency_budget))
+        # True when the last selection was found in the database (used by the query logs)
+        self.from_database = False
 
     def get_choice_selection(self, query):
 
         db_info = self.db_interactions.get_search_selection(query)
+        self.from_database = bool(db_info)
         if db_info:
             return db_info
         else : 
-            api_info = self.api_interactions.get_products_selection(query, 6)
+            try:
+                api_info = self.api_interactions.get_products_selection(query, 6)
+            except ApiUnavailable:
+                api_info = None
             if api_info:
                 return api_info
             else:
@@ -24,19 +38,43 @@ class Treatment:
 
     def get_substitute_selection(self, element_type, info_id):
         db_info = self.db_interactions.get_substitute_products_in_db(element_type, info_id)
+        self.from_database = bool(db_info)
         if db_info:
             return db_info
         else:
-            api_info = self.api_interactions.get_substitute_products_from_api(element_type, info_id, 6)
+            try:
+                api_info = self.api_interactions.get_substitute_products_from_api(element_type, info_id, 6,
+                                                                                  category_graph)
+            except ApiUnavailable:
+                api_info = None
             if api_info:
                 return api_info
             else:
                 return None
 
     def get_selected_product(self, product_ref):
-        # Need to evolve the method to see if it is a product already registered by the user
-        product_info = self.api_interactions.get_selected_product(product_ref)
+        """
+        This method gets the information of the product page:
+        -> If the product details are stored in the database, they are returned directly
+            -> If they are too old, they are refreshed from the API in background
+        -> If not, the product is requested from the API and its details are stored
+            when the product is already in the database
+        -> If the API is unavailable, we return what we have in the database
+        """
+        db_info = self.db_interactions.get_product_details(product_ref)
+        self.from_database = bool(db_info)
+        if db_info:
+            if self.db_interactions.check_product_details_outdated(product_ref):
+                self._refresh_product_details(product_ref)
+            return db_info
+
+        try:
+            product_info = self.api_interactions.get_selected_product(product_ref)
+        except ApiUnavailable:
+            return self.db_interactions.get_product_details(product_ref, details_required=False)
+
         if product_info:
+            self.db_interactions.set_product_details(product_info)
             return product_info
         else:
             return None
@@ -51,6 +89,43 @@ class Treatment:
         products = self.db_interactions.get_products_registered(username)
         return products
 
+    def get_registered_products_page(self, username, cursor=None):
+        """
+        This method just gets the method in DBInteractions class to get one page
+        of the registered products.
+        Tests are realized in test_db_interactions.py
+        """
+
+        products = self.db_interactions.get_products_registered_page(username, cursor)
+        return products
+
+    def get_product_version(self, product_ref):
+        """
+        This method just gets the method in DBInteractions class to get the version
+        of a product page (None if it has to be requested from the API).
+        Tests are realized in test_db_interactions.py
+        """
+
+        return self.db_interactions.get_product_version(product_ref)
+
+    def get_data_version(self):
+        """
+        This method just gets the method in DBInteractions class to get the version
+        of the categories and products used by the substitute pages.
+        Tests are realized in test_db_interactions.py
+        """
+
+        return self.db_interactions.get_data_version()
+
+    def get_favourites_version(self, username):
+        """
+        This method just gets the method in DBInteractions class to get the version
+        of the products registered by a user.
+        Tests are realized in test_db_interactions.py
+        """
+
+        return self.db_interactions.get_favourites_version(username)
+
     def register_product(self, username, product_ref):
         """
         This is the main method to register a product to a user. The are many steps:
@@ -77,7 +152,7 @@ class Treatment:
                 if product_info:
                     self.db_interactions.set_product_for_user_registration(product_info)
                 else:
-                    status = "database full"
+                    return "product unavailable"
             self.db_interactions.save_product_for_user(username, product_ref)
             status = "registered"
         else:
@@ -85,6 +160,58 @@ class Treatment:
 
         return status
 
+    def queue_registration(self, username, product_ref):
+        """
+        This method registers a product to a user without waiting for the API:
+        -> If the product is in the database, it is registered at once
+        -> If not, a job registers it in background (register_product)
+        It returns the status ("queued" while the job is not done) and the id of the job
+        """
+
+        if self.db_interactions.check_product_existence_in_db(product_ref):
+            return self.register_product(username, product_ref), None
+
+        job = enqueue('register_product', owner=username, username=username, product_ref=product_ref)
+        if job.status == job.DONE:
+            return get_job_result(job), job.id
+        return "queued", job.id
+
+    def register_products(self, username, product_refs):
+        """
+        This method registers several products to a user at once (a whole list of substitutes):
+        -> The rows are counted only once and, if the volume is > to 8500, one product which
+            is not registered by a user is deleted for each registration
+        -> The products which are not in the database are requested at the same time from the API
+        -> The products and the favourites are inserted together in one transaction
+        It returns the status of each ref, in the order of product_refs:
+        "registered", "product unavailable" or "database full"
+        """
+
+        product_refs = list(dict.fromkeys(product_refs))
+        statuses = {}
+        rows = self.db_interactions.count_global_rows_in_db()
+        allowed = self.db_interactions.check_db_for_registrations(rows, len(product_refs), product_refs)
+        for product_ref in product_refs[allowed:]:
+            statuses[product_ref] = "database full"
+        product_refs = product_refs[:allowed]
+
+        refs_in_db = self.db_interactions.get_products_refs_in_db(product_refs)
+        missing_refs = [product_ref for product_ref in product_refs if product_ref not in refs_in_db]
+        products_info = []
+        for product_ref, product_info in zip(missing_refs, self._get_products_from_api(missing_refs)):
+            if product_info:
+                products_info.append(product_info)
+            else:
+                statuses[product_ref] = "product unavailable"
+
+        registered_refs = [product_ref for product_ref in product_refs if product_ref not in statuses]
+        if registered_refs:
+            self.db_interactions.save_products_for_user(username, registered_refs, products_info)
+        for product_ref in registered_refs:
+            statuses[product_ref] = "registered"
+
+        return statuses
+
     def delete_product(self, username, product_ref):
         """
         This method just gets the method in DBInteractions class to delete the registered products.
@@ -93,4 +220,30 @@ class Treatment:
         """
 
         status = self.db_interactions.delete_product_registered(username, product_ref)
-        return status
\ No newline at end of file
+        return status
+
+    def _get_products_from_api(self, product_refs):
+        """
+        This method requests at the same time several products from the API and returns
+        their information in the same order (None for a product which is not available)
+        """
+        def get_product(product_ref):
+            try:
+                return self.api_interactions.get_selected_product(product_ref)
+            except ApiUnavailable:
+                return None
+
+        if len(product_refs) < 2:
+            return [get_product(product_ref) for product_ref in product_refs]
+
+        with ThreadPoolExecutor(max_workers=min(len(product_refs), 8)) as executor:
+            return list(executor.map(get_product, product_refs))
+
+    def _refresh_product_details(self, product_ref):
+        """
+        This method launches the update of the product details from the API
+        in background so the product page does not wait for it
+        """
+        if breaker.is_open():
+            return
+        enqueue('refresh_product_details', unique=True, product_ref=product_ref)
@@ -2,14 +2,24 @@
 # coding: utf-8
 
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, Http404
+import json
+import hashlib
+from django.http import HttpResponse, HttpResponseBadRequest, Http404, JsonResponse, FileResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.vary import vary_on_cookie
 from django.contrib.auth.models import User
 from django.urls import reverse
 from .forms import HeaderSearchForm, HomeSearchForm, RegisterForm, ConnexionForm
 from .utils.treatment import Treatment
+from .utils.mail_queue import queue_email
+from .utils.query_log import query_logger, SEARCH, SUBSTITUTE, PRODUCT
+from .utils.images import thumbnail_cache, thumbnail_url, is_proxied, ImageUnavailable, THUMBNAIL_SIZES
 from .models import Product, Category, Profile
 
 from django.contrib.sites.shortcuts import get_current_site
@@ -21,6 +31,41 @@ from django.core.mail import EmailMessage
 
 # Create your views here.
 
+# Maximum number of products registered with one request
+MAX_BATCH_REGISTRATION = 50
+
+# The thumbnails never change for a url (the pictures of Open Food Facts have a revision number)
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+
+## VALIDATORS OF THE CONDITIONAL PAGES ##
+# The product and substitute pages get an ETag computed with a few cheap queries
+# before any search: if the browser already has the page (back and forth navigation),
+# a 304 is sent without searching and rendering anything.
+# The user and his registered products are part of the ETag ("AJOUTER" or "SUPPRIMER")
+def _make_etag(*parts):
+    parts = (settings.PAGES_VERSION,) + parts
+    return hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def _user_version(request, find_info):
+    if request.user.is_authenticated:
+        return "{}:{}".format(request.user.id, find_info.get_favourites_version(request.user.username))
+    return "anonymous"
+
+def _product_etag(request, code):
+    """
+    The product page only has an ETag when it is built from the database
+    """
+    find_info = Treatment()
+    version = find_info.get_product_version(code)
+    if version is None:
+        return None
+    return _make_etag('product', code, version, _user_version(request, find_info))
+
+def _substitute_etag(request, element_type, info_id):
+    find_info = Treatment()
+    return _make_etag('substitute', element_type, info_id, find_info.get_data_version(),
+                      _user_version(request, find_info))
+
 # Home page
 def index(request):
     """
@@ -46,6 +91,7 @@ def choice(request):
     else:
         find_info = Treatment()
         selection = find_info.get_choice_selection(query)
+        query_logger.log(SEARCH, query, find_info.from_database)
 
     if selection:
         #convert products or categories name into slug type
@@ -70,6 +116,9 @@ def choice(request):
     return render(request, 'choice.html', context)
 
 # Search List
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=_substitute_etag)
 def substitute(request, element_type, info_id):
     """
     This view manages the page showing a list of products for substitution
@@ -78,6 +127,7 @@ def substitute(request, element_type, info_id):
     home_form = HomeSearchForm()
     find_info = Treatment()
     selection = find_info.get_substitute_selection(element_type, info_id)
+    query_logger.log(SUBSTITUTE, "{}/{}".format(element_type, info_id), find_info.from_database)
     if selection:
         context = {
             'source' : "substitute_page",
@@ -88,15 +138,12 @@ def substitute(request, element_type, info_id):
             'home_form' : home_form,
         }
 
+        # The profile is loaded with request.user (see search/backends.py)
         if request.user.is_authenticated:
-            user = User.objects.get(username=request.user.username)
-            if user.profile.products.all().exists():
-                ref_list = [product.ref for product in user.profile.products.all()]
+            ref_list = set(request.user.profile.products.values_list('ref', flat=True))
+            if ref_list:
                 for product in context["list"]:
-                    if product["ref"] in ref_list:
-                        product["product_registered"] = True
-                    else:
-                        product["product_registered"] = False
+                    product["product_registered"] = product["ref"] in ref_list
 
     else:
         context = {
@@ -104,9 +151,16 @@ def substitute(request, element_type, info_id):
             'header_form' : header_form,
             'home_form' : home_form
         }
+        # The API may answer next time: the empty page must not be revalidated with its ETag
+        response = render(request, 'substitute.html', context)
+        patch_cache_control(response, no_store=True)
+        return response
     return render(request, 'substitute.html', context)    
 
 # Product
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=_product_etag)
 def product(request, code):
     """
     this view manages the product page showing all the elements linked
@@ -116,6 +170,7 @@ def product(request, code):
     home_form = HomeSearchForm()
     find_info = Treatment()
     selection = find_info.get_selected_product(code)
+    query_logger.log(PRODUCT, code, find_info.from_database)
     if selection:
         context = {
         'header_form' : header_form,
@@ -126,11 +181,8 @@ def product(request, code):
 
         # Check if user is authenticated and if he already registered the product
         if request.user.is_authenticated:
-            user = User.objects.get(username=request.user.username)
-            if user.profile.products.all().exists():
-                ref_list = [product.ref for product in user.profile.products.all()]
-                if context["product"]["ref"] in ref_list:
-                    context["product_registered"] = True
+            context["product_registered"] = request.user.profile.products.filter(
+                ref=context["product"]["ref"]).exists()
     
     else:
         context = {
@@ -176,7 +228,8 @@ def register(request):
                     message,
                     to=[to_email]
                 )
-                email.send()
+                # The email is sent by the sendmails command, not during the request
+                queue_email(email)
 
                 messages.success(request, """Un email vous a été envoyé. Veuillez confirmer 
                     s'il vous plait votre adresse mail pour finaliser votre inscription""")
@@ -254,31 +307,23 @@ def personal(request):
 def product_registered(request):
     """
     This view manages the product-registered page where the user
-    can find all the products he registered
+    can find the products he registered, page by page from the most recent.
+    The next pages are given by product_registered_page
     """
     header_form = HeaderSearchForm()
     home_form = HomeSearchForm()
     find_info = Treatment()
-    selection = find_info.get_registered_products(request.user.username)
-    if selection:
+    selection = find_info.get_registered_products_page(request.user.username, request.GET.get('after'))
+    if selection["number"]:
         context = {
             'source' : "product_registered_page",
             'element_number': selection["number"],
             'element_type': selection["type"],
             'list' : selection["elements"],
+            'next_cursor': selection["next_cursor"],
             'header_form' : header_form,
             'home_form' : home_form
         }
-
-        if request.user.is_authenticated:
-            user = User.objects.get(username=request.user.username)
-            if user.profile.products.all().exists():
-                ref_list = [product.ref for product in user.profile.products.all()]
-                for product in context["list"]:
-                    if product["ref"] in ref_list:
-                        product["product_registered"] = True
-                    else:
-                        product["product_registered"] = False
     else:
         context = {
             'element_number': 0,
@@ -287,17 +332,85 @@ def product_registered(request):
         }        
     return render(request, 'product_registered.html', context)
 
+@login_required(login_url='/login/')
+def product_registered_page(request):
+    """
+    This view sends back in json the page of registered products following
+    the cursor given in the "after" parameter (infinite scroll)
+    """
+    find_info = Treatment()
+    selection = find_info.get_registered_products_page(request.user.username, request.GET.get('after'))
+    for product in selection["elements"]:
+        product["url"] = reverse('search:product', kwargs={'code': product["ref"]})
+        product["delete_url"] = reverse('search:delete_treatment', kwargs={'code': product["ref"]})
+        product["image_url"] = thumbnail_url(product["image_url"], 'card')
+    return JsonResponse(selection)
+
+# Product pictures
+@require_GET
+def thumbnail(request, size, host, path):
+    """
+    This view sends the thumbnail of a picture of Open Food Facts, in WebP if the browser
+    accepts it. If the picture can not be resized, the browser is sent to the original one
+    """
+    url = "https://{}/{}".format(host, path)
+    if size not in THUMBNAIL_SIZES or not is_proxied(url):
+        raise Http404("Unknown picture")
+    webp = 'image/webp' in request.META.get('HTTP_ACCEPT', '')
+    try:
+        file_path, content_type = thumbnail_cache.get_thumbnail(host, path, size, webp)
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+    except (ImageUnavailable, FileNotFoundError):
+        response = redirect(url)
+        patch_cache_control(response, max_age=300)
+        return response
+    patch_cache_control(response, public=True, max_age=THUMBNAIL_MAX_AGE, immutable=True)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
 @login_required(login_url='/login/')
 def save_treatment(request, code):
     """
     This view manages the treatment to save a product in its favorites 
     """
     action = Treatment()
-    status = action.register_product(request.user.username, code)
+    # A product which is not in the database is registered in background,
+    # the page shows it once the job is done
+    action.queue_registration(request.user.username, code)
 
     referer = request.META.get('HTTP_REFERER')
     return redirect(referer)
 
+@login_required(login_url='/login/')
+def save_treatments(request):
+    """
+    This view manages the treatment to save several products in its favorites at once.
+    The codes are posted in a form ("codes" several times) or in json ({"codes": [...]}),
+    the status of each code is sent back in json (the form is redirected to the previous page)
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest("The codes have to be posted")
+    if request.content_type == 'application/json':
+        try:
+            codes = json.loads(request.body.decode('utf-8'))["codes"]
+        except:
+            return HttpResponseBadRequest("Invalid json")
+    else:
+        codes = request.POST.getlist('codes')
+    if (not isinstance(codes, list) or len(codes) > MAX_BATCH_REGISTRATION
+            or not all(isinstance(code, str) for code in codes)):
+        return HttpResponseBadRequest("At most %s codes are expected" % MAX_BATCH_REGISTRATION)
+
+    statuses = {}
+    if codes:
+        action = Treatment()
+        statuses = action.register_products(request.user.username, codes)
+
+    if request.content_type == 'application/json' or request.is_ajax():
+        return JsonResponse({'statuses': statuses})
+    referer = request.META.get('HTTP_REFERER')
+    return redirect(referer or reverse('search:product_registered'))
+
 @login_required(login_url='/login/')
 def delete_treatment(request, code):
     """
@@ -0,0 +1,59 @@
+(function($) {
+  "use strict"; // Start of use strict
+
+  // The next pages of registered products are loaded when the user reaches
+  // the bottom of the page (or clicks on "Voir plus" without javascript)
+  var $more = $('#more-products');
+  var loading = false;
+
+  function productCard(product) {
+    var $card = $('<div class="card product-card card-margin"></div>');
+    $('<img class="card-img-top">').attr({src: product.image_url, alt: product.name}).appendTo($card);
+    $('<div class="card-nutriscore"></div>').text(product.nutriscore.toUpperCase()).appendTo($card);
+    var $body = $('<div class="card-body"></div>').appendTo($card);
+    $('<h5 class="card-title"></h5>').text(product.name).appendTo($body);
+    $('<p class="card-text"></p>').text(product.description || '').appendTo($body);
+    var $links = $('<div class="row"></div>').appendTo($('<div class="card-footer bg-transparent"></div>').appendTo($card));
+    $('<a class="card-link selection">+INFOS</a>').attr('href', product.url)
+      .appendTo($('<div class="col-md-12 col-lg-6 text-center"></div>').appendTo($links));
+    $('<a class="card-link selection">SUPPRIMER</a>').attr('href', product.delete_url)
+      .appendTo($('<div class="col-md-12 col-lg-6 text-center"></div>').appendTo($links));
+    return $card;
+  }
+
+  function loadNextPage() {
+    if (loading || !$more.length) {
+      return;
+    }
+    loading = true;
+    $.getJSON($more.data('url'), {after: $more.data('cursor')}).done(function(page) {
+      var $deck;
+      $.each(page.elements, function(index, product) {
+        if (index % 3 === 0) {
+          $deck = $('<div class="col-12 card-deck card-margin-deck"></div>').appendTo('#next-products');
+        }
+        productCard(product).appendTo($deck);
+      });
+      if (page.next_cursor) {
+        $more.data('cursor', page.next_cursor).attr('href', '?after=' + page.next_cursor);
+      } else {
+        $more.parent().remove();
+        $more = $();
+      }
+    }).always(function() {
+      loading = false;
+    });
+  }
+
+  $more.click(function(event) {
+    event.preventDefault();
+    loadNextPage();
+  });
+
+  $(window).scroll(function() {
+    if ($(window).scrollTop() + $(window).height() > $(document).height() - 200) {
+      loadNextPage();
+    }
+  });
+
+})(jQuery); // End of use strict